@@ -8,6 +8,10 @@ from .models import (
     Schedule,
     Input,
     CallbackSubscriber,
+    ProvisioningJob,
+    InboxMessage,
+    CallbackDailySummary,
+    RuntimeState,
 )
 
 admin.site.register(Playout)
@@ -18,3 +22,7 @@ admin.site.register(Action)
 admin.site.register(Schedule)
 admin.site.register(Input)
 admin.site.register(CallbackSubscriber)
+admin.site.register(ProvisioningJob)
+admin.site.register(InboxMessage)
+admin.site.register(CallbackDailySummary)
+admin.site.register(RuntimeState)
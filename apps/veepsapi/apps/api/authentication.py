@@ -3,26 +3,34 @@ from rest_framework import permissions
 from ..users.models import ShowRunner
 
 
+def get_playout_scope(user):
+    """
+    Playouts a user can see
+    :return: None for an admin, otherwise the subquery of the ids of the playouts the user is a showrunner of, which
+    the database evaluates with the query it filters, so a playout given to the user is visible right away in every
+    worker
+    """
+    if user.is_superuser:
+        return None
+
+    return ShowRunner.objects.filter(user_id=user.id).values("playout_id")
+
+
 class IsAdminOrShowRunner(permissions.BasePermission):
     """
     Permission to check if an object can be created.
+    The objects of the views are limited to the playouts of the showrunner, see BaseViewSet.get_queryset
     """
 
     def has_permission(self, request, view):
-        from .views import PlayoutViewSet
-
-        if not request.user.is_authenticated:
-            return False
+        # if the user is authenticated, then let them in for all functions
+        return request.user.is_authenticated
 
-        if request.user.is_superuser:
-            return True
 
-        # Limit the playouts if the user isn't an admin
-        playouts = [s.playout.id for s in ShowRunner.objects.filter(user=request.user).all()]
-        if isinstance(view, PlayoutViewSet):
-            view.queryset = view.queryset.filter(id__in=playouts)
-        else:
-            view.queryset = view.queryset.filter(playout__id__in=playouts)
+class IsAdmin(permissions.BasePermission):
+    """
+    Permission for the endpoints reserved to admins
+    """
 
-        # if the user is authenticated, then let them in for all functions
-        return True
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_superuser
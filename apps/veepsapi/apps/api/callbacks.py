@@ -0,0 +1,111 @@
+import json
+import logging
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms import model_to_dict
+
+from django.db import transaction
+
+from config import settings
+from . import streams
+from .delivery import delivery_engine
+from .models import CallbackEvent, CallbackSubscriber, Playout, PlayoutEvent
+
+logger = logging.getLogger(__name__)
+
+ALL = "*"
+
+
+class SubscriberIndex:
+    """
+    In-memory index of the callback subscribers by event type, with their playout filter.
+
+    The index is rebuilt lazily after a subscriber changes (see signals.py). Other worker processes don't get the
+    signal, so the index also expires after CALLBACK_SUBSCRIBER_INDEX_TTL seconds.
+    Subscribers in the index are shared between threads and must not be modified.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._index = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def build(self):
+        index = {}
+        for subscriber in CallbackSubscriber.objects.prefetch_related("playouts"):
+            playout_ids = {str(playout.id) for playout in subscriber.playouts.all()} or None
+            for event_type in subscriber.event_types or [ALL]:
+                index.setdefault(event_type, []).append((subscriber, playout_ids))
+        return index
+
+    def get_index(self):
+        with self._lock:
+            if self._index is None or self._expires_at < time.monotonic():
+                self._index = self.build()
+                self._expires_at = time.monotonic() + self.ttl
+            return self._index
+
+    def match(self, event_type, playout_id):
+        """
+        :return: subscribers of `event_type` events of the playout
+        """
+        index = self.get_index()
+        return [
+            subscriber
+            for subscriber, playout_ids in index.get(event_type, []) + index.get(ALL, [])
+            if playout_ids is None or str(playout_id) in playout_ids
+        ]
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+subscriber_index = SubscriberIndex(ttl=settings.CALLBACK_SUBSCRIBER_INDEX_TTL)
+
+
+def publish(event_type, playout, obj, object_id=None, exclude=None):
+    """
+    Fan an event out to the streams of the playout and to the subscribers of `event_type` events of the playout:
+    the object is serialized once, the events of all the subscribers are written with one insert and handed to the
+    delivery engine together.
+    Call it in the transaction of the change the event reports, the events are only delivered once it commits.
+    :param exclude: fields of `obj` left out of the event
+    :return: the created callback events
+    """
+    object_id = obj.id if object_id is None else object_id
+    event_object = json.dumps(
+        model_to_dict(obj, exclude=exclude), sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder
+    )
+    subscribers = subscriber_index.match(event_type, playout.id)
+
+    with transaction.atomic():
+        # the event reports a change of the playout, the pollers of its resources get it too. Updating the playout
+        # row locks it until the transaction commits, so the events of a playout get their ids in commit order and
+        # the streams never skip an event committed after a later id (see streams.stream)
+        Playout.bump_version(pk=playout.id)
+        PlayoutEvent.objects.create(
+            playout=playout, event_type=event_type, object_id=object_id, event_object=event_object
+        )
+        streams.notify(playout.id)
+
+        if not subscribers:
+            return []
+
+        events = CallbackEvent.objects.bulk_create(
+            [
+                CallbackEvent(
+                    playout=playout,
+                    subscriber=subscriber,
+                    event_type=event_type,
+                    object_id=object_id,
+                    event_object=event_object,
+                )
+                for subscriber in subscribers
+            ]
+        )
+        delivery_engine.enqueue(events)
+    return events
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from rest_framework.mixins import ListModelMixin
+from rest_framework.response import Response
+
+from .authentication import get_playout_scope
+from .models import CacheGeneration
+
+# the responses are stored under the current generation, kept in the database so that bumping it drops them in every
+# worker at once
+GENERATION_NAME = "catalog"
+
+
+def get_cache():
+    return caches["catalog"]
+
+
+def generation():
+    current = CacheGeneration.objects.filter(name=GENERATION_NAME).values_list("generation", flat=True).first()
+    if current is None:
+        current = CacheGeneration.objects.get_or_create(name=GENERATION_NAME)[0].generation
+    return current
+
+
+def invalidate():
+    """
+    Drop the cached responses of the VOD catalog, in every worker, once the current transaction commits. Call it
+    after writing vods, vod assets or raw videos. The responses built meanwhile read the previous rows and are stored
+    under the previous generation, so they are never served afterwards.
+    """
+
+    def bump():
+        if not CacheGeneration.objects.filter(name=GENERATION_NAME).update(generation=F("generation") + 1):
+            CacheGeneration.objects.get_or_create(name=GENERATION_NAME, defaults={"generation": 1})
+
+    transaction.on_commit(bump)
+
+
+class CachedListModelMixin(ListModelMixin):
+    """
+    List served from the "catalog" cache, by URL (query string included) and playout scope of the user, until
+    `invalidate` is called or the entry expires (CATALOG_CACHE_TIMEOUT).
+    A cached list skips the catalog queries and the serialization only: the generation is read from the database,
+    and the request is still authenticated and logged (drf_api_logger) like any other.
+    """
+
+    def get_list_cache_key(self, request):
+        if self.playout_scope_field is None or get_playout_scope(request.user) is None:
+            scope = "all"
+        else:
+            scope = f"user{request.user.pk}"
+        url = hashlib.sha256(request.build_absolute_uri().encode("utf-8")).hexdigest()
+        return f"catalog:{generation()}:{self.basename}:{scope}:{url}"
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        data = get_cache().get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        get_cache().set(key, response.data)
+        return response
@@ -0,0 +1,105 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from config import settings
+from .models import CallbackSubscriber
+
+logger = logging.getLogger(__name__)
+
+
+def try_probe(subscriber_id):
+    """
+    Move an open circuit whose reset timeout elapsed to half-open, so one call can check if the endpoint is back.
+    A half-open circuit whose probe didn't report back within the timeout can be probed again.
+    :return: True if the caller should send the probe
+    """
+    now = timezone.now()
+    return bool(
+        CallbackSubscriber.objects.filter(
+            id=subscriber_id,
+            circuit_state__in=[CallbackSubscriber.CIRCUIT_OPEN, CallbackSubscriber.CIRCUIT_HALF_OPEN],
+            circuit_opened_at__lte=now - timedelta(seconds=settings.CALLBACK_CIRCUIT_RESET_TIMEOUT),
+        ).update(circuit_state=CallbackSubscriber.CIRCUIT_HALF_OPEN, circuit_opened_at=now)
+    )
+
+
+def record(subscriber_id, delivered):
+    """
+    Update the circuit of a subscriber with the result of a call.
+    The circuit opens after CALLBACK_CIRCUIT_FAILURE_THRESHOLD consecutive failures, or when a probe fails.
+    :return: True if the call closed the circuit
+    """
+    subscribers = CallbackSubscriber.objects.filter(id=subscriber_id)
+
+    if delivered:
+        # only write when there is something to reset, this is the hot path
+        closed = subscribers.exclude(circuit_state=CallbackSubscriber.CIRCUIT_CLOSED, consecutive_failures=0).update(
+            circuit_state=CallbackSubscriber.CIRCUIT_CLOSED, circuit_opened_at=None, consecutive_failures=0
+        )
+        return bool(closed)
+
+    subscribers.update(consecutive_failures=F("consecutive_failures") + 1)
+    opened = subscribers.filter(
+        Q(circuit_state=CallbackSubscriber.CIRCUIT_HALF_OPEN)
+        | Q(
+            circuit_state=CallbackSubscriber.CIRCUIT_CLOSED,
+            consecutive_failures__gte=settings.CALLBACK_CIRCUIT_FAILURE_THRESHOLD,
+        )
+    ).update(circuit_state=CallbackSubscriber.CIRCUIT_OPEN, circuit_opened_at=timezone.now())
+    if opened:
+        logger.warning(f"Opened the circuit of callback subscriber {subscriber_id}")
+    return False
+
+
+class AdaptiveLimiter:
+    """
+    Limit of concurrent calls to one endpoint, adapted to the observed latency (AIMD): the limit grows by one per
+    "round" of fast successful calls, and is halved when a call fails or is slower than CALLBACK_LATENCY_TARGET.
+    """
+
+    def __init__(self, initial, minimum, maximum, latency_target):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        :return: True if the call can be made now, the caller must then release
+        """
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency, success):
+        with self._lock:
+            self.in_flight -= 1
+            if success and latency <= self.latency_target:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit / 2)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint):
+    with _limiters_lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            limiter = _limiters[endpoint] = AdaptiveLimiter(
+                initial=settings.CALLBACK_CONCURRENCY_INITIAL,
+                minimum=1,
+                maximum=settings.CALLBACK_WORKERS,
+                latency_target=settings.CALLBACK_LATENCY_TARGET,
+            )
+        return limiter
@@ -1,13 +1,25 @@
+import contextvars
 import json
 import logging
 
 import botocore.exceptions
 from ..utils import get_boto_client
+from . import registry
+from .outputs import stack_output_store
+from .waiter import ChangeSetWaiter
 
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+# ClientRequestToken sent with the stack operations, set by the provisioning job running them (see jobs.run_job)
+request_token = contextvars.ContextVar("request_token", default=None)
+
+
+def request_token_params():
+    token = request_token.get()
+    return {"ClientRequestToken": token} if token else {}
+
 
 class CloudFormationStackGeneric:
     def __init__(self):
@@ -30,15 +42,29 @@ class CloudFormationStackGeneric:
 
         return stack.get("Stacks")[0].get("Outputs", [])
 
+    def refresh_outputs(self):
+        """
+        Fetch the stack outputs from CloudFormation and keep them in the stack output store
+        :return: dict of OutputKey -> OutputValue
+        """
+        return stack_output_store.set(self.stack_name, self.get_outputs())
+
+    def invalidate_outputs(self):
+        stack_output_store.invalidate(self.stack_name)
+
     def get_output_value(self, key):
-        outputs = self.get_outputs()
-        val = None
+        outputs = stack_output_store.get(self.stack_name)
 
-        for output in outputs:
-            if output["OutputKey"] == key:
-                val = output["OutputValue"]
+        # Only go to CloudFormation if we don't know the outputs yet, or the key was added since they were stored
+        if outputs is None or key not in outputs:
+            # a key the stack didn't have a moment ago isn't described again on every lookup
+            if stack_output_store.is_missing(self.stack_name, key):
+                return None
+            outputs = self.refresh_outputs()
+            if key not in outputs:
+                stack_output_store.set_missing(self.stack_name, key)
 
-        return val
+        return outputs.get(key)
 
     @property
     def json(self):
@@ -63,6 +89,7 @@ class CloudFormationStackGeneric:
                 StackName=self.stack_name,
                 TemplateBody=self.minified_json,
                 NotificationARNs=[notification_arn],
+                **request_token_params(),
             )
         except botocore.exceptions.ClientError as err:
             logger.error(f"Couldn't create cloudformation template \n {err}")
@@ -70,12 +97,20 @@ class CloudFormationStackGeneric:
             response = self.cloudformation_client.create_stack(
                 StackName=self.stack_name,
                 TemplateBody=self.minified_json,
+                **request_token_params(),
             )
 
         logger.info(response)
+
+        if response.get("StackId"):
+            registry.record(response["StackId"], self.stack_name, "CREATE_IN_PROGRESS")
+
         return response
 
     def update_change_set(self, region=None):
+        """
+        :return: True if the change set was executed, False if there was nothing to change
+        """
         if region is None:
             region = settings.AWS_DEFAULT_REGION
 
@@ -94,21 +129,19 @@ class CloudFormationStackGeneric:
             # UsePreviousTemplate=True,
         )
 
-        # Wait for the changeset to update, so that the change set can be applied
-        # time.sleep(15)
-        status = ""
-        while status != "CREATE_COMPLETE":
-            stuff = self.cloudformation_client.describe_change_set(
-                ChangeSetName=change_set_name,
-                StackName=self.stack_name,
-            )
-
-            status = stuff["Status"]
+        # Wait for the changeset to be created, so that the change set can be applied
+        # raises ChangeSetFailed/ChangeSetTimeout if it can't be
+        waiter = ChangeSetWaiter(self.cloudformation_client, self.stack_name, change_set_name)
+        if not waiter.wait():
+            return False
 
         self.cloudformation_client.execute_change_set(
             StackName=self.stack_name,
             ChangeSetName=change_set_name,
+            **request_token_params(),
         )
+        self.invalidate_outputs()
+        return True
 
     def update(self):
         """
@@ -122,6 +155,7 @@ class CloudFormationStackGeneric:
                     TemplateBody=self.minified_json,
                 )
                 logger.info(stack_result)
+                stack_output_store.invalidate(self.old_stack_name)
                 return True, ""
             return False, "No Stack with such name and ARN exists"
         except botocore.exceptions.ClientError as ex:
@@ -136,20 +170,22 @@ class CloudFormationStackGeneric:
     def delete(self):
         response = self.cloudformation_client.delete_stack(
             StackName=self.stack_name,
+            **request_token_params(),
         )
         logger.info(response)
+        self.invalidate_outputs()
         return response
 
     def _stack_exists(self):
-        stacks = self.cloudformation_client.list_stacks()["StackSummaries"]
         logger.info(f"Checking if stack with info {self.stack_id} can be modified")
-        for stack in stacks:
-            if stack.get("StackStatus", None) == "DELETE_COMPLETE":
-                continue
-            if self.stack_id == stack.get("StackId", None):
-                self.old_stack_name = stack.get("StackName", None)
-                return True
-        return False
+        # falls back to listing the stacks of the account if we haven't heard of this stack through SNS
+        stack = registry.lookup(self.cloudformation_client, self.stack_id)
+
+        if stack is None or stack.status == "DELETE_COMPLETE":
+            return False
+
+        self.old_stack_name = stack.stack_name
+        return True
 
     def get_status(self):
         try:
@@ -1,7 +1,6 @@
 import logging
 import uuid
 
-import boto3
 from botocore.exceptions import ClientError
 from troposphere import (
     Template,
@@ -53,8 +52,6 @@ class PreviewChannel(CloudFormationStackGeneric):
         self.channel_template = channel_template
         self.flow_obj = flow_obj
         self.flow_name = flow_name
-        self.media_live_client = boto3.client("medialive")
-
         self.preview_mp_channel_id = preview_mp_channel_id
         self.preview_channel_id = preview_channel_id
         self.preview_origin_endpoint_id = preview_origin_endpoint_id
@@ -272,8 +269,6 @@ class MediaLiveChannel(CloudFormationStackGeneric):
         self.preview_origin_endpoint_id = preview_origin_endpoint_id
         self.preview_origin_id = preview_origin_id
 
-        self.media_live_client = boto3.client("medialive")
-
         self.template = self.create_template()
 
     @property
@@ -716,3 +711,19 @@ class MediaLiveChannel(CloudFormationStackGeneric):
 
     def get_distribution_uri(self):
         return self.get_output_value("DistributionUrl")
+
+    def get_initial_input_id(self):
+        return self.get_output_value("MediaLiveInitialInputArn").split(":")[-1]
+
+    @staticmethod
+    def input_output_key(input_id, name):
+        """
+        Key of an output added to this stack by an additional input, e.g. Input{uuid without dashes}Arn
+        """
+        return f"Input{input_id}{name}".replace("-", "")
+
+    def get_input_id(self, input_id):
+        return self.get_output_value(self.input_output_key(input_id, "Arn")).split(":")[-1]
+
+    def get_input_srt_ip(self, input_id):
+        return self.get_output_value(self.input_output_key(input_id, "SRTIP"))
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from config import settings
+from ..cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class StackOutputStore:
+    """
+    Outputs of our CloudFormation stacks, persisted in the StackOutput table with an in-process LRU in front.
+
+    The store is filled when the stack reaches CREATE_COMPLETE/UPDATE_COMPLETE (see cloudformation_handler), and
+    invalidated whenever we change the stack, so the hot control-plane paths don't need to call describe_stacks.
+    Invalidating marks the row instead of deleting it: every STACK_OUTPUT_SYNC_INTERVAL seconds, each process drops
+    the entries of the rows changed since its last check, so the other workers stop serving stale outputs too.
+    """
+
+    def __init__(self, maxsize, ttl, miss_ttl):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        # output keys the stack didn't have when it was last described, by stack name
+        self._misses = LRUCache(maxsize=maxsize, ttl=miss_ttl)
+        self._synced_at = None
+        self._synced_on = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Drop the entries of the stacks whose stored outputs changed in another process, at most once every
+        STACK_OUTPUT_SYNC_INTERVAL seconds
+        """
+        from ..models import StackOutput
+
+        with self._lock:
+            if self._synced_at is not None and time.monotonic() - self._synced_at < settings.STACK_OUTPUT_SYNC_INTERVAL:
+                return
+            last_sync = self._synced_on
+            self._synced_at = time.monotonic()
+            self._synced_on = timezone.now()
+
+        # nothing is cached before the first lookup
+        if last_sync is None:
+            return
+
+        # rows are stamped before their transaction commits, so look back further than the last check
+        since = last_sync - timedelta(seconds=settings.STACK_OUTPUT_SYNC_LOOKBACK)
+        for stack_name in StackOutput.objects.filter(updated_on__gte=since).values_list("stack_name", flat=True):
+            self._cache.delete(stack_name)
+            self._misses.delete(stack_name)
+
+    def get(self, stack_name):
+        """
+        :return: dict of OutputKey -> OutputValue, or None if the outputs of the stack are not known
+        """
+        from ..models import StackOutput
+
+        self.sync()
+        outputs = self._cache.get(stack_name)
+        if outputs is not None:
+            return outputs
+
+        stack_output = (
+            StackOutput.objects.filter(stack_name=stack_name, invalidated_on__isnull=True).only("outputs").first()
+        )
+        if stack_output is None:
+            return None
+
+        self._cache.set(stack_name, stack_output.outputs)
+        return stack_output.outputs
+
+    def set(self, stack_name, outputs):
+        """
+        :param outputs: list of outputs as returned by describe_stacks
+        :return: dict of OutputKey -> OutputValue
+        """
+        from ..models import StackOutput
+
+        values = {output["OutputKey"]: output["OutputValue"] for output in outputs}
+        # only write the row when the outputs changed, the other processes drop their entries when it is written
+        if not StackOutput.objects.filter(stack_name=stack_name, outputs=values, invalidated_on__isnull=True).exists():
+            StackOutput.objects.update_or_create(
+                stack_name=stack_name, defaults={"outputs": values, "invalidated_on": None}
+            )
+        self._cache.set(stack_name, values)
+        self._misses.delete(stack_name)
+        return values
+
+    def is_missing(self, stack_name, key):
+        """
+        :return: whether the stack didn't have the output `key` when it was described less than
+        STACK_OUTPUT_MISS_TTL seconds ago
+        """
+        return key in self._misses.get(stack_name, frozenset())
+
+    def set_missing(self, stack_name, key):
+        self._misses.set(stack_name, self._misses.get(stack_name, frozenset()) | {key})
+
+    def invalidate(self, stack_name):
+        from ..models import StackOutput
+
+        logger.info(f"Invalidating stored outputs of {stack_name}")
+        self._cache.delete(stack_name)
+        self._misses.delete(stack_name)
+        StackOutput.objects.filter(stack_name=stack_name).update(
+            invalidated_on=timezone.now(), updated_on=timezone.now()
+        )
+
+
+stack_output_store = StackOutputStore(
+    maxsize=settings.STACK_OUTPUT_CACHE_SIZE,
+    ttl=settings.STACK_OUTPUT_CACHE_TTL,
+    miss_ttl=settings.STACK_OUTPUT_MISS_TTL,
+)
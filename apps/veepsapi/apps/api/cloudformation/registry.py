@@ -0,0 +1,91 @@
+import logging
+import threading
+
+from config import settings
+from ..cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# stack ids the last reconcile didn't find, not looked for again until they expire
+missing_stacks = LRUCache(maxsize=settings.STACK_REGISTRY_MISS_CACHE_SIZE, ttl=settings.STACK_REGISTRY_MISS_TTL)
+# holds an entry while the stacks were reconciled less than STACK_REGISTRY_RECONCILE_INTERVAL seconds ago
+recent_reconciles = LRUCache(maxsize=1, ttl=settings.STACK_REGISTRY_RECONCILE_INTERVAL)
+_reconcile_lock = threading.Lock()
+
+
+def record(stack_id, stack_name, status, event=None):
+    """
+    Create or update the registry entry of a stack
+    """
+    from ..models import CloudFormationStack
+
+    defaults = {"stack_name": stack_name, "status": status}
+    if event is not None:
+        defaults["last_event"] = event
+
+    stack, _ = CloudFormationStack.objects.update_or_create(stack_id=stack_id, defaults=defaults)
+    missing_stacks.delete(stack_id)
+    return stack
+
+
+def find(stack_id):
+    from ..models import CloudFormationStack
+
+    if not stack_id:
+        return None
+    return CloudFormationStack.objects.filter(stack_id=stack_id).first()
+
+
+def lookup(cloudformation_client, stack_id):
+    """
+    The registry entry of a stack, reconciling the registry for a stack we haven't heard about through SNS. The
+    stacks are listed at most once every STACK_REGISTRY_RECONCILE_INTERVAL seconds per process, and a stack they
+    didn't include isn't looked for again for STACK_REGISTRY_MISS_TTL seconds.
+    """
+    stack = find(stack_id)
+    if stack is not None or not stack_id or stack_id in missing_stacks:
+        return stack
+
+    with _reconcile_lock:
+        due = "stacks" not in recent_reconciles
+        if due:
+            recent_reconciles.set("stacks", True)
+    if due:
+        reconcile(cloudformation_client)
+        stack = find(stack_id)
+
+    if stack is None:
+        missing_stacks.set(stack_id, True)
+    return stack
+
+
+def reconcile(cloudformation_client):
+    """
+    Bring the registry in line with every page of list_stacks. Only meant as a fallback for stacks we
+    haven't heard about through SNS, as it walks the whole stack history of the account.
+    :return: number of stacks seen
+    """
+    from ..models import CloudFormationStack
+
+    paginator = cloudformation_client.get_paginator("list_stacks")
+    count = 0
+
+    for page in paginator.paginate():
+        stacks = [
+            CloudFormationStack(
+                stack_id=summary["StackId"],
+                stack_name=summary["StackName"],
+                status=summary.get("StackStatus", ""),
+            )
+            for summary in page.get("StackSummaries", [])
+        ]
+        CloudFormationStack.objects.bulk_create(
+            stacks,
+            update_conflicts=True,
+            unique_fields=["stack_id"],
+            update_fields=["stack_name", "status"],
+        )
+        count += len(stacks)
+
+    logger.info(f"Reconciled {count} stacks with CloudFormation")
+    return count
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import logging
+
+from config import settings
+from ..cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts):
+    """
+    Stable hash of the configuration a template is built from
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class TemplateCache:
+    """
+    Built troposphere templates, keyed by a fingerprint of the configuration they were built from.
+
+    Cached templates are shared between requests of the same worker, so they must be treated as read-only:
+    anything that adds resources to a template has to start from a freshly built one.
+    """
+
+    def __init__(self, maxsize):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def get_or_build(self, parts, builder):
+        key = fingerprint(*parts)
+        template = self._cache.get(key)
+        if template is None:
+            logger.debug(f"Building template {key}")
+            template = builder()
+            self._cache.set(key, template)
+        return template
+
+    def clear(self):
+        self._cache.clear()
+
+
+template_cache = TemplateCache(maxsize=settings.TEMPLATE_CACHE_SIZE)
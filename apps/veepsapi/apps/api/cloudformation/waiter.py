@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+
+import botocore.exceptions
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# CloudFormation refuses to create a change set that doesn't change anything, we treat that as a no-op
+NO_CHANGES_REASONS = ["didn't contain changes", "No updates are to be performed"]
+
+
+class ChangeSetFailed(Exception):
+    pass
+
+
+class ChangeSetTimeout(Exception):
+    pass
+
+
+class ChangeSetWaiter:
+    """
+    Wait for a change set to be created, with exponential backoff and jitter between describe_change_set calls.
+    CloudFormation doesn't notify the creation of a change set, polling is the only way to know.
+    """
+
+    def __init__(self, client, stack_name, change_set_name, timeout=None, base_delay=None, max_delay=None):
+        self.client = client
+        self.stack_name = stack_name
+        self.change_set_name = change_set_name
+        self.timeout = settings.CHANGE_SET_WAIT_TIMEOUT if timeout is None else timeout
+        self.base_delay = settings.CHANGE_SET_POLL_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = settings.CHANGE_SET_POLL_MAX_DELAY if max_delay is None else max_delay
+
+    def poll(self):
+        """
+        Check the change set once
+        :return: True if it can be executed, False if it is still being created, None if it has nothing to change
+        """
+        response = self.client.describe_change_set(
+            ChangeSetName=self.change_set_name,
+            StackName=self.stack_name,
+        )
+        status = response["Status"]
+
+        if status == "CREATE_COMPLETE":
+            return True
+
+        if status == "FAILED":
+            reason = response.get("StatusReason", "")
+            self.delete()
+            if any(no_changes in reason for no_changes in NO_CHANGES_REASONS):
+                logger.info(f"Change set {self.change_set_name} has nothing to change")
+                return None
+            raise ChangeSetFailed(f"Change set {self.change_set_name} failed: {reason}")
+
+        return False
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        # "equal jitter", so that concurrent waiters don't poll in lockstep
+        return delay / 2 + random.uniform(0, delay / 2)  # nosec B311
+
+    def wait(self):
+        """
+        :return: True once the change set can be executed, False if it has nothing to change
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+
+        while True:
+            ready = self.poll()
+            if ready is None:
+                return False
+            if ready:
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.delete()
+                raise ChangeSetTimeout(f"Change set {self.change_set_name} not ready after {self.timeout}s")
+
+            time.sleep(min(self.delay(attempt), remaining))
+            attempt += 1
+
+    def delete(self):
+        # a failed change set keeps its name taken, so the next update couldn't reuse it
+        try:
+            self.client.delete_change_set(ChangeSetName=self.change_set_name, StackName=self.stack_name)
+        except botocore.exceptions.ClientError as err:
+            logger.error(f"Couldn't delete change set {self.change_set_name} \n {err}")
@@ -0,0 +1,293 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from config import settings
+from . import circuit, outbox, tasks
+from .models import CallbackEvent, CallbackSubscriber
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    return min(settings.CALLBACK_RETRY_MAX_DELAY, settings.CALLBACK_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def pending_events():
+    now = timezone.now()
+    return CallbackEvent.objects.filter(delivered_status=False, next_attempt_at__lte=now).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+
+
+def due_events():
+    # events of subscribers whose circuit isn't closed are parked until a probe closes it
+    return pending_events().filter(subscriber__circuit_state=CallbackSubscriber.CIRCUIT_CLOSED)
+
+
+def postpone(event_ids):
+    # the endpoint is at its concurrency limit, try again shortly without using a retry
+    CallbackEvent.objects.filter(id__in=event_ids).update(
+        next_attempt_at=timezone.now() + timedelta(seconds=settings.CALLBACK_LIMITED_DELAY), locked_until=None
+    )
+
+
+def finish(event_ids, delivered):
+    """
+    Release the events after a call, and schedule the next attempt of the ones not delivered.
+    An event is retried up to `retry_count` times of its subscriber.
+    """
+    if delivered:
+        CallbackEvent.objects.filter(id__in=event_ids).update(
+            next_attempt_at=None, locked_until=None, updated_on=timezone.now()
+        )
+        return
+
+    for event in CallbackEvent.objects.select_related("subscriber").filter(id__in=event_ids):
+        if event.retried_count > event.subscriber.retry_count:
+            logger.warning(f"Callback event {event.id} not delivered after {event.retried_count} attempts, giving up")
+            next_attempt_at = None
+        else:
+            next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(event.retried_count))
+
+        CallbackEvent.objects.filter(id=event.id).update(
+            next_attempt_at=next_attempt_at, locked_until=None, updated_on=timezone.now()
+        )
+
+
+def deliver(event_id, probe=False):
+    """
+    Call the endpoint of a callback event if it is due
+    :param probe: the call probes a half-open circuit
+    :return: True if the event was delivered
+    """
+    event = CallbackEvent.objects.select_related("subscriber").filter(id=event_id).first()
+    if event is None:
+        return False
+
+    lease = timedelta(seconds=settings.CALLBACK_LEASE_TIMEOUT)
+    events = pending_events() if probe else due_events()
+
+    # conditional update, so an event is only called by one worker at a time
+    if not events.filter(id=event_id).update(locked_until=timezone.now() + lease):
+        return False
+
+    limiter = circuit.get_limiter(event.subscriber.endpoint)
+    if not limiter.acquire():
+        postpone([event_id])
+        return False
+
+    started = time.monotonic()
+    delivered = False
+    try:
+        delivered = tasks.call_webhook(event_id)
+    except Exception:
+        logger.exception(f"Couldn't call the endpoint of callback event {event_id}")
+    finally:
+        limiter.release(time.monotonic() - started, delivered)
+
+    finish([event_id], delivered)
+    if circuit.record(event.subscriber_id, delivered):
+        delivery_engine.drain(event.subscriber)
+    return delivered
+
+
+def deliver_batch(subscriber_id, force=False, probe=False):
+    """
+    Send the due events of a batch subscriber as one array payload, once `batch_max_size` events are waiting or
+    the oldest one waited `batch_max_linger` seconds (or right away with `force`)
+    :param probe: send one batch to probe a half-open circuit
+    :return: number of events sent
+    """
+    subscriber = CallbackSubscriber.objects.get(id=subscriber_id)
+    lease = timedelta(seconds=settings.CALLBACK_LEASE_TIMEOUT)
+    limiter = circuit.get_limiter(subscriber.endpoint)
+    force = force or probe
+    sent = 0
+
+    while True:
+        events = (pending_events() if probe else due_events()).filter(subscriber_id=subscriber_id)
+        events = events.order_by("created_on", "id")
+        oldest = events.values_list("created_on", flat=True).first()
+        if oldest is None:
+            return sent
+
+        lingered = oldest <= timezone.now() - timedelta(seconds=subscriber.batch_max_linger)
+        if not (force or lingered or events.count() >= subscriber.batch_max_size):
+            return sent
+
+        with transaction.atomic():
+            event_ids = list(
+                events.select_for_update(skip_locked=True).values_list("id", flat=True)[: subscriber.batch_max_size]
+            )
+            CallbackEvent.objects.filter(id__in=event_ids).update(locked_until=timezone.now() + lease)
+        if not event_ids:
+            return sent
+
+        if not limiter.acquire():
+            postpone(event_ids)
+            return sent
+
+        started = time.monotonic()
+        delivered = False
+        try:
+            delivered = tasks.call_webhook_batch(event_ids)
+        except Exception:
+            logger.exception(f"Couldn't call the endpoint of batch subscriber {subscriber_id}")
+        finally:
+            limiter.release(time.monotonic() - started, delivered)
+
+        finish(event_ids, delivered)
+        sent += len(event_ids)
+        force = probe = False
+
+        closed = circuit.record(subscriber_id, delivered)
+        if not delivered:
+            return sent
+        if len(event_ids) < subscriber.batch_max_size and not closed:
+            return sent
+
+
+class CallbackDeliveryEngine:
+    """
+    Calls the subscriber endpoints of callback events in a pool of workers, so slow subscribers never hold up
+    the caller. Retries that are due are picked up by the `run_background_workers` command.
+
+    The callback events table is the outbox: events are written in the transaction of the state change they report.
+    With CALLBACK_OUTBOX_RELAY, they are only delivered by the `run_background_workers` command, woken up by a
+    NOTIFY once they are committed; otherwise the worker that wrote them delivers them after the commit.
+
+    Events of batch subscribers are held until a batch is full or lingered long enough, then sent together.
+    Events of a subscriber whose circuit is open are parked, and drained once a probe closed the circuit.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._lingering = set()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="callback")
+            return self._executor
+
+    def enqueue(self, events):
+        if settings.CALLBACK_OUTBOX_RELAY:
+            outbox.notify()
+            return
+
+        event_ids = [event.id for event in events if not event.subscriber.batch_enabled]
+        batch_subscribers = {event.subscriber for event in events if event.subscriber.batch_enabled}
+
+        # only hand the events over once they are committed
+        def submit():
+            for event_id in event_ids:
+                self.executor.submit(self.run, deliver, event_id)
+            for subscriber in batch_subscribers:
+                self.schedule_batch(subscriber)
+
+        transaction.on_commit(submit)
+
+    def schedule_batch(self, subscriber):
+        # send right away if the batch is full, otherwise once it lingered long enough
+        self.executor.submit(self.run, deliver_batch, subscriber.id)
+
+        with self._lock:
+            if subscriber.id in self._lingering:
+                return
+            self._lingering.add(subscriber.id)
+
+        timer = threading.Timer(subscriber.batch_max_linger, self.flush_lingering, args=[subscriber.id])
+        timer.daemon = True
+        timer.start()
+
+    def flush_lingering(self, subscriber_id):
+        with self._lock:
+            self._lingering.discard(subscriber_id)
+        self.executor.submit(self.run, deliver_batch, subscriber_id, True)
+
+    def drain(self, subscriber):
+        """
+        Deliver the events parked while the circuit of `subscriber` was open
+        """
+        logger.info(f"Circuit of callback subscriber {subscriber.id} closed, delivering its parked events")
+        if subscriber.batch_enabled:
+            self.executor.submit(self.run, deliver_batch, subscriber.id, True)
+            return
+
+        event_ids = (
+            due_events()
+            .filter(subscriber_id=subscriber.id)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[: settings.CALLBACK_BATCH_SIZE]
+        )
+        for event_id in event_ids:
+            self.executor.submit(self.run, deliver, event_id)
+
+    @staticmethod
+    def probe(subscriber):
+        if subscriber.batch_enabled:
+            return deliver_batch(subscriber.id, probe=True)
+
+        event_id = (
+            pending_events()
+            .filter(subscriber_id=subscriber.id)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if event_id is None:
+            return 0
+        deliver(event_id, probe=True)
+        return 1
+
+    @staticmethod
+    def run(func, *args):
+        try:
+            return func(*args)
+        except Exception:
+            logger.exception(f"Couldn't deliver callback events ({func.__name__}{args})")
+        finally:
+            close_old_connections()
+
+    def deliver_due(self, batch_size=None):
+        """
+        Deliver the events whose (re)try is due, the batches that lingered long enough, and probe the open circuits
+        :return: number of events handled
+        """
+        batch_size = batch_size or settings.CALLBACK_BATCH_SIZE
+        event_ids = list(
+            due_events()
+            .filter(subscriber__batch_enabled=False)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        subscriber_ids = list(
+            due_events().filter(subscriber__batch_enabled=True).values_list("subscriber_id", flat=True).distinct()
+        )
+
+        # probe the circuits that stayed open long enough
+        probed = [
+            subscriber
+            for subscriber in CallbackSubscriber.objects.exclude(circuit_state=CallbackSubscriber.CIRCUIT_CLOSED)
+            if circuit.try_probe(subscriber.id)
+        ]
+
+        futures = [self.executor.submit(self.run, deliver, event_id) for event_id in event_ids]
+        batch_futures = [
+            self.executor.submit(self.run, deliver_batch, subscriber_id) for subscriber_id in subscriber_ids
+        ] + [self.executor.submit(self.run, self.probe, subscriber) for subscriber in probed]
+        wait(futures + batch_futures)
+        return len(event_ids) + sum(future.result() or 0 for future in batch_futures)
+
+
+delivery_engine = CallbackDeliveryEngine(max_workers=settings.CALLBACK_WORKERS)
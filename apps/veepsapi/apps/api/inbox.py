@@ -0,0 +1,260 @@
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from config import settings
+from . import metrics
+from .cache import LRUCache
+from .models import InboxMessage
+
+logger = logging.getLogger(__name__)
+
+CLOUDFORMATION_SUBJECT = "AWS CloudFormation Notification"
+
+# MessageIds seen recently by this worker, so most SNS redeliveries are dropped without a database round trip
+seen_messages = LRUCache(maxsize=settings.INBOX_DEDUPE_CACHE_SIZE, ttl=settings.INBOX_DEDUPE_CACHE_TTL)
+
+
+def ordering_key(json_data):
+    """
+    Key the notifications of one playout resource are ordered by: the stack name for CloudFormation notifications,
+    the resource (channel, flow, harvest job, ...) for the EventBridge ones
+    """
+    if json_data.get("Subject") == CLOUDFORMATION_SUBJECT:
+        for line in (json_data.get("Message") or "").split("\n"):
+            if line.startswith("StackName="):
+                return line.split("=", 1)[1].replace("'", "")
+        return ""
+
+    try:
+        message = json.loads(json_data.get("Message") or "{}")
+    except ValueError:
+        return ""
+
+    resources = message.get("resources") or []
+    return resources[0] if resources else message.get("source", "")
+
+
+def store(json_data):
+    """
+    Write an SNS notification to the inbox, it is processed once the transaction commits.
+    Notifications are deduplicated on their MessageId, the inbox rows being the index of the ids seen.
+    :return: the new inbox message, None if the notification is a duplicate
+    """
+    message_id = json_data.get("MessageId", "")
+
+    if message_id and message_id in seen_messages:
+        metrics.increment("inbox.dedupe.memory_hits")
+        logger.info(f"Dropping duplicate SNS message {message_id}")
+        return None
+
+    defaults = {
+        "topic_arn": json_data.get("TopicArn", ""),
+        "subject": json_data.get("Subject") or "",
+        "body": json_data,
+        "ordering_key": ordering_key(json_data)[:256],
+    }
+    if message_id:
+        message, created = InboxMessage.objects.get_or_create(message_id=message_id, defaults=defaults)
+        # only remember the id once the row is committed, a rolled back notification must be accepted again
+        transaction.on_commit(lambda: seen_messages.set(message_id, True))
+        if not created:
+            metrics.increment("inbox.dedupe.db_hits")
+            logger.info(f"Dropping duplicate SNS message {message_id}")
+            return None
+    else:
+        message = InboxMessage.objects.create(**defaults)
+
+    metrics.increment("inbox.dedupe.misses")
+    consumer_pool.wake()
+    return message
+
+
+def dedupe_stats():
+    memory_hits = metrics.get("inbox.dedupe.memory_hits")
+    db_hits = metrics.get("inbox.dedupe.db_hits")
+    misses = metrics.get("inbox.dedupe.misses")
+    total = memory_hits + db_hits + misses
+    return {
+        "memory_hits": memory_hits,
+        "db_hits": db_hits,
+        "misses": misses,
+        "hit_rate": metrics.ratio(memory_hits + db_hits, total),
+        "memory_hit_rate": metrics.ratio(memory_hits, memory_hits + db_hits),
+    }
+
+
+def purge(batch_size=1000):
+    """
+    Forget processed messages older than INBOX_DEDUPE_RETENTION, which bounds the dedupe index.
+    Dead messages are kept until they are dealt with.
+    :return: number of messages deleted
+    """
+    expired = timezone.now() - timedelta(seconds=settings.INBOX_DEDUPE_RETENTION)
+    ids = InboxMessage.objects.filter(status=InboxMessage.STATUS_DONE, processed_on__lt=expired).values_list(
+        "id", flat=True
+    )[:batch_size]
+    deleted, _ = InboxMessage.objects.filter(id__in=list(ids)).delete()
+    return deleted
+
+
+def claim(batch_size):
+    """
+    Take up to `batch_size` messages that are due, skipping messages that have an older unfinished message with the
+    same ordering key. A message whose consumer died is claimed again once its lease expired.
+    :return: list of claimed messages
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=settings.INBOX_LEASE_TIMEOUT)
+
+    unfinished_before = InboxMessage.objects.filter(
+        ordering_key=OuterRef("ordering_key"),
+        id__lt=OuterRef("id"),
+        status__in=[InboxMessage.STATUS_PENDING, InboxMessage.STATUS_PROCESSING],
+    )
+
+    with transaction.atomic():
+        messages = list(
+            InboxMessage.objects.filter(
+                Q(status=InboxMessage.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=InboxMessage.STATUS_PROCESSING, updated_on__lt=lease_expired)
+            )
+            .exclude(Exists(unfinished_before))
+            .order_by("id")
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if messages:
+            InboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+                status=InboxMessage.STATUS_PROCESSING, attempts=F("attempts") + 1, updated_on=now
+            )
+
+    for message in messages:
+        message.status = InboxMessage.STATUS_PROCESSING
+        message.attempts += 1
+    return messages
+
+
+class LeaseRenewal:
+    """
+    Keeps the lease of claimed messages while they are processed, touching them every third of INBOX_LEASE_TIMEOUT
+    from a background thread, so the messages of a slow handler are not claimed again by another consumer
+    """
+
+    def __init__(self, message_ids):
+        self.message_ids = message_ids
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="inbox-lease", daemon=True)
+
+    def run(self):
+        try:
+            while not self._stopped.wait(settings.INBOX_LEASE_TIMEOUT / 3):
+                InboxMessage.objects.filter(id__in=self.message_ids, status=InboxMessage.STATUS_PROCESSING).update(
+                    updated_on=timezone.now()
+                )
+        except Exception:
+            logger.exception("Couldn't renew the lease of the inbox messages")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def retry_delay(attempts):
+    return min(settings.INBOX_RETRY_MAX_DELAY, settings.INBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def process(message):
+    """
+    Run the notification handler, the side effects of the handler and the `done` status are committed together
+    :return: True if the message was processed
+    """
+    from .webhook_views import dispatch_notification
+
+    try:
+        with transaction.atomic():
+            dispatch_notification(message.body)
+            InboxMessage.objects.filter(id=message.id).update(
+                status=InboxMessage.STATUS_DONE, last_error="", processed_on=timezone.now(), updated_on=timezone.now()
+            )
+        return True
+    except Exception:
+        error = traceback.format_exc()
+        if message.attempts >= settings.INBOX_MAX_ATTEMPTS:
+            logger.exception(f"Inbox message {message.id} failed {message.attempts} times, giving up")
+            InboxMessage.objects.filter(id=message.id).update(
+                status=InboxMessage.STATUS_DEAD, last_error=error, updated_on=timezone.now()
+            )
+        else:
+            delay = retry_delay(message.attempts)
+            logger.warning(f"Inbox message {message.id} failed, retrying in {delay}s")
+            InboxMessage.objects.filter(id=message.id).update(
+                status=InboxMessage.STATUS_PENDING,
+                last_error=error,
+                next_attempt_at=timezone.now() + timedelta(seconds=delay),
+                updated_on=timezone.now(),
+            )
+        return False
+
+
+def process_pending(batch_size=None):
+    """
+    Drain the inbox until no message is due
+    :return: number of messages handled
+    """
+    batch_size = batch_size or settings.INBOX_BATCH_SIZE
+    handled = 0
+    while True:
+        messages = claim(batch_size)
+        if not messages:
+            return handled
+        with LeaseRenewal([message.id for message in messages]):
+            for message in messages:
+                process(message)
+        handled += len(messages)
+
+
+class InboxConsumerPool:
+    """
+    Drains the inbox in the background of the worker that received the notification.
+    Messages waiting for a retry are picked up by the `run_background_workers` command.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inbox")
+            return self._executor
+
+    def wake(self):
+        transaction.on_commit(lambda: self.executor.submit(self.drain))
+
+    @staticmethod
+    def drain():
+        try:
+            process_pending()
+        except Exception:
+            logger.exception("Couldn't drain the inbox")
+        finally:
+            close_old_connections()
+
+
+consumer_pool = InboxConsumerPool(max_workers=settings.INBOX_WORKERS)
@@ -0,0 +1,215 @@
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from config import settings
+from .cloudformation import request_token
+from .models import Input, ProvisioningJob
+from .serializers import InputSerializer, PlayoutSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class ProvisioningWorkerPool:
+    """
+    Runs provisioning jobs outside of the request, with at most `max_workers` stack operations at a time.
+    The executor is created lazily so that every (gunicorn) worker process gets its own.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="provisioning")
+            return self._executor
+
+    def submit(self, job):
+        # only hand the job over once the rows it works on are committed
+        transaction.on_commit(lambda: self.executor.submit(run_job, job.id))
+
+
+worker_pool = ProvisioningWorkerPool(max_workers=settings.PROVISIONING_MAX_WORKERS)
+
+
+def enqueue(kind, playout, object_id=None):
+    job = ProvisioningJob.objects.create(
+        kind=kind,
+        playout=playout,
+        object_id=str(object_id or playout.id),
+        stack_name=playout.channel.cloudformation_channel_name if playout.channel_id else None,
+    )
+    worker_pool.submit(job)
+    return job
+
+
+def claim(job):
+    """
+    Move the job to RUNNING, unless an earlier job of its stack isn't finished: CloudFormation rejects the operations
+    on a stack being updated, so the jobs of a stack run one after the other (see start_next).
+    A playout deletion doesn't wait for the jobs of the stack CloudFormation hasn't reported on, it supersedes them.
+    :return: True if the job was claimed
+    """
+    if not job.stack_name:
+        return job.set_status(ProvisioningJob.STATUS_RUNNING, from_statuses=[ProvisioningJob.STATUS_PENDING])
+
+    with transaction.atomic():
+        # serializes the claims of the jobs of the stack, across processes
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [job.stack_name])
+
+        others = ProvisioningJob.objects.filter(stack_name=job.stack_name).exclude(id=job.id)
+        if job.kind == ProvisioningJob.KIND_PLAYOUT_DELETE:
+            others.filter(status=ProvisioningJob.STATUS_WAITING).update(
+                status=ProvisioningJob.STATUS_FAILED,
+                detail=f"Superseded by the {job.kind} job {job.id}",
+                finished_on=timezone.now(),
+                updated_on=timezone.now(),
+            )
+
+        active = others.filter(status__in=[ProvisioningJob.STATUS_RUNNING, ProvisioningJob.STATUS_WAITING])
+        earlier = others.filter(status=ProvisioningJob.STATUS_PENDING, created_on__lt=job.created_on)
+        if active.exists() or earlier.exists():
+            logger.info(f"Provisioning job {job.id} waits for the earlier jobs of {job.stack_name}")
+            return False
+
+        return job.set_status(ProvisioningJob.STATUS_RUNNING, from_statuses=[ProvisioningJob.STATUS_PENDING])
+
+
+def start_next(stack_name):
+    """
+    Submit the oldest pending job of the stack, call it once a job of the stack finished
+    """
+    job = (
+        ProvisioningJob.objects.filter(stack_name=stack_name, status=ProvisioningJob.STATUS_PENDING)
+        .order_by("created_on")
+        .first()
+    )
+    if job is not None:
+        worker_pool.submit(job)
+
+
+def run_job(job_id):
+    job = ProvisioningJob.objects.get(id=job_id)
+    token = request_token.set(job.request_token)
+    try:
+        if claim(job):
+            JOB_HANDLERS[job.kind](job)
+    except Exception:
+        logger.exception(f"Provisioning job {job.id} ({job.kind}) failed")
+        job.set_status(ProvisioningJob.STATUS_FAILED, traceback.format_exc())
+    finally:
+        request_token.reset(token)
+
+    try:
+        if job.stack_name and job.status in [ProvisioningJob.STATUS_SUCCEEDED, ProvisioningJob.STATUS_FAILED]:
+            start_next(job.stack_name)
+    finally:
+        close_old_connections()
+
+
+def sweep():
+    """
+    Background step recovering the jobs lost with their worker process or CloudFormation notification:
+    - the jobs RUNNING for more than PROVISIONING_RUNNING_TIMEOUT seconds are pending again
+    - the jobs WAITING for more than PROVISIONING_WAITING_TIMEOUT seconds failed
+    - the jobs pending for more than PROVISIONING_PENDING_DELAY seconds are submitted, if their stack is free
+    :return: number of jobs re-queued or failed
+    """
+    now = timezone.now()
+
+    requeued = ProvisioningJob.objects.filter(
+        status=ProvisioningJob.STATUS_RUNNING,
+        updated_on__lt=now - timedelta(seconds=settings.PROVISIONING_RUNNING_TIMEOUT),
+    ).update(status=ProvisioningJob.STATUS_PENDING, detail="Re-queued, its worker stopped", updated_on=now)
+
+    expired = ProvisioningJob.objects.filter(
+        status=ProvisioningJob.STATUS_WAITING,
+        updated_on__lt=now - timedelta(seconds=settings.PROVISIONING_WAITING_TIMEOUT),
+    ).update(
+        status=ProvisioningJob.STATUS_FAILED,
+        detail="No stack notification received",
+        finished_on=now,
+        updated_on=now,
+    )
+
+    busy_stacks = ProvisioningJob.objects.filter(
+        stack_name__isnull=False, status__in=[ProvisioningJob.STATUS_RUNNING, ProvisioningJob.STATUS_WAITING]
+    ).values("stack_name")
+    pending = (
+        ProvisioningJob.objects.filter(
+            status=ProvisioningJob.STATUS_PENDING,
+            created_on__lt=now - timedelta(seconds=settings.PROVISIONING_PENDING_DELAY),
+        )
+        .exclude(stack_name__in=busy_stacks)
+        .order_by("created_on")
+    )
+
+    # only the oldest job of each stack can be claimed
+    stack_names = set()
+    for job in pending:
+        if job.stack_name is None or job.stack_name not in stack_names:
+            stack_names.add(job.stack_name)
+            worker_pool.submit(job)
+
+    if requeued or expired:
+        logger.warning(f"Re-queued {requeued} stale running provisioning jobs, failed {expired} waiting ones")
+    return requeued + expired
+
+
+def _wait_for_stack(job, executed=True):
+    if not executed:
+        job.set_status(ProvisioningJob.STATUS_SUCCEEDED, "No changes to the stack")
+        return
+
+    # cloudformation_handler finishes the job once the stack notification arrives
+    job.set_status(ProvisioningJob.STATUS_WAITING, from_statuses=[ProvisioningJob.STATUS_RUNNING])
+
+
+def create_playout(job):
+    PlayoutSerializer.create_channel(job.playout)
+    _wait_for_stack(job)
+
+
+def delete_playout(job):
+    playout = job.playout
+    if playout is None:
+        job.set_status(ProvisioningJob.STATUS_SUCCEEDED, "Playout already deleted")
+        return
+
+    has_stack = playout.channel_id is not None
+    PlayoutSerializer().delete(playout)
+
+    if has_stack:
+        _wait_for_stack(job)
+    else:
+        job.set_status(ProvisioningJob.STATUS_SUCCEEDED)
+
+
+def create_input(job):
+    channel_input = Input.objects.get(id=job.object_id)
+    executed = InputSerializer().create_input(channel_input)
+    _wait_for_stack(job, executed is not False)
+
+
+def delete_input(job):
+    channel_input = Input.objects.get(id=job.object_id)
+    executed = InputSerializer.destroy(channel_input)
+    _wait_for_stack(job, executed is not False)
+
+
+JOB_HANDLERS = {
+    ProvisioningJob.KIND_PLAYOUT_CREATE: create_playout,
+    ProvisioningJob.KIND_PLAYOUT_DELETE: delete_playout,
+    ProvisioningJob.KIND_INPUT_CREATE: create_input,
+    ProvisioningJob.KIND_INPUT_DELETE: delete_input,
+}
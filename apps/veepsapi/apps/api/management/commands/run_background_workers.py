@@ -0,0 +1,56 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.api import inbox, jobs, retention
+from apps.api.outbox import OutboxRelay
+from apps.api.delivery import delivery_engine
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Process background work: SNS notifications waiting in the inbox (retries, leftovers of dead workers), "
+        "purge of the processed notifications, stale provisioning jobs, callback events and retries, retention of the "
+        "callback logs and events"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait for new callback events when there is nothing to do",
+        )
+        parser.add_argument("--once", action="store_true", help="Run every step once and exit")
+
+    def steps(self):
+        return [
+            ("inbox", inbox.process_pending),
+            ("inbox purge", inbox.purge),
+            ("provisioning jobs", jobs.sweep),
+            ("callbacks", delivery_engine.deliver_due),
+            ("callback retention", retention.run),
+        ]
+
+    def handle(self, *args, **options):
+        # new callback events wake the command up as soon as they are committed
+        relay = OutboxRelay()
+
+        while True:
+            handled = 0
+            for name, step in self.steps():
+                try:
+                    handled += step() or 0
+                except Exception:
+                    logger.exception(f"Background step {name} failed")
+                finally:
+                    close_old_connections()
+
+            if options["once"]:
+                relay.close()
+                return
+            if not handled:
+                relay.wait(options["interval"])
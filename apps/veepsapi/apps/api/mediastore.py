@@ -0,0 +1,201 @@
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from config import settings
+from . import utils
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# folder of the container the archives are listed from
+ROOT_PATH = "out"
+
+# data endpoint of the MediaStore container of each playout, by playout id. It only changes if the container is
+# recreated, the entry is dropped when listing from it fails.
+container_endpoints = LRUCache(
+    maxsize=settings.MEDIASTORE_ENDPOINT_CACHE_SIZE, ttl=settings.MEDIASTORE_ENDPOINT_CACHE_TTL
+)
+# complete listings, by playout id and depth, to absorb the repeated requests of the UI
+listings = LRUCache(maxsize=settings.MEDIASTORE_LISTING_CACHE_SIZE, ttl=settings.MEDIASTORE_LISTING_CACHE_TTL)
+
+
+def container_name(playout_id):
+    return f"MSCMediaLiveChannel{playout_id}".replace("-", "")
+
+
+def get_endpoint(playout_id):
+    """
+    :return: data endpoint of the MediaStore container of the playout
+    :raise ClientError: ContainerNotFoundException if the playout has no container
+    """
+
+    def describe():
+        client = utils.get_boto_client("mediastore")
+        return client.describe_container(ContainerName=container_name(playout_id))["Container"]["Endpoint"]
+
+    return container_endpoints.get_or_set(str(playout_id), describe)
+
+
+class MediaStoreLister:
+    """
+    Lists the items of a MediaStore container, paging through list_items, with the sub-folders listed concurrently
+    by a pool of threads shared by the requests of the worker
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mediastore")
+            return self._executor
+
+    @staticmethod
+    def pages(endpoint, path):
+        """
+        :return: generator of the pages of items of the folder at `path`, each item with its `Path` in the container
+        """
+        client = utils.get_boto_client("mediastore-data", endpoint_url=endpoint)
+        params = {"Path": path, "MaxResults": settings.MEDIASTORE_PAGE_SIZE}
+        while True:
+            response = client.list_items(**params)
+            items = response.get("Items", [])
+            for item in items:
+                item["Path"] = f"{path}/{item['Name']}"
+            yield items
+
+            if not response.get("NextToken"):
+                return
+            params["NextToken"] = response["NextToken"]
+
+    @staticmethod
+    def publish(results, cancelled, message):
+        """
+        Queue a message for the listing, waiting for room as long as the listing is being read
+        :return: False if the listing was cancelled, or not read for MEDIASTORE_LIST_TIMEOUT seconds
+        """
+        deadline = time.monotonic() + settings.MEDIASTORE_LIST_TIMEOUT
+        while not cancelled.is_set():
+            try:
+                results.put(message, timeout=1)
+                return True
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    # the client stopped reading, free the thread for the other listings
+                    cancelled.set()
+        return False
+
+    def list_folder(self, endpoint, path, level, depth, results, cancelled):
+        try:
+            for items in self.pages(endpoint, path):
+                if not self.publish(results, cancelled, ("items", items)):
+                    return
+                if level < depth:
+                    for item in items:
+                        if item.get("Type") == "FOLDER":
+                            if not self.publish(results, cancelled, ("folder", item["Path"], level + 1)):
+                                return
+        except Exception as error:
+            self.publish(results, cancelled, ("error", error))
+        finally:
+            self.publish(results, cancelled, ("done",))
+
+    def iter_pages(self, endpoint, path, depth=0):
+        """
+        Pages of items of the folder at `path` and of its sub-folders down to `depth` levels, yielded as they arrive,
+        in no particular order. The folders are scheduled from here only, so the pool threads never wait for each
+        other. At most MEDIASTORE_LIST_QUEUE_SIZE messages wait to be read, the threads listing the folders wait for a
+        slow client rather than piling its pages up.
+        :raise ClientError: listing a folder failed
+        """
+        results = queue.Queue(maxsize=settings.MEDIASTORE_LIST_QUEUE_SIZE)
+        cancelled = threading.Event()
+
+        def submit(folder, level):
+            self.executor.submit(self.list_folder, endpoint, folder, level, depth, results, cancelled)
+
+        submit(path, 0)
+        pending = 1
+        try:
+            while pending:
+                message = results.get(timeout=settings.MEDIASTORE_LIST_TIMEOUT)
+                if message[0] == "items":
+                    yield message[1]
+                elif message[0] == "folder":
+                    submit(message[1], message[2])
+                    pending += 1
+                elif message[0] == "error":
+                    raise message[1]
+                else:
+                    pending -= 1
+        finally:
+            # stop the folders still listed once the listing failed or the client went away
+            cancelled.set()
+
+
+lister = MediaStoreLister(max_workers=settings.MEDIASTORE_LIST_WORKERS)
+
+
+def list_pages(playout_id, endpoint, depth=0):
+    """
+    Pages of the items of the archive of the playout, served from the listings cached for
+    MEDIASTORE_LISTING_CACHE_TTL seconds after a complete listing
+    """
+    key = (str(playout_id), depth)
+    cached = listings.get(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    pages = []
+    try:
+        for items in lister.iter_pages(endpoint, ROOT_PATH, depth):
+            pages.append(items)
+            yield items
+    except Exception:
+        # the container may have been recreated with another endpoint
+        container_endpoints.delete(str(playout_id))
+        raise
+    listings.set(key, pages)
+
+
+def open_listing(playout_id, endpoint, depth=0):
+    """
+    Start listing the archive of the playout, the first page is listed right away so that a listing failing from the
+    start fails the request, rather than a response already sent as a success
+    :return: generator of the JSON array of the items (see stream)
+    :raise ClientError: listing the archive failed
+    """
+    pages = list_pages(playout_id, endpoint, depth)
+    first_page = next(pages, [])
+    return stream(playout_id, itertools.chain([first_page], pages))
+
+
+def stream(playout_id, pages):
+    """
+    The items of the archive of the playout as a JSON array, sent page by page as they arrive. A listing failing
+    midway is logged and leaves the array unterminated, so clients can't mistake it for a complete one.
+    """
+    yield "["
+    first = True
+    try:
+        for items in pages:
+            if not items:
+                continue
+            yield ("" if first else ",") + ",".join(json.dumps(item, cls=DjangoJSONEncoder) for item in items)
+            first = False
+    except Exception:
+        logger.exception(f"Couldn't list the MediaStore container of {playout_id}")
+        return
+    yield "]"
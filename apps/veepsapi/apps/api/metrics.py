@@ -0,0 +1,32 @@
+import threading
+from collections import defaultdict
+
+_counters = defaultdict(int)
+_lock = threading.Lock()
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    """
+    Counters of this worker process
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def ratio(part, total):
+    return round(part / total, 4) if total else None
+
+
+def reset():
+    with _lock:
+        _counters.clear()
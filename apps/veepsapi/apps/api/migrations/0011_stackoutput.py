@@ -0,0 +1,26 @@
+# Generated by Django 4.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_alter_input_preview_channel_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StackOutput",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("stack_name", models.CharField(max_length=256, unique=True)),
+                ("outputs", models.JSONField(default=dict)),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "api_stack_output",
+            },
+        ),
+    ]
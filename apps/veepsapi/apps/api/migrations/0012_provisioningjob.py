@@ -0,0 +1,76 @@
+# Generated by Django 4.1 on 2026-10-18 10:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_stackoutput"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProvisioningJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                        verbose_name="UUID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("playout.create", "playout.create"),
+                            ("playout.delete", "playout.delete"),
+                            ("input.create", "input.create"),
+                            ("input.delete", "input.delete"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("waiting", "Waiting"),
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("object_id", models.CharField(default="", max_length=128)),
+                ("stack_name", models.CharField(blank=True, db_index=True, max_length=256, null=True)),
+                ("detail", models.TextField(blank=True, default="")),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+                ("finished_on", models.DateTimeField(blank=True, null=True)),
+                (
+                    "playout",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="provisioning_jobs",
+                        to="api.playout",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "api_provisioning_job",
+            },
+        ),
+    ]
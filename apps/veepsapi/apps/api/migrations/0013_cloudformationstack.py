@@ -0,0 +1,28 @@
+# Generated by Django 4.1 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_provisioningjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CloudFormationStack",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("stack_id", models.CharField(max_length=256, unique=True)),
+                ("stack_name", models.CharField(db_index=True, max_length=256)),
+                ("status", models.CharField(blank=True, default="", max_length=64)),
+                ("last_event", models.JSONField(blank=True, null=True)),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "api_cloudformation_stack",
+            },
+        ),
+    ]
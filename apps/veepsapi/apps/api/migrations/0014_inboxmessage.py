@@ -0,0 +1,50 @@
+# Generated by Django 4.1 on 2026-10-18 12:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_cloudformationstack"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InboxMessage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("message_id", models.CharField(db_index=True, max_length=128)),
+                ("topic_arn", models.CharField(blank=True, default="", max_length=256)),
+                ("subject", models.CharField(blank=True, default="", max_length=256)),
+                ("body", models.JSONField()),
+                ("ordering_key", models.CharField(blank=True, db_index=True, default="", max_length=256)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("done", "Done"),
+                            ("dead", "Dead"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+                ("processed_on", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "api_inbox_message",
+                "indexes": [
+                    models.Index(fields=["status", "next_attempt_at"], name="api_inbox_status_next_idx"),
+                ],
+            },
+        ),
+    ]
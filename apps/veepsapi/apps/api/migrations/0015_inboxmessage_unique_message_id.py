@@ -0,0 +1,26 @@
+# Generated by Django 4.1 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_inboxmessage"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="inboxmessage",
+            name="message_id",
+            field=models.CharField(blank=True, default="", max_length=128),
+        ),
+        migrations.AddConstraint(
+            model_name="inboxmessage",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("message_id", ""), _negated=True),
+                fields=("message_id",),
+                name="api_inbox_unique_message_id",
+            ),
+        ),
+    ]
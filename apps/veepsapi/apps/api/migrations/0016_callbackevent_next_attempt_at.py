@@ -0,0 +1,34 @@
+# Generated by Django 4.1 on 2026-10-18 13:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_inboxmessage_unique_message_id"),
+    ]
+
+    operations = [
+        # added without a default first, so the events created before the delivery engine are not retried
+        migrations.AddField(
+            model_name="callbackevent",
+            name="next_attempt_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="callbackevent",
+            name="next_attempt_at",
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddField(
+            model_name="callbackevent",
+            name="locked_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="callbackevent",
+            index=models.Index(fields=["delivered_status", "next_attempt_at"], name="api_callback_event_due_idx"),
+        ),
+    ]
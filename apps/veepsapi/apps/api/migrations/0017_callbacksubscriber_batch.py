@@ -0,0 +1,28 @@
+# Generated by Django 4.1 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_callbackevent_next_attempt_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="batch_enabled",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="batch_max_size",
+            field=models.IntegerField(default=50),
+        ),
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="batch_max_linger",
+            field=models.FloatField(default=2.0),
+        ),
+    ]
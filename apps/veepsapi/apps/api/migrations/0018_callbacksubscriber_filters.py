@@ -0,0 +1,41 @@
+# Generated by Django 4.1 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_callbacksubscriber_batch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="event_types",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="playouts",
+            field=models.ManyToManyField(blank=True, related_name="callback_subscribers", to="api.playout"),
+        ),
+        migrations.AlterField(
+            model_name="callbackevent",
+            name="event_type",
+            field=models.CharField(
+                choices=[
+                    ("playout.created", "playout.created"),
+                    ("input.created", "input.created"),
+                    ("input.active", "input.active"),
+                    ("input.standby", "input.standby"),
+                    ("channel.running", "channel.running"),
+                    ("channel.stopped", "channel.stopped"),
+                    ("clipping.success", "clipping.success"),
+                    ("clipping.failed", "clipping.failed"),
+                    ("vod_asset.ready", "vod_asset.ready"),
+                ],
+                max_length=50,
+            ),
+        ),
+    ]
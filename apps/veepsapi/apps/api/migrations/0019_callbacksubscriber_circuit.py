@@ -0,0 +1,32 @@
+# Generated by Django 4.1 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_callbacksubscriber_filters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="circuit_state",
+            field=models.CharField(
+                choices=[("closed", "Closed"), ("open", "Open"), ("half_open", "Half open")],
+                default="closed",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="circuit_opened_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="callbacksubscriber",
+            name="consecutive_failures",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 4.1 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+# api_callback_log and api_callback_event become range partitioned by created_on, one partition per month (named
+# <table>_pYYYYMM, created ahead by apps/api/retention.py) plus a default partition. The primary key of a partitioned
+# table must include the partition key, ids stay unique through the sequence.
+
+
+def partition_sql(table, indexes=(), foreign_keys=()):
+    return [
+        f"ALTER TABLE {table} RENAME TO {table}_unpartitioned",
+        f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_on)",
+        f"CREATE SEQUENCE {table}_partitioned_id_seq OWNED BY {table}.id",
+        f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_partitioned_id_seq')",
+        f"SELECT setval('{table}_partitioned_id_seq', COALESCE((SELECT MAX(id) FROM {table}_unpartitioned), 0) + 1, "
+        f"false)",
+        f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT",
+        f"""
+        DO $$
+        DECLARE
+            oldest timestamptz := (SELECT MIN(created_on) FROM {table}_unpartitioned);
+            partition_start timestamptz := date_trunc('month', COALESCE(oldest, now()));
+        BEGIN
+            WHILE partition_start <= date_trunc('month', now()) + interval '2 months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(partition_start, 'YYYYMM'),
+                    partition_start,
+                    partition_start + interval '1 month'
+                );
+                partition_start := partition_start + interval '1 month';
+            END LOOP;
+        END $$
+        """,
+        f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned",
+        f"DROP TABLE {table}_unpartitioned",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_on)",
+    ] + [f"CREATE INDEX {name} ON {table} ({columns})" for name, columns in indexes] + [
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fk FOREIGN KEY ({column}) REFERENCES {reference} (id) "
+        f"DEFERRABLE INITIALLY DEFERRED"
+        for column, reference in foreign_keys
+    ]
+
+
+def unpartition_sql(table, indexes=(), foreign_keys=()):
+    return [
+        f"ALTER TABLE {table} RENAME TO {table}_partitioned",
+        f"CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)",
+        f"INSERT INTO {table} SELECT * FROM {table}_partitioned",
+        f"ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT",
+        f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY",
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, "
+        f"false)",
+        f"DROP TABLE {table}_partitioned",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)",
+    ] + [f"CREATE INDEX {name} ON {table} ({columns})" for name, columns in indexes] + [
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fk FOREIGN KEY ({column}) REFERENCES {reference} (id) "
+        f"DEFERRABLE INITIALLY DEFERRED"
+        for column, reference in foreign_keys
+    ]
+
+
+CALLBACK_EVENT_INDEXES = [
+    ("api_callback_event_playout_id_idx", "playout_id"),
+    ("api_callback_event_subscriber_id_idx", "subscriber_id"),
+    ("api_callback_event_due_idx", "delivered_status, next_attempt_at"),
+]
+CALLBACK_EVENT_FOREIGN_KEYS = [
+    ("playout_id", "api_playout"),
+    ("subscriber_id", "api_callback_subscriber"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_callbacksubscriber_circuit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CallbackDailySummary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("callback_endpoint", models.URLField()),
+                ("attempts", models.IntegerField(default=0)),
+                ("succeeded", models.IntegerField(default=0)),
+                ("failed", models.IntegerField(default=0)),
+                ("latency_p50", models.FloatField(blank=True, null=True)),
+                ("latency_p95", models.FloatField(blank=True, null=True)),
+                ("latency_p99", models.FloatField(blank=True, null=True)),
+                ("events", models.IntegerField(default=0)),
+                ("events_delivered", models.IntegerField(default=0)),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "api_callback_daily_summary",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="callbackdailysummary",
+            constraint=models.UniqueConstraint(
+                fields=("day", "callback_endpoint"), name="api_callback_summary_unique_day"
+            ),
+        ),
+        migrations.RunSQL(
+            sql=partition_sql("api_callback_log"),
+            reverse_sql=unpartition_sql("api_callback_log"),
+        ),
+        migrations.RunSQL(
+            sql=partition_sql("api_callback_event", CALLBACK_EVENT_INDEXES, CALLBACK_EVENT_FOREIGN_KEYS),
+            reverse_sql=unpartition_sql("api_callback_event", CALLBACK_EVENT_INDEXES, CALLBACK_EVENT_FOREIGN_KEYS),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_callback_partitioning"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayoutEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "event_type",
+                    models.CharField(
+                        choices=[
+                            ("playout.created", "playout.created"),
+                            ("input.created", "input.created"),
+                            ("input.active", "input.active"),
+                            ("input.standby", "input.standby"),
+                            ("channel.running", "channel.running"),
+                            ("channel.stopped", "channel.stopped"),
+                            ("clipping.success", "clipping.success"),
+                            ("clipping.failed", "clipping.failed"),
+                            ("vod_asset.ready", "vod_asset.ready"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("object_id", models.CharField(default="", max_length=128)),
+                ("event_object", models.TextField()),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                (
+                    "playout",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="events", to="api.playout"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "api_playout_event",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="playoutevent",
+            index=models.Index(fields=["playout", "id"], name="api_playout_event_cursor_idx"),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1 on 2026-10-18 16:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_playoutevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="clip",
+            name="created_on",
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="rawvideo",
+            name="created_on",
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="vod",
+            name="created_on",
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="vodasset",
+            name="created_on",
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="clip",
+            index=models.Index(fields=["created_on", "id"], name="api_clip_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="rawvideo",
+            index=models.Index(fields=["created_on", "id"], name="api_rawvideo_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vod",
+            index=models.Index(fields=["created_on", "id"], name="api_vod_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vodasset",
+            index=models.Index(fields=["created_on", "id"], name="api_vodasset_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="callbacksubscriber",
+            index=models.Index(fields=["created_on", "id"], name="api_callback_sub_keyset_idx"),
+        ),
+    ]
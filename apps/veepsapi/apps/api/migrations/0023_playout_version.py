@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0022_keyset_pagination"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playout",
+            name="version",
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1 on 2026-10-18 17:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_playout_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RuntimeState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "resource_type",
+                    models.CharField(choices=[("channel", "channel"), ("input", "input")], max_length=16),
+                ),
+                ("resource_id", models.UUIDField()),
+                ("state", models.CharField(max_length=32)),
+                ("reported_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+                (
+                    "playout",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="runtime_states", to="api.playout"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "api_runtime_state",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="runtimestate",
+            constraint=models.UniqueConstraint(
+                fields=("resource_type", "resource_id"), name="api_runtime_state_unique_resource"
+            ),
+        ),
+    ]
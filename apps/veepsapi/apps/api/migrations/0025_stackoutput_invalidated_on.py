@@ -0,0 +1,22 @@
+# Generated by Django 4.1 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0024_runtimestate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stackoutput",
+            name="invalidated_on",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="stackoutput",
+            index=models.Index(fields=["updated_on"], name="api_stack_output_updated_idx"),
+        ),
+    ]
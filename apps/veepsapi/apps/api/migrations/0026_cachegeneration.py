@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0025_stackoutput_invalidated_on"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheGeneration",
+            fields=[
+                ("name", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("generation", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "api_cache_generation",
+            },
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.contrib.auth.hashers import (
 )
 from django.core.validators import RegexValidator, MinLengthValidator
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from netfields import InetAddressField, CidrAddressField
 
 from . import utils
@@ -13,11 +15,26 @@ from .cloudformation.channel import MediaLiveChannel
 from .cloudformation.distribution import MediaPackageDistribution
 from .cloudformation.liveinput import MediaLiveInputLive
 from .cloudformation.staticinput import MediaLiveInputStatic
+from .cloudformation.templates import template_cache
 from .enums import INPUT_PROTOCOLS_CHOICES, INPUT_PROTOCOLS_URI_PREFIX
 
 alphanumeric_validator = RegexValidator(r"^[0-9a-zA-Z]*$", "Only alphanumeric characters are allowed.")
 
 
+def get_single(related_manager):
+    """
+    The object of a to-many relation holding exactly one, like `related_manager.get()`, but served from the objects
+    prefetched with prefetch_related when there are some, so listing doesn't run one query per row
+    """
+    model = related_manager.model
+    objects = list(related_manager.all())
+    if not objects:
+        raise model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+    if len(objects) > 1:
+        raise model.MultipleObjectsReturned(f"get_single() returned more than one {model._meta.object_name}")
+    return objects[0]
+
+
 class BaseModel(models.Model):
     id = models.UUIDField(primary_key=True, unique=True, editable=False, default=uuid.uuid4, verbose_name="UUID")
 
@@ -35,6 +52,57 @@ class CloudFormationModel(BaseModel):
         abstract = True
 
 
+class StackOutput(models.Model):
+    """
+    Outputs of a CloudFormation stack, stored once the stack is created/updated
+    """
+
+    stack_name = models.CharField(max_length=256, unique=True)
+    outputs = models.JSONField(default=dict)
+    # set when the stack changed, the outputs are unknown until they're stored again
+    invalidated_on = models.DateTimeField(null=True, blank=True)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "api_stack_output"
+        indexes = [
+            # the processes look up the rows changed since their last check, see StackOutputStore.sync
+            models.Index(fields=["updated_on"], name="api_stack_output_updated_idx"),
+        ]
+
+
+class CacheGeneration(models.Model):
+    """
+    Generation of a cache whose entries are kept by each worker: bumping it drops the entries stored under the
+    previous one in every worker at once (see catalog.py)
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    generation = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "api_cache_generation"
+
+
+class CloudFormationStack(models.Model):
+    """
+    Registry of CloudFormation stacks, kept current from the CloudFormation SNS notifications
+    """
+
+    stack_id = models.CharField(max_length=256, unique=True)  # ARN Stack ID
+    stack_name = models.CharField(max_length=256, db_index=True)
+    status = models.CharField(max_length=64, blank=True, default="")
+    last_event = models.JSONField(null=True, blank=True)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "api_cloudformation_stack"
+
+
 class StateOptions(models.TextChoices):
     ON = ("on", "On")
     OFF = ("off", "Off")
@@ -67,6 +135,12 @@ class Clip(BaseModel):
         on_delete=models.CASCADE,
         related_name="clips",
     )
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on", "id"], name="api_clip_keyset_idx"),
+        ]
 
 
 class Schedule(BaseModel):
@@ -75,7 +149,7 @@ class Schedule(BaseModel):
 
     @property
     def channel(self):
-        return self.channels.get()
+        return get_single(self.channels)
 
 
 class Channel(CloudFormationModel):
@@ -91,7 +165,7 @@ class Channel(CloudFormationModel):
 
     @property
     def playout_id(self):
-        return self.playout.get().id
+        return get_single(self.playout).id
 
     @property
     def cloudformation_channel_name(self):
@@ -99,12 +173,38 @@ class Channel(CloudFormationModel):
 
     @property
     def channel_template(self):
+        """
+        The MediaLive channel stack without the additional inputs. It is memoized per configuration and shared,
+        so it must not be used as the base template of an input (see Playout.input_template).
+        """
         playout = self.playout.get()
         initial_input = Input.objects.filter(playout=playout, initial_input=True).first()
 
+        return template_cache.get_or_build(
+            self.template_config(playout, initial_input),
+            lambda: self.build_channel_template(playout, initial_input),
+        )
+
+    @staticmethod
+    def template_config(playout, initial_input):
+        return (
+            "channel",
+            str(playout.id),
+            playout.resolution,
+            str(playout.channel_mp_channel_id),
+            str(playout.channel_origin_endpoint_id),
+            str(playout.channel_origin_id),
+            str(initial_input.preview_mp_channel_id),
+            str(initial_input.preview_channel_id),
+            str(initial_input.preview_origin_endpoint_id),
+            str(initial_input.preview_origin_id),
+        )
+
+    @staticmethod
+    def build_channel_template(playout, initial_input):
         channel = MediaLiveChannel(
             description=f"MedialLive channel for {playout.id}",
-            channel_name=self.cloudformation_channel_name,
+            channel_name=f"MediaLiveChannel{playout.id}",
             resolution=playout.resolution,
             mp_channel_id=str(playout.channel_mp_channel_id),
             origin_endpoint_id=str(playout.channel_origin_endpoint_id),
@@ -162,6 +262,17 @@ class Playout(BaseModel):
     channel_mp_channel_id = models.UUIDField(default=uuid.uuid4)
     channel_origin_endpoint_id = models.UUIDField(default=uuid.uuid4)
     channel_origin_id = models.UUIDField(default=uuid.uuid4)
+    # incremented on every change of the playout and of the objects its resources are rendered from (see signals.py),
+    # the ETag of these resources
+    version = models.PositiveBigIntegerField(default=1)
+
+    @classmethod
+    def bump_version(cls, **lookup):
+        """
+        Increment the version of the playouts matching `lookup` in the database, without loading them
+        :return: number of playouts updated
+        """
+        return cls.objects.filter(**lookup).update(version=F("version") + 1)
 
     @property
     def channel_template(self):
@@ -171,6 +282,24 @@ class Playout(BaseModel):
     def distribution_template(self):
         return self.distribution.distribution_template
 
+    def input_template(self, inputs):
+        """
+        The channel stack with the given (non-initial) inputs attached, memoized per configuration.
+        :param inputs: iterable of Input
+        :return: the template of the last attached input, or the channel template if there are no inputs
+        """
+        inputs = sorted(inputs, key=lambda i: (i.created_on, str(i.id)))
+        initial_input = self.input.filter(initial_input=True).first()
+
+        def build():
+            template = Channel.build_channel_template(self, initial_input)
+            for playout_input in inputs:
+                template = playout_input.input_template(template.template)
+            return template
+
+        config = Channel.template_config(self, initial_input) + tuple(i.template_config() for i in inputs)
+        return template_cache.get_or_build(config, build)
+
 
 class Input(CloudFormationModel):
     """
@@ -262,21 +391,28 @@ class Input(CloudFormationModel):
 
         return input_template
 
-    def input_id(self, base_template):
-        input_template = MediaLiveInputLive(
-            self.playout,
+    def template_config(self):
+        return (
+            "input",
+            str(self.id),
+            self.input_type,
             self.name,
-            self.id,
-            base_template,
-            preview_channel_id=str(self.preview_mp_channel_id),
-            preview_origin_id=str(self.preview_origin_id),
-            preview_mp_channel_id=str(self.preview_mp_channel_id),
-            preview_origin_endpoint_id=str(self.preview_origin_endpoint_id),
+            self.s3_url,
+            str(self.preview_mp_channel_id),
+            str(self.preview_channel_id),
+            str(self.preview_origin_endpoint_id),
+            str(self.preview_origin_id),
         )
+
+    def input_id(self):
+        """
+        MediaLive input id of this input, read from the outputs of the channel stack
+        """
+        channel_template = self.playout.channel_template
         if self.initial_input:
-            return input_template.get_initial_input_id()
+            return channel_template.get_initial_input_id()
 
-        return input_template.get_input_id()
+        return channel_template.get_input_id(self.id)
 
     def save(self, *args, **kwargs):
         is_newly_created = self._state.adding
@@ -338,7 +474,7 @@ class Action(BaseModel):
 
     @property
     def playout(self):
-        return self.schedule.channel.playout.get()
+        return get_single(self.schedule.channel.playout)
 
     @property
     def channel(self):
@@ -354,15 +490,39 @@ class CallbackSubscriber(models.Model):
     Endpoints subscribed to veepsapi events for callback
     """
 
+    # circuit breaker of the endpoint, see circuit.py
+    CIRCUIT_CLOSED = "closed"
+    CIRCUIT_OPEN = "open"
+    CIRCUIT_HALF_OPEN = "half_open"
+    CIRCUIT_STATES = (
+        (CIRCUIT_CLOSED, "Closed"),
+        (CIRCUIT_OPEN, "Open"),
+        (CIRCUIT_HALF_OPEN, "Half open"),
+    )
+
     endpoint = models.URLField(max_length=200)
     retry_count = models.IntegerField(default=3)
     signing_secret = models.CharField(max_length=128, default="")
+    # batch mode: events are sent as one array payload of up to batch_max_size events, held at most
+    # batch_max_linger seconds
+    batch_enabled = models.BooleanField(default=False)
+    batch_max_size = models.IntegerField(default=50)
+    batch_max_linger = models.FloatField(default=2.0)
+    # filters of the events sent to the subscriber, empty for all event types/playouts
+    event_types = models.JSONField(default=list, blank=True)
+    playouts = models.ManyToManyField(Playout, blank=True, related_name="callback_subscribers")
+    circuit_state = models.CharField(max_length=16, choices=CIRCUIT_STATES, default=CIRCUIT_CLOSED)
+    circuit_opened_at = models.DateTimeField(null=True, blank=True)
+    consecutive_failures = models.IntegerField(default=0)
 
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "api_callback_subscriber"
+        indexes = [
+            models.Index(fields=["created_on", "id"], name="api_callback_sub_keyset_idx"),
+        ]
 
 
 class CallbackEvent(models.Model):
@@ -392,6 +552,8 @@ class CallbackEvent(models.Model):
     EVENT_TYPES = (
         (EVENT_TYPE_PLAYOUT_CREATED, EVENT_TYPE_PLAYOUT_CREATED),
         (EVENT_TYPE_INPUT_CREATED, EVENT_TYPE_INPUT_CREATED),
+        (EVENT_TYPE_INPUT_ACTIVE, EVENT_TYPE_INPUT_ACTIVE),
+        (EVENT_TYPE_INPUT_STANDBY, EVENT_TYPE_INPUT_STANDBY),
         (EVENT_TYPE_CHANNEL_RUNNING, EVENT_TYPE_CHANNEL_RUNNING),
         (EVENT_TYPE_CHANNEL_STOPPED, EVENT_TYPE_CHANNEL_STOPPED),
         (EVENT_TYPE_CLIPPING_SUCCESS, EVENT_TYPE_CLIPPING_SUCCESS),
@@ -409,12 +571,90 @@ class CallbackEvent(models.Model):
     event_object = models.TextField()
     retried_count = models.IntegerField(default=0)
     delivered_status = models.BooleanField(default=False)
+    # when the delivery engine should (re)try the callback, None once it is delivered or given up
+    next_attempt_at = models.DateTimeField(null=True, blank=True, default=timezone.now)
+    # set while a delivery worker is calling the endpoint
+    locked_until = models.DateTimeField(null=True, blank=True)
 
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "api_callback_event"
+        indexes = [
+            models.Index(fields=["delivered_status", "next_attempt_at"], name="api_callback_event_due_idx"),
+        ]
+
+
+class PlayoutEvent(models.Model):
+    """
+    Events of a playout, as sent to the callback subscribers, for the clients streaming them (see apps/api/streams.py).
+    The id is the cursor a stream resumes from.
+    """
+
+    playout = models.ForeignKey(Playout, on_delete=models.CASCADE, related_name="events")
+    event_type = models.CharField(max_length=50, choices=CallbackEvent.EVENT_TYPES)
+    object_id = models.CharField(max_length=128, default="")
+    event_object = models.TextField()
+
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "api_playout_event"
+        indexes = [
+            models.Index(fields=["playout", "id"], name="api_playout_event_cursor_idx"),
+        ]
+
+
+class RuntimeState(models.Model):
+    """
+    Last state AWS reported for the MediaLive channel or a MediaConnect input of a playout, kept from the state-change
+    events (see medialive_handler and mediaconnect_handler) so reading it doesn't take describe calls.
+    Channel.state and Input.state are the states last requested.
+    """
+
+    RESOURCE_CHANNEL = "channel"
+    RESOURCE_INPUT = "input"
+    RESOURCE_TYPES = ((RESOURCE_CHANNEL, RESOURCE_CHANNEL), (RESOURCE_INPUT, RESOURCE_INPUT))
+
+    playout = models.ForeignKey(Playout, on_delete=models.CASCADE, related_name="runtime_states")
+    resource_type = models.CharField(max_length=16, choices=RESOURCE_TYPES)
+    # id of the Channel or Input
+    resource_id = models.UUIDField()
+    # RUNNING/STOPPED for a channel, ACTIVE/STANDBY for an input
+    state = models.CharField(max_length=32)
+    # time of the event reporting the state
+    reported_at = models.DateTimeField(null=True, blank=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "api_runtime_state"
+        constraints = [
+            models.UniqueConstraint(fields=["resource_type", "resource_id"], name="api_runtime_state_unique_resource"),
+        ]
+
+    @classmethod
+    def record(cls, playout, resource_type, resource_id, state, reported_at=None):
+        """
+        Store the state reported for a channel/input, unless a later event of the resource was stored already: the
+        inbox processes the events in the order they arrived in, a late SNS delivery or a retry may bring an older one
+        :return: True if the state was stored
+        """
+        reported_at = reported_at or timezone.now()
+        values = {"playout": playout, "state": state, "reported_at": reported_at, "updated_on": timezone.now()}
+
+        def update():
+            return cls.objects.filter(
+                models.Q(reported_at__isnull=True) | models.Q(reported_at__lte=reported_at),
+                resource_type=resource_type,
+                resource_id=resource_id,
+            ).update(**values)
+
+        if update():
+            return True
+        _, created = cls.objects.get_or_create(resource_type=resource_type, resource_id=resource_id, defaults=values)
+        # another event of the resource may have created the row meanwhile
+        return created or bool(update())
 
 
 class CallbackLog(models.Model):
@@ -440,6 +680,33 @@ class CallbackLog(models.Model):
         db_table = "api_callback_log"
 
 
+class CallbackDailySummary(models.Model):
+    """
+    Delivery counts and latency percentiles (seconds) of a callback endpoint for a day, kept after the callback
+    logs and events of the day are dropped (see apps/api/retention.py)
+    """
+
+    day = models.DateField()
+    callback_endpoint = models.URLField(max_length=200)
+    attempts = models.IntegerField(default=0)
+    succeeded = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    latency_p50 = models.FloatField(null=True, blank=True)
+    latency_p95 = models.FloatField(null=True, blank=True)
+    latency_p99 = models.FloatField(null=True, blank=True)
+    events = models.IntegerField(default=0)
+    events_delivered = models.IntegerField(default=0)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "api_callback_daily_summary"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "callback_endpoint"], name="api_callback_summary_unique_day"),
+        ]
+
+
 class RawVideo(models.Model):
     """
     Raw videos not converted by mediaconvert
@@ -449,6 +716,12 @@ class RawVideo(models.Model):
     file = models.FileField(upload_to=utils.file_generate_upload_path, blank=True, null=True)
     file_size = models.IntegerField(null=True, blank=True)
     upload_finished_at = models.DateTimeField(blank=True, null=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on", "id"], name="api_rawvideo_keyset_idx"),
+        ]
 
     @property
     def is_valid(self):
@@ -481,6 +754,12 @@ class Vod(BaseModel):
     # following 2 fields are only valid if create_type is harvest_job
     clip = models.OneToOneField(Clip, null=True, blank=True, on_delete=models.PROTECT)
     clip_hls_path = models.CharField(max_length=512, null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on", "id"], name="api_vod_keyset_idx"),
+        ]
 
 
 class VodAsset(BaseModel):
@@ -491,3 +770,166 @@ class VodAsset(BaseModel):
     packaging_group_id = models.CharField(max_length=255, null=True, blank=True)
     source_arn = models.CharField(max_length=255, null=True, blank=True)
     tags = models.JSONField(null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_on", "id"], name="api_vodasset_keyset_idx"),
+        ]
+
+
+class ProvisioningJob(BaseModel):
+    """
+    Stack operation for a playout/input create or delete, run by the provisioning worker pool
+    """
+
+    KIND_PLAYOUT_CREATE = "playout.create"
+    KIND_PLAYOUT_DELETE = "playout.delete"
+    KIND_INPUT_CREATE = "input.create"
+    KIND_INPUT_DELETE = "input.delete"
+    KINDS = (
+        (KIND_PLAYOUT_CREATE, KIND_PLAYOUT_CREATE),
+        (KIND_PLAYOUT_DELETE, KIND_PLAYOUT_DELETE),
+        (KIND_INPUT_CREATE, KIND_INPUT_CREATE),
+        (KIND_INPUT_DELETE, KIND_INPUT_DELETE),
+    )
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    # the stack operation was issued, waiting for CloudFormation to report back through SNS
+    STATUS_WAITING = "waiting"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUSES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_WAITING, "Waiting"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    STACK_SUCCEEDED_STATUSES = ["CREATE_COMPLETE", "UPDATE_COMPLETE", "DELETE_COMPLETE"]
+    STACK_FAILED_STATUSES = [
+        "CREATE_FAILED",
+        "ROLLBACK_COMPLETE",
+        "ROLLBACK_FAILED",
+        "DELETE_FAILED",
+        "UPDATE_ROLLBACK_COMPLETE",
+        "UPDATE_ROLLBACK_FAILED",
+    ]
+
+    REQUEST_TOKEN_PREFIX = "job-"
+
+    kind = models.CharField(max_length=32, choices=KINDS)
+    status = models.CharField(max_length=16, choices=STATUSES, default=STATUS_PENDING)
+    playout = models.ForeignKey(
+        Playout, null=True, blank=True, on_delete=models.SET_NULL, related_name="provisioning_jobs"
+    )
+    object_id = models.CharField(max_length=128, default="")
+    stack_name = models.CharField(max_length=256, null=True, blank=True, db_index=True)
+    detail = models.TextField(blank=True, default="")
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "api_provisioning_job"
+
+    def set_status(self, status, detail="", from_statuses=None):
+        """
+        Move the job to `status`, optionally only if it currently is in one of `from_statuses`
+        :return: True if the job was updated
+        """
+        finished_on = timezone.now() if status in [self.STATUS_SUCCEEDED, self.STATUS_FAILED] else None
+        jobs = ProvisioningJob.objects.filter(id=self.id)
+        if from_statuses is not None:
+            jobs = jobs.filter(status__in=from_statuses)
+
+        updated = jobs.update(status=status, detail=detail, finished_on=finished_on, updated_on=timezone.now())
+        if updated:
+            self.status = status
+            self.detail = detail
+            self.finished_on = finished_on
+        return bool(updated)
+
+    @property
+    def request_token(self):
+        """
+        ClientRequestToken of the stack operations issued by the job, CloudFormation repeats it in the notifications
+        of the stack events these operations cause
+        """
+        return f"{self.REQUEST_TOKEN_PREFIX}{self.id}"
+
+    @classmethod
+    def advance(cls, stack_name, stack_status, request_token=None):
+        """
+        Finish the job of `stack_name` whose operation CloudFormation reports a terminal stack status for.
+        Notifications without a request token (stacks operated before the tokens were sent) finish the job waiting
+        on the stack, the ones with the token of another operation don't finish any.
+        :return: number of jobs finished
+        """
+        if stack_status in cls.STACK_SUCCEEDED_STATUSES:
+            status = cls.STATUS_SUCCEEDED
+        elif stack_status in cls.STACK_FAILED_STATUSES:
+            status = cls.STATUS_FAILED
+        else:
+            return 0
+
+        jobs = cls.objects.filter(stack_name=stack_name)
+        if request_token in [None, "", "null"]:
+            jobs = jobs.filter(status=cls.STATUS_WAITING)
+        else:
+            if not request_token.startswith(cls.REQUEST_TOKEN_PREFIX):
+                return 0
+            try:
+                job_id = uuid.UUID(request_token[len(cls.REQUEST_TOKEN_PREFIX) :])
+            except ValueError:
+                return 0
+            jobs = jobs.filter(id=job_id, status__in=[cls.STATUS_RUNNING, cls.STATUS_WAITING])
+
+        return jobs.update(status=status, detail=stack_status, finished_on=timezone.now(), updated_on=timezone.now())
+
+
+class InboxMessage(models.Model):
+    """
+    SNS notifications received on /aws_webhook, stored as-is and processed in the background (see inbox.py)
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    # gave up after INBOX_MAX_ATTEMPTS, kept for inspection/replay
+    STATUS_DEAD = "dead"
+    STATUSES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_DONE, "Done"),
+        (STATUS_DEAD, "Dead"),
+    )
+
+    message_id = models.CharField(max_length=128, blank=True, default="")  # SNS MessageId, unique when set
+    topic_arn = models.CharField(max_length=256, blank=True, default="")
+    subject = models.CharField(max_length=256, blank=True, default="")
+    body = models.JSONField()  # the SNS envelope
+    # messages with the same key (CloudFormation stack / AWS resource of a playout) are processed in arrival order
+    ordering_key = models.CharField(max_length=256, blank=True, default="", db_index=True)
+    status = models.CharField(max_length=16, choices=STATUSES, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    processed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "api_inbox_message"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="api_inbox_status_next_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["message_id"], condition=~models.Q(message_id=""), name="api_inbox_unique_message_id"
+            ),
+        ]
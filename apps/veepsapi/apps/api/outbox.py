@@ -0,0 +1,76 @@
+import logging
+import select
+import time
+
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel of the callback events written to the outbox (the api_callback_event table)
+CHANNEL = "callback_events"
+
+
+def notify():
+    """
+    Signal the relay that callback events were written. Postgres only delivers the notification once the current
+    transaction commits, and drops it on rollback, so the relay never sees events that don't exist.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, '')", [CHANNEL])
+
+
+class OutboxRelay:
+    """
+    Waits for the notifications of new callback events on a dedicated connection, so the `run_background_workers`
+    command streams them to the delivery engine as soon as they are committed instead of polling for them.
+    """
+
+    def __init__(self, channel=CHANNEL, using="default"):
+        self.channel = channel
+        self.using = using
+        self._connection = None
+
+    def connect(self):
+        # a connection of its own, in autocommit: LISTEN on a connection in a transaction only starts on commit
+        wrapper = connections[self.using]
+        self._connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        self._connection.autocommit = True
+        with self._connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            finally:
+                self._connection = None
+
+    def wait(self, timeout):
+        """
+        Block until events are committed to the outbox, or for `timeout` seconds
+        :return: number of notifications received
+        """
+        return len(self.receive(timeout))
+
+    def receive(self, timeout):
+        """
+        Block until notifications are received on the channel, or for `timeout` seconds
+        :return: payloads of the notifications
+        """
+        try:
+            if self._connection is None:
+                self.connect()
+
+            if not self._connection.notifies:
+                select.select([self._connection], [], [], timeout)
+            self._connection.poll()
+        except Exception:
+            # the listeners poll anyway, they just take up to `timeout` to notice new events
+            logger.exception(f"Lost the connection listening to {self.channel}")
+            self.close()
+            time.sleep(timeout)
+            return []
+
+        payloads = [notification.payload for notification in self._connection.notifies]
+        self._connection.notifies.clear()
+        return payloads
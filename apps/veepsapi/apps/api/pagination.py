@@ -0,0 +1,81 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination, or keyset pagination on (created_on, id) when the `cursor` query param is given (empty
+    for the first page). A keyset page is found through the (created_on, id) index instead of skipping the rows of
+    the previous pages, so every page of a large sync takes the same time. The response has the opaque cursor of
+    the next page in `next`, and no count.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by("created_on", "id")
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if position is not None:
+            created_on, pk = position
+            try:
+                # the cursor comes from the client, its id may not even be of the type of the primary key
+                pk = queryset.model._meta.pk.to_python(pk)
+                queryset = queryset.filter(created_on__gte=created_on).filter(
+                    Q(created_on__gt=created_on) | Q(id__gt=pk)
+                )
+            except (ValidationError, TypeError, ValueError) as error:
+                raise exceptions.ValidationError(self.invalid_cursor_message) from error
+
+        page = list(queryset[: self.limit + 1])
+        self.has_next = len(page) > self.limit
+        self.page = page[: self.limit]
+        return self.page
+
+    def encode_cursor(self, obj):
+        position = json.dumps([obj.created_on.isoformat(), str(obj.pk)])
+        return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, cursor):
+        """
+        :return: (created_on, id) of the last object of the previous page, None for the first page
+        """
+        if not cursor:
+            return None
+        try:
+            created_on, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            created_on = parse_datetime(created_on)
+        except (TypeError, ValueError) as error:
+            raise exceptions.ValidationError(self.invalid_cursor_message) from error
+        if created_on is None:
+            raise exceptions.ValidationError(self.invalid_cursor_message)
+        return created_on, pk
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_link(), "results": data})
@@ -0,0 +1,208 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Aggregate, Count, F, FloatField, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from config import settings
+from .models import CallbackDailySummary, CallbackEvent, CallbackLog, PlayoutEvent
+
+logger = logging.getLogger(__name__)
+
+# tables partitioned by month of created_on, see migration 0020
+PARTITIONED_TABLES = [CallbackLog._meta.db_table, CallbackEvent._meta.db_table]
+
+_last_run = None
+
+
+class Percentile(Aggregate):
+    function = "PERCENTILE_CONT"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def day_start(moment):
+    return moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_start(moment):
+    return day_start(moment).replace(day=1)
+
+
+def next_month(month):
+    return month_start(month + timedelta(days=32))
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def create_partition(table, month):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [month, next_month(month)],
+        )
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create the partitions of the current month and the next `months_ahead` ones (CALLBACK_PARTITION_MONTHS_AHEAD).
+    A month must have its partition before its first row is written: the rows written without one go to the default
+    partition, and a partition can't be created for a month the default partition has rows of.
+    It runs after every `migrate` (see signals.py) and from the `run_background_workers` command, so a deployment
+    must run either of them at least every CALLBACK_PARTITION_MONTHS_AHEAD months.
+    """
+    if months_ahead is None:
+        months_ahead = settings.CALLBACK_PARTITION_MONTHS_AHEAD
+    month = month_start(timezone.now())
+    for _ in range(months_ahead + 1):
+        for table in PARTITIONED_TABLES:
+            try:
+                create_partition(table, month)
+            except DatabaseError:
+                logger.exception(f"Couldn't create the partition of {table} for {month:%Y-%m}")
+        month = next_month(month)
+
+
+def partitions(table):
+    """
+    :return: {first day of the month: name} of the monthly partitions of `table`
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    months = {}
+    for name in names:
+        suffix = name[len(table) :]
+        if not suffix.startswith("_p"):
+            continue
+        try:
+            months[datetime.strptime(suffix[2:], "%Y%m").replace(tzinfo=dt_timezone.utc)] = name
+        except ValueError:
+            continue
+    return months
+
+
+def summarize(start, end):
+    """
+    Write the daily summaries of the callbacks made between `start` and `end`, overwriting the ones of the same days
+    :return: number of summaries written
+    """
+    logs = (
+        CallbackLog.objects.filter(created_on__gte=start, created_on__lt=end)
+        .values("callback_endpoint", day=TruncDate("created_on"))
+        .annotate(
+            attempts=Count("id"),
+            succeeded=Count("id", filter=Q(status_code__gte=200, status_code__lt=300)),
+            latency_p50=Percentile("execution_time", 0.5),
+            latency_p95=Percentile("execution_time", 0.95),
+            latency_p99=Percentile("execution_time", 0.99),
+        )
+    )
+    summaries = [CallbackDailySummary(failed=row["attempts"] - row["succeeded"], **row) for row in logs]
+    CallbackDailySummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["day", "callback_endpoint"],
+        update_fields=["attempts", "succeeded", "failed", "latency_p50", "latency_p95", "latency_p99", "updated_on"],
+    )
+
+    events = (
+        CallbackEvent.objects.filter(created_on__gte=start, created_on__lt=end)
+        .values(day=TruncDate("created_on"), callback_endpoint=F("subscriber__endpoint"))
+        .annotate(events=Count("id"), events_delivered=Count("id", filter=Q(delivered_status=True)))
+    )
+    event_summaries = [CallbackDailySummary(**row) for row in events]
+    CallbackDailySummary.objects.bulk_create(
+        event_summaries,
+        update_conflicts=True,
+        unique_fields=["day", "callback_endpoint"],
+        update_fields=["events", "events_delivered", "updated_on"],
+    )
+    return len(summaries) + len(event_summaries)
+
+
+def drop_expired(retention_days=None):
+    """
+    Drop the monthly partitions whose rows are all older than the retention, after summarizing them.
+    Rows older than the retention in the default partition are summarized and deleted.
+    :return: number of partitions dropped
+    """
+    retention_days = retention_days or settings.CALLBACK_RETENTION_DAYS
+    # summaries are per day, only compact whole days
+    expired = day_start(timezone.now() - timedelta(days=retention_days))
+
+    months = {table: partitions(table) for table in PARTITIONED_TABLES}
+    expired_months = sorted({month for names in months.values() for month in names if next_month(month) <= expired})
+
+    dropped = 0
+    for month in expired_months:
+        with transaction.atomic():
+            summarize(month, next_month(month))
+            with connection.cursor() as cursor:
+                for table in PARTITIONED_TABLES:
+                    name = months[table].get(month)
+                    if name:
+                        cursor.execute(f'DROP TABLE "{name}"')
+                        dropped += 1
+        logger.info(f"Dropped the callback logs and events of {month:%Y-%m}")
+
+    with transaction.atomic():
+        oldest = [
+            model.objects.filter(created_on__lt=expired).aggregate(oldest=Min("created_on"))["oldest"]
+            for model in (CallbackLog, CallbackEvent)
+        ]
+        oldest = [moment for moment in oldest if moment is not None]
+        if not oldest:
+            return dropped
+
+        summarize(day_start(min(oldest)), expired)
+        with connection.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                cursor.execute(f'DELETE FROM "{table}_default" WHERE created_on < %s', [expired])
+
+    return dropped
+
+
+def purge_playout_events():
+    """
+    Delete the playout events older than PLAYOUT_EVENTS_RETENTION, the streams can't resume from them anymore
+    :return: number of events deleted
+    """
+    expired = timezone.now() - timedelta(seconds=settings.PLAYOUT_EVENTS_RETENTION)
+    deleted, _ = PlayoutEvent.objects.filter(created_on__lt=expired).delete()
+    return deleted
+
+
+def run():
+    """
+    Background step: create the upcoming partitions, summarize the callbacks of the last day, drop the expired
+    partitions and purge the expired playout events, at most once every CALLBACK_RETENTION_INTERVAL seconds
+    :return: number of partitions dropped
+    """
+    global _last_run
+
+    if _last_run is not None and time.monotonic() - _last_run < settings.CALLBACK_RETENTION_INTERVAL:
+        return 0
+    _last_run = time.monotonic()
+
+    ensure_partitions()
+    summarize(day_start(timezone.now()) - timedelta(days=1), timezone.now())
+    dropped = drop_expired()
+    purge_playout_events()
+    return dropped
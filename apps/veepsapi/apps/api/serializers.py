@@ -1,13 +1,9 @@
-import json
 import logging
 import uuid
 from datetime import timedelta
 
-import boto3
 import pytz
-from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
-from django.forms import model_to_dict
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from drf_spectacular.utils import extend_schema_serializer
@@ -24,7 +20,7 @@ from rest_framework.serializers import (
 )
 
 from config import settings
-from . import enums, tasks, utils
+from . import callbacks, enums, utils
 from .models import (
     Playout,
     Distribution,
@@ -39,6 +35,7 @@ from .models import (
     RawVideo,
     Vod,
     VodAsset,
+    ProvisioningJob,
 )
 from .utils import get_boto_client
 
@@ -50,6 +47,24 @@ class VeepsSerializer(object):
     def get_boto_client(resource_name):
         return get_boto_client(resource_name)
 
+    # Clients are looked up lazily, so list/GET requests never need one
+
+    @property
+    def medialive_client(self):
+        return self.get_boto_client("medialive")
+
+    @property
+    def mediaconnect_client(self):
+        return self.get_boto_client("mediaconnect")
+
+    @property
+    def mediapackage_client(self):
+        return self.get_boto_client("mediapackage")
+
+    @property
+    def mediapackage_vod_client(self):
+        return self.get_boto_client("mediapackage-vod")
+
 
 logger = logging.getLogger(__name__)
 
@@ -108,10 +123,6 @@ class InputSerializer(ModelSerializer, VeepsSerializer):
         ]
         read_only_fields = ["id", "stack_id", "uri"]
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.mediaconnect_client = self.get_boto_client("mediaconnect")
-
     def create(self, validated_data):
         # run the normal create for the object
         playout_id = validated_data.pop("playout_id")
@@ -122,7 +133,7 @@ class InputSerializer(ModelSerializer, VeepsSerializer):
         channel_input.playout = playout
         channel_input.save()
 
-        self.create_input(channel_input)
+        # The input itself is created by a provisioning job (see jobs.create_input)
 
         # Return the Input object
         return channel_input
@@ -132,14 +143,8 @@ class InputSerializer(ModelSerializer, VeepsSerializer):
         # run cloudformation to create the input
         playout = channel_input.playout
 
-        # Start with the channel template
-        input_template = playout.channel_template
-
-        for playout_input in playout.input.filter(playout=playout, initial_input=False).all():
-            # then add on each input
-            input_template = playout_input.input_template(input_template.template)
-
-        return input_template
+        # The channel template with each input added on
+        return playout.input_template(playout.input.filter(initial_input=False).all())
 
     def create_input(self, channel_input):
         input_template = self.get_input_template(channel_input)
@@ -147,7 +152,7 @@ class InputSerializer(ModelSerializer, VeepsSerializer):
         logger.info(f"Trying to create input: {channel_input.name}")
 
         # Create the input by updating the change set
-        input_template.update_change_set()
+        return input_template.update_change_set()
 
     def update_state(self, channel_input, state):
         state_options = [a for a, b in StateOptions.choices]
@@ -184,15 +189,13 @@ class InputSerializer(ModelSerializer, VeepsSerializer):
         other_inputs = (
             Input.objects.filter(playout_id=playout.id).filter(initial_input=False).exclude(id=instance.id).all()
         )
-        input_template = playout.channel_template
-
-        for playout_input in other_inputs:
-            input_template = playout_input.input_template(input_template.template)
+        input_template = playout.input_template(other_inputs)
 
         # apply the change set
-        input_template.update_change_set()
+        executed = input_template.update_change_set()
 
         instance.delete()
+        return executed
 
 
 class ChannelSerializer(ModelSerializer, VeepsSerializer):
@@ -213,10 +216,6 @@ class ChannelSerializer(ModelSerializer, VeepsSerializer):
         ]
         read_only_fields = ["id", "stack_id", "playout_id"]
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.medialive_client = self.get_boto_client("medialive")
-
     def update_state(self, channel, state):
         state_options = [a for a, b in StateOptions.choices]
         if state not in state_options:
@@ -231,7 +230,7 @@ class ChannelSerializer(ModelSerializer, VeepsSerializer):
         # Create a schedule to immediately switch the input
 
         input_obj = Input.objects.get(id=input_uuid)
-        input_id = input_obj.input_template.get_input_id()
+        input_id = input_obj.input_id()
 
         response = self.medialive_client.batch_update_schedule(
             ChannelId=channel.channel_template.get_channel_id(),
@@ -289,8 +288,7 @@ class PlayoutSerializer(ModelSerializer, VeepsSerializer):
         # Create input -- needs to be created before the channel to get the preview ids
         self.create_input(playout)
 
-        # Create Channel
-        self.create_channel(playout)
+        # The channel stack is created by a provisioning job (see jobs.create_playout)
 
         # Return the playout object
         return playout
@@ -366,10 +364,6 @@ class ActionSerializer(ModelSerializer, VeepsSerializer):
             "schedule",
         ] + read_only_fields
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.medialive_client = self.get_boto_client("medialive")
-
     def validate(self, attrs):
         if attrs.get("action_type") == Action.INPUT_SWITCH_ACTION_TYPE and not attrs.get("input_attachment"):
             raise ValidationError("'input_attachment' payload must be provided in case of 'input' switch action type")
@@ -391,8 +385,7 @@ class ActionSerializer(ModelSerializer, VeepsSerializer):
     @transaction.atomic
     def create(self, validated_data):
         action = Action.objects.create(**validated_data)
-        input_template = action.playout.channel_template
-        input_id = action.input_attachment.input_id(input_template.template)
+        input_id = action.input_attachment.input_id()
         channel_id = action.channel.channel_template.get_channel_id()
 
         schedule_actions = []
@@ -445,10 +438,6 @@ class ScheduleSerializer(ModelSerializer, VeepsSerializer):
         read_only_fields = ["id", "created_on", "actions"]
         fields = ["live_date", "actions_data"] + read_only_fields
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.medialive_client = self.get_boto_client("medialive")
-
     @transaction.atomic
     def delete(self):
         schedule = self.instance
@@ -474,18 +463,12 @@ class ClipSerializer(ModelSerializer, VeepsSerializer):
         read_only_fields = ["id", "status", "asset_id"]
         fields = ["start_time", "end_time", "playout"] + read_only_fields
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.mediapackage_client = self.get_boto_client("mediapackage")
-        self.mediapackage_vod_client = self.get_boto_client("mediapackage-vod")
-
     @transaction.atomic
     def create(self, validated_data):
         clip = super().create(validated_data)
 
         # Create a harvesting job for clipping in media package
-        client = boto3.client("mediapackage")
-        response = client.create_harvest_job(
+        response = self.mediapackage_client.create_harvest_job(
             StartTime=clip.start_time.astimezone(pytztimezone("US/Eastern")).isoformat(),
             EndTime=clip.end_time.astimezone(pytztimezone("US/Eastern")).isoformat(),
             Id=f"{clip.id}",
@@ -510,6 +493,7 @@ class ClipSerializer(ModelSerializer, VeepsSerializer):
 
         clip.delete()
 
+    @transaction.atomic
     def ingest_asset(self):
         clip = self.instance
         clip.asset_id = str(uuid.uuid4())
@@ -526,24 +510,40 @@ class ClipSerializer(ModelSerializer, VeepsSerializer):
         clip.save()
 
         # Register to CallbackEvent and invoke task to callback endpoints
-        for subscriber in CallbackSubscriber.objects.all():
-            event = CallbackEvent.objects.create(
-                playout=clip.playout,
-                subscriber=subscriber,
-                event_type=CallbackEvent.EVENT_TYPE_CLIPPING_SUCCESS,
-                object_id=clip.id,
-                event_object=json.dumps(model_to_dict(clip), sort_keys=True, indent=1, cls=DjangoJSONEncoder),
-            )
-            tasks.call_webhook(event.id)
+        callbacks.publish(CallbackEvent.EVENT_TYPE_CLIPPING_SUCCESS, clip.playout, clip)
 
         return clip
 
 
 class CallbackSubscriberSerializer(ModelSerializer):
+    event_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=CallbackEvent.EVENT_TYPES), required=False, allow_empty=True
+    )
+
     class Meta:
         model = CallbackSubscriber
-        read_only_fields = ["id", "signing_secret", "created_on", "updated_on"]
-        fields = ["endpoint", "retry_count"] + read_only_fields
+        read_only_fields = [
+            "id",
+            "signing_secret",
+            "circuit_state",
+            "circuit_opened_at",
+            "consecutive_failures",
+            "created_on",
+            "updated_on",
+        ]
+        fields = [
+            "endpoint",
+            "retry_count",
+            "batch_enabled",
+            "batch_max_size",
+            "batch_max_linger",
+            "event_types",
+            "playouts",
+        ] + read_only_fields
+        extra_kwargs = {
+            "batch_max_size": {"min_value": 1, "max_value": 500},
+            "batch_max_linger": {"min_value": 0, "max_value": 60},
+        }
 
     def create(self, validated_data):
         instance = super().create(validated_data)
@@ -613,3 +613,21 @@ class VodAssetSerializer(ModelSerializer):
             "source_arn",
             "tags",
         ] + read_only_fields
+
+
+class ProvisioningJobSerializer(ModelSerializer):
+    class Meta:
+        model = ProvisioningJob
+        read_only_fields = [
+            "id",
+            "kind",
+            "status",
+            "playout",
+            "object_id",
+            "stack_name",
+            "detail",
+            "created_on",
+            "updated_on",
+            "finished_on",
+        ]
+        fields = read_only_fields
@@ -0,0 +1,68 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import retention
+from .callbacks import subscriber_index
+from .models import Action, CallbackSubscriber, Channel, Distribution, Input, Playout, RuntimeState, Schedule
+
+# lookups from the playouts to the objects their resources are rendered from
+PLAYOUT_VERSION_LOOKUPS = {
+    Input: "input",
+    Channel: "channel",
+    Distribution: "distribution",
+    Schedule: "channel__schedule",
+    Action: "channel__schedule__actions",
+}
+
+
+@receiver(post_save, sender=CallbackSubscriber)
+@receiver(post_delete, sender=CallbackSubscriber)
+@receiver(m2m_changed, sender=CallbackSubscriber.playouts.through)
+def invalidate_subscriber_index(**kwargs):
+    subscriber_index.invalidate()
+
+
+@receiver(pre_save, sender=Playout)
+def bump_playout_version(instance, update_fields, **kwargs):
+    # incremented by the update itself: the version of the instance may be behind the bumps of the related objects,
+    # writing it back would give an earlier ETag to the new content
+    if not instance._state.adding and update_fields is None:
+        instance.version = F("version") + 1
+
+
+@receiver(post_save, sender=Playout)
+def refresh_playout_version(instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is not None and "version" not in update_fields:
+        Playout.bump_version(pk=instance.pk)
+    instance.refresh_from_db(fields=["version"])
+
+
+@receiver(post_save, sender=Input)
+@receiver(post_save, sender=Channel)
+@receiver(post_save, sender=Distribution)
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=Action)
+# before the delete, the relations to the playout are still there
+@receiver(pre_delete, sender=Input)
+@receiver(pre_delete, sender=Channel)
+@receiver(pre_delete, sender=Distribution)
+@receiver(pre_delete, sender=Schedule)
+@receiver(pre_delete, sender=Action)
+def bump_related_playout_version(sender, instance, **kwargs):
+    Playout.bump_version(**{PLAYOUT_VERSION_LOOKUPS[sender]: instance.pk})
+
+
+@receiver(post_delete, sender=Channel)
+@receiver(post_delete, sender=Input)
+def delete_runtime_state(instance, **kwargs):
+    RuntimeState.objects.filter(resource_id=instance.pk).delete()
+
+
+@receiver(post_migrate)
+def create_callback_partitions(sender, plan, **kwargs):
+    # every deployment migrates, so the upcoming months always have their partitions even without the worker
+    if sender.name == "apps.api" and not any(backwards for _, backwards in plan or []):
+        retention.ensure_partitions()
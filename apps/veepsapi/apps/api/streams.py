@@ -0,0 +1,144 @@
+import atexit
+import json
+import logging
+import threading
+import time
+
+from django.db import connection
+from rest_framework.renderers import BaseRenderer
+
+from config import settings
+from .models import PlayoutEvent
+from .outbox import OutboxRelay
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel of the playout events, the payload is the playout id
+CHANNEL = "playout_events"
+
+
+def notify(playout_id):
+    """
+    Wake up the streams of a playout once the current transaction commits
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, str(playout_id)])
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # the stream itself is a StreamingHttpResponse, this only renders the errors
+        return json.dumps(data).encode("utf-8")
+
+
+class PlayoutEventHub:
+    """
+    Listens to the playout events of the worker on one connection, and wakes up the streams of the playouts notified,
+    so the number of streams doesn't cost database connections.
+    """
+
+    def __init__(self):
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = None
+
+    def subscribe(self, playout_id):
+        """
+        :return: event set when events of the playout are committed, pass it to `unsubscribe` once done
+        """
+        waiter = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(str(playout_id), set()).add(waiter)
+            if self._thread is None:
+                self._stopping = threading.Event()
+                self._thread = threading.Thread(
+                    target=self.listen, args=(self._stopping,), name="playout-events", daemon=True
+                )
+                self._thread.start()
+        return waiter
+
+    def unsubscribe(self, playout_id, waiter):
+        with self._lock:
+            waiters = self._waiters.get(str(playout_id), set())
+            waiters.discard(waiter)
+            if not waiters:
+                self._waiters.pop(str(playout_id), None)
+
+    def listen(self, stopping):
+        listener = OutboxRelay(channel=CHANNEL)
+        try:
+            while not stopping.is_set():
+                playout_ids = set(listener.receive(settings.PLAYOUT_EVENTS_HEARTBEAT))
+                with self._lock:
+                    waiters = [waiter for playout_id in playout_ids for waiter in self._waiters.get(playout_id, ())]
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            listener.close()
+
+    def stop(self):
+        """
+        Stop listening and close the LISTEN connection, at exit and at the end of the tests. A later `subscribe`
+        starts listening again.
+        """
+        with self._lock:
+            thread, stopping = self._thread, self._stopping
+            self._thread = self._stopping = None
+        if thread is None:
+            return
+
+        stopping.set()
+        try:
+            # wake the listener up rather than waiting for its heartbeat
+            notify("")
+        except Exception:
+            logger.exception("Couldn't wake the playout events listener up")
+        thread.join(settings.PLAYOUT_EVENTS_HEARTBEAT + 1)
+
+
+hub = PlayoutEventHub()
+atexit.register(hub.stop)
+
+
+def format_event(event):
+    data = json.dumps({"type": event.event_type, "object": json.loads(event.event_object)})
+    return f"id: {event.id}\nevent: {event.event_type}\ndata: {data}\n\n"
+
+
+def stream(playout_id, cursor):
+    """
+    Server-sent events of a playout after the `cursor` event id, until PLAYOUT_EVENTS_STREAM_TIMEOUT (the clients
+    reconnect with the Last-Event-ID they got). The events of a playout are committed in the order of their ids
+    (see callbacks.publish), so none shows up behind the cursor. A comment is sent every PLAYOUT_EVENTS_HEARTBEAT
+    seconds without events, so proxies keep the connection open.
+    """
+    waiter = hub.subscribe(playout_id)
+    closes_at = time.monotonic() + settings.PLAYOUT_EVENTS_STREAM_TIMEOUT
+    try:
+        yield f"retry: {settings.PLAYOUT_EVENTS_RETRY * 1000}\n\n"
+
+        while time.monotonic() < closes_at:
+            # cleared before reading, so events committed meanwhile wake the stream up right away
+            waiter.clear()
+            events = list(
+                PlayoutEvent.objects.filter(playout_id=playout_id, id__gt=cursor).order_by("id")[
+                    : settings.PLAYOUT_EVENTS_BATCH_SIZE
+                ]
+            )
+            for event in events:
+                yield format_event(event)
+                cursor = event.id
+
+            if len(events) == settings.PLAYOUT_EVENTS_BATCH_SIZE:
+                continue
+
+            # don't hold a database connection while waiting
+            connection.close()
+            if not waiter.wait(min(settings.PLAYOUT_EVENTS_HEARTBEAT, max(0, closes_at - time.monotonic()))):
+                yield ": heartbeat\n\n"
+    finally:
+        hub.unsubscribe(playout_id, waiter)
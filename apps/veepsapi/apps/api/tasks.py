@@ -2,60 +2,140 @@ import calendar
 import hashlib
 import hmac
 import json
+import os
+import threading
 import time
 import traceback
+from urllib.parse import urlsplit
 
 import requests
+from django.db.models import F
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
 
+from config import settings
 from apps.api import models
 from apps.api import enums
 
+_sessions = {}
+_sessions_lock = threading.Lock()
 
-def call_webhook(event_id):
-    event = models.CallbackEvent.objects.get(id=event_id)
-    callback_endpoint = event.subscriber.endpoint
-    data = {"type": event.event_type, "object": json.loads(event.event_object)}
+
+def get_session(endpoint):
+    """
+    Long-lived session per subscriber origin, so consecutive deliveries reuse kept-alive connections instead of
+    paying a TCP/TLS handshake each. Keyed on the pid so a forked worker never shares its parent's connections.
+    """
+    url = urlsplit(endpoint)
+    key = (os.getpid(), url.scheme, url.netloc)
+
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            # retries are scheduled by the delivery engine
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.CALLBACK_POOL_MAXSIZE, max_retries=0)
+            session.mount(f"{url.scheme}://", adapter)
+            _sessions[key] = session
+
+    return session
+
+
+def sign(signing_secret, sig_timestamp, sig_body):
+    """
+    Veeps-Signature of a callback body
+    """
+    # the signed payload embeds the body the way it was always formatted (as the repr of the bytes), so subscribers
+    # keep verifying signatures the same way
+    payload = f"{sig_timestamp}.{sig_body}"
+    signature = hmac.new(bytearray(signing_secret.encode("utf-8")), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"t={sig_timestamp},v1={signature}"
+
+
+def send(subscriber, data):
+    """
+    POST a signed callback payload to the endpoint of `subscriber`
+    :return: (True if the endpoint acknowledged the payload, fields of the CallbackLog of the call)
+    """
+    callback_endpoint = subscriber.endpoint
+
+    # serialize and sign the body once, and send exactly those bytes
+    sig_body = json.dumps(data).encode("utf-8")
+    sig_timestamp = calendar.timegm(time.gmtime())
+    headers = {
+        "Content-Type": "application/json",
+        enums.WEBHOOK_SIGNATURE_HEADER_NAME: sign(subscriber.signing_secret, sig_timestamp, sig_body),
+    }
+    log = {
+        "callback_endpoint": callback_endpoint,
+        "headers": headers,
+        "body": sig_body,
+        "sig_timestamp": sig_timestamp,
+        "sig_body": sig_body,
+    }
     try:
-        session = requests.Session()
-        request = requests.Request("POST", callback_endpoint, json=data)
-        prepped = session.prepare_request(request)
-
-        sig_timestamp = calendar.timegm(time.gmtime())
-        sig_body = prepped.body
-        payload = f"{sig_timestamp}.{sig_body}"
-        signature = hmac.new(
-            bytearray(event.subscriber.signing_secret.encode("utf-8")), payload.encode("utf-8"), hashlib.sha256
-        ).hexdigest()
-        headers = {enums.WEBHOOK_SIGNATURE_HEADER_NAME: f"t={sig_timestamp},v1={signature}"}
-        request = requests.Request("POST", callback_endpoint, json=data, headers=headers)
-        prepped = session.prepare_request(request)
-
-        response = session.send(prepped, verify=False, timeout=enums.INVOKE_CALLBACK_TIMEOUT)
-
-        if 200 <= int(response.status_code) < 300:
-            event.delivered_status = True
-        event.save()
-        models.CallbackLog.objects.create(
-            playout_id=event.playout.id,
-            callback_endpoint=callback_endpoint,
+        response = get_session(callback_endpoint).post(
+            callback_endpoint,
+            data=sig_body,
+            headers=headers,
+            verify=False,
+            timeout=enums.INVOKE_CALLBACK_TIMEOUT,
+        )
+        log.update(
             headers=response.request.headers,
             body=response.request.body,
-            response=response.json(),
+            response=response.text,
             status_code=response.status_code,
             execution_time=response.elapsed.total_seconds(),
-            sig_timestamp=sig_timestamp,
-            sig_body=sig_body,
         )
+        return 200 <= int(response.status_code) < 300, log
+    except requests.RequestException as err:
+        # an endpoint being down or slow is expected, the traceback wouldn't tell anything more
+        log["exception"] = f"{type(err).__name__}: {err}"
+        return False, log
     except Exception:
-        models.CallbackLog.objects.create(
-            playout_id=event.playout.id,
-            callback_endpoint=callback_endpoint,
-            headers=prepped.headers,
-            body=prepped.body,
-            sig_timestamp=sig_timestamp,
-            sig_body=sig_body,
-            exception=traceback.format_exc(),
-        )
+        log["exception"] = traceback.format_exc()
+        return False, log
+
+
+def call_webhook(event_id):
+    """
+    Call the subscriber endpoint of a callback event once, retries are scheduled by the delivery engine
+    :return: True if the endpoint acknowledged the event
+    """
+    event = models.CallbackEvent.objects.select_related("subscriber").get(id=event_id)
+    data = {"type": event.event_type, "object": json.loads(event.event_object)}
+
+    delivered, log = send(event.subscriber, data)
+    models.CallbackLog.objects.create(playout_id=event.playout_id, **log)
 
+    event.delivered_status = delivered
     event.retried_count += 1
-    event.save()
+    event.save(update_fields=["delivered_status", "retried_count", "updated_on"])
+    return delivered
+
+
+def call_webhook_batch(event_ids):
+    """
+    Call the endpoint of a batch subscriber once with an array of its callback events
+    :return: True if the endpoint acknowledged the events
+    """
+    events = list(models.CallbackEvent.objects.select_related("subscriber").filter(id__in=event_ids).order_by("id"))
+    if not events:
+        return False
+
+    data = [{"id": event.id, "type": event.event_type, "object": json.loads(event.event_object)} for event in events]
+
+    delivered, log = send(events[0].subscriber, data)
+    models.CallbackLog.objects.bulk_create(
+        [models.CallbackLog(playout_id=playout_id, **log) for playout_id in {event.playout_id for event in events}]
+    )
+
+    models.CallbackEvent.objects.filter(id__in=[event.id for event in events]).update(
+        delivered_status=delivered, retried_count=F("retried_count") + 1, updated_on=timezone.now()
+    )
+    return delivered
@@ -1,14 +1,28 @@
+from django.db import connection
 from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
+from .. import catalog
 from ..cloudformation.liveinput import MediaLiveInputLive
-from ..models import Playout, Input, Channel
+from ..models import Playout, Input, Channel, InboxMessage
 from ..tests.factories import UserFactory
 from ..cloudformation import CloudFormationStackGeneric
-from ..tests.mocks import mock_delete_stack, mock_get_outputs, mock_get_boto_client, mock_none, mock_create_stack
+from ..tests.mocks import (
+    mock_delete_stack,
+    mock_get_outputs,
+    mock_get_boto_client,
+    mock_none,
+    mock_create_stack,
+    mock_submit_job,
+    mock_enqueue_events,
+)
 from ..cloudformation.channel import MediaLiveChannel
 from ..serializers import VeepsSerializer
+from ..jobs import ProvisioningWorkerPool
+from ..inbox import InboxConsumerPool
+from ..delivery import CallbackDeliveryEngine
 
 
 class VeepsTestCase(SimpleTestCase):
@@ -30,6 +44,10 @@ class VeepsTestCase(SimpleTestCase):
         setattr(MediaLiveInputLive, "start", mock_none)
         setattr(MediaLiveInputLive, "stop", mock_none)
         setattr(VeepsSerializer, "get_boto_client", mock_get_boto_client)
+        setattr(ProvisioningWorkerPool, "submit", mock_submit_job)
+        # inbox messages are processed by the tests themselves
+        setattr(InboxConsumerPool, "wake", mock_none)
+        setattr(CallbackDeliveryEngine, "enqueue", mock_enqueue_events)
 
         token = Token.objects.create(user=self.user)
 
@@ -44,3 +62,29 @@ class VeepsTestCase(SimpleTestCase):
 
         for channel in Channel.objects.all():
             channel.delete()
+
+        InboxMessage.objects.all().delete()
+        catalog.get_cache().clear()
+
+    def assertQueryBudget(self, endpoint_url, create, sizes=(1, 5), **params):
+        """
+        Assert the number of queries of a list endpoint doesn't grow with the number of objects it returns
+        :param create: callable adding one object to the list
+        :param sizes: numbers of objects to list and compare
+        """
+        # warm the per-worker caches (token, ...) up, so they don't count in the first measure only
+        self.client.get(endpoint_url, params)
+
+        counts = []
+        created = 0
+        for size in sizes:
+            for _ in range(size - created):
+                create()
+            created = max(created, size)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(endpoint_url, {"limit": size, **params})
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+
+        self.assertEqual(len(set(counts)), 1, f"{endpoint_url} queries grow with the objects listed: {counts}")
@@ -18,7 +18,7 @@ class UserFactory(factory.Factory):
 
     first_name = factory.Faker("first_name")
     last_name = factory.Faker("last_name")
-    email = factory.LazyAttribute(lambda o: f"{o.first_name}@test.com".lower())
+    email = factory.Sequence(lambda n: f"user{n}@test.com")
     is_admin = False
     is_superuser = False
     is_staff = False
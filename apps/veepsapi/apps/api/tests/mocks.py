@@ -1,6 +1,8 @@
 import uuid
+from datetime import timedelta
 
 from botocore import session
+from botocore.exceptions import ClientError
 from botocore.stub import Stubber
 
 
@@ -37,3 +39,131 @@ def mock_get_outputs(self):
 # noinspection PyUnusedLocal
 def mock_none(self):
     return
+
+
+# noinspection PyUnusedLocal
+def mock_submit_job(self, job):
+    # run provisioning jobs inline instead of in the worker pool
+    from ..jobs import run_job
+
+    run_job(job.id)
+
+
+# noinspection PyUnusedLocal
+def mock_enqueue_events(self, events):
+    # callback deliveries are driven by the tests themselves
+    return
+
+
+def mock_call_webhook_failed(event_id):
+    from django.db.models import F
+    from ..models import CallbackEvent
+
+    CallbackEvent.objects.filter(id=event_id).update(retried_count=F("retried_count") + 1)
+    return False
+
+
+def mock_call_webhook_batch_delivered(event_ids):
+    from django.db.models import F
+    from ..models import CallbackEvent
+
+    CallbackEvent.objects.filter(id__in=event_ids).update(delivered_status=True, retried_count=F("retried_count") + 1)
+    return True
+
+
+def mock_call_webhook_delivered(event_id):
+    from django.db.models import F
+    from ..models import CallbackEvent
+
+    CallbackEvent.objects.filter(id=event_id).update(delivered_status=True, retried_count=F("retried_count") + 1)
+    return True
+
+
+class MockMediaStoreClient:
+    """
+    mediastore and mediastore-data client, listing the pages of items of `folders` ({path: [[item, ...], ...]}),
+    failing to list the paths of `errors` with their error code
+    """
+
+    def __init__(self, folders, errors=None):
+        self.folders = folders
+        self.errors = errors or {}
+        self.listed = []
+
+    # noinspection PyPep8Naming,PyUnusedLocal
+    def get_boto_client(self, resource_name, region_name=None, endpoint_url=None):
+        return self
+
+    # noinspection PyPep8Naming
+    def describe_container(self, ContainerName):
+        return {"Container": {"Name": ContainerName, "Endpoint": f"https://{ContainerName}.data.mediastore.test"}}
+
+    # noinspection PyPep8Naming,PyUnusedLocal
+    def list_items(self, Path, MaxResults=None, NextToken=None):
+        self.listed.append(Path)
+        if Path in self.errors:
+            raise ClientError({"Error": {"Code": self.errors[Path], "Message": Path}}, "ListItems")
+        pages = self.folders.get(Path, [[]])
+        page = int(NextToken or 0)
+        response = {"Items": [dict(item) for item in pages[page]]}
+        if page + 1 < len(pages):
+            response["NextToken"] = str(page + 1)
+        return response
+
+
+class MockCloudFormationClient:
+    """
+    cloudformation client, describing the change set with the successive `change_set_statuses` (the last one repeats)
+    and listing the pages of stack summaries of `stack_pages`
+    """
+
+    def __init__(self, change_set_statuses=(), stack_pages=()):
+        self.change_set_statuses = list(change_set_statuses)
+        self.stack_pages = list(stack_pages)
+        self.calls = []
+
+    def get_paginator(self, operation_name):
+        return MockPaginator(self, operation_name)
+
+    # noinspection PyPep8Naming
+    def describe_change_set(self, ChangeSetName, StackName):
+        self.calls.append(("describe_change_set", ChangeSetName))
+        if len(self.change_set_statuses) > 1:
+            return self.change_set_statuses.pop(0)
+        return self.change_set_statuses[0]
+
+    # noinspection PyPep8Naming
+    def delete_change_set(self, ChangeSetName, StackName):
+        self.calls.append(("delete_change_set", ChangeSetName))
+        return {}
+
+    def called(self, operation):
+        return [name for call, name in self.calls if call == operation]
+
+
+class MockPaginator:
+    def __init__(self, client, operation_name):
+        self.client = client
+        self.operation_name = operation_name
+
+    def paginate(self):
+        for page, summaries in enumerate(self.client.stack_pages):
+            self.client.calls.append((self.operation_name, page))
+            yield {"StackSummaries": summaries}
+
+
+class MockSession:
+    """
+    requests session acknowledging every POST, keeping the requests it was sent
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    # noinspection PyUnusedLocal
+    def post(self, url, data=None, headers=None, **kwargs):
+        self.requests.append({"url": url, "data": data, "headers": headers})
+        request = type("MockRequest", (), {"headers": headers, "body": data})
+        return type(
+            "MockResponse", (), {"request": request, "text": "", "status_code": 200, "elapsed": timedelta(seconds=0)}
+        )
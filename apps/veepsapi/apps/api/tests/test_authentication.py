@@ -0,0 +1,61 @@
+import logging
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from . import VeepsTestCase
+from ...users.authentication import TokenCache, token_cache
+from ...users.models import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+
+class AuthenticationTests(VeepsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.endpoint_url = reverse("playout-list")
+        self.token = Token.objects.get(user=self.user)
+
+    def test_token_cache(self):
+        logging.info("===> Testing token authentication cache")
+
+        self.assertEqual(self.client.get(self.endpoint_url).status_code, status.HTTP_200_OK)
+        self.assertIn(self.token.key, token_cache)
+
+        logging.info("=========> should authenticate a cached token without querying it")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.endpoint_url).status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if "authtoken_token" in query["sql"]])
+
+        logging.info("=========> should reject the token of a deactivated user right away")
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.endpoint_url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleted_token(self):
+        logging.info("===> Testing token authentication cache with a deleted token")
+
+        self.assertEqual(self.client.get(self.endpoint_url).status_code, status.HTTP_200_OK)
+
+        logging.info("=========> should reject a deleted token right away")
+        self.token.delete()
+        self.assertEqual(self.client.get(self.endpoint_url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_revoked_by_another_worker(self):
+        logging.info("===> Testing token authentication cache of the other workers")
+
+        other_worker = TokenCache(maxsize=10, ttl=60)
+        with override_settings(AUTH_TOKEN_SYNC_INTERVAL=0):
+            self.assertIsNone(other_worker.get(self.token.key))
+            other_worker.set(self.token.key, (self.user, self.token))
+            self.assertIsNotNone(other_worker.get(self.token.key))
+
+            logging.info("=========> should drop a token deleted by another worker on its next check")
+            self.token.delete()
+            self.assertTrue(TokenRevocation.objects.filter(key=self.token.key).exists())
+            self.assertIsNone(other_worker.get(self.token.key))
@@ -0,0 +1,347 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from config import settings
+from . import VeepsTestCase
+from .factories import PlayoutFactory
+from .mocks import (
+    MockSession,
+    mock_call_webhook_failed,
+    mock_call_webhook_batch_delivered,
+    mock_call_webhook_delivered,
+)
+from .. import callbacks, circuit, enums, outbox, retention, tasks
+from ..callbacks import subscriber_index
+from ..delivery import CallbackDeliveryEngine, delivery_engine, deliver, deliver_batch
+from ..models import CallbackDailySummary, CallbackEvent, CallbackLog, CallbackSubscriber
+from ..outbox import OutboxRelay
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackTests(VeepsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.addCleanup(setattr, tasks, "call_webhook", tasks.call_webhook)
+        self.addCleanup(setattr, tasks, "call_webhook_batch", tasks.call_webhook_batch)
+        setattr(tasks, "call_webhook", mock_call_webhook_failed)
+        setattr(tasks, "call_webhook_batch", mock_call_webhook_batch_delivered)
+
+        CallbackSubscriber.objects.all().delete()
+        self.subscriber = CallbackSubscriber.objects.create(endpoint="http://test.test", retry_count=1)
+
+        playout = PlayoutFactory()
+        playout.save()
+        self.playout = playout
+        self.event = CallbackEvent.objects.create(
+            playout=playout,
+            subscriber=self.subscriber,
+            event_type=CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED,
+            object_id=playout.id,
+            event_object="{}",
+        )
+
+    def test_callback_retries(self):
+        logging.info("===> Testing callback delivery retries")
+
+        logging.info("=========> should schedule a retry when the endpoint fails")
+        self.assertFalse(deliver(self.event.id))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.retried_count, 1)
+        self.assertFalse(self.event.delivered_status)
+        self.assertGreater(self.event.next_attempt_at, timezone.now())
+        self.assertIsNone(self.event.locked_until)
+
+        logging.info("=========> should not call the endpoint before the retry is due")
+        self.assertFalse(deliver(self.event.id))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.retried_count, 1)
+
+        logging.info("=========> should give up after retry_count retries")
+        CallbackEvent.objects.filter(id=self.event.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(delivery_engine.deliver_due(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.retried_count, 2)
+        self.assertIsNone(self.event.next_attempt_at)
+        self.assertEqual(delivery_engine.deliver_due(), 0)
+
+    def test_callback_batch(self):
+        logging.info("===> Testing batched callback delivery")
+
+        CallbackSubscriber.objects.filter(id=self.subscriber.id).update(
+            batch_enabled=True, batch_max_size=3, batch_max_linger=60
+        )
+        # with the event of setUp, 2 events are waiting
+        CallbackEvent.objects.create(
+            playout=self.playout,
+            subscriber=self.subscriber,
+            event_type=CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED,
+            object_id=self.playout.id,
+            event_object="{}",
+        )
+
+        logging.info("=========> should hold the events until the batch is full or lingered")
+        self.assertEqual(deliver_batch(self.subscriber.id), 0)
+        self.assertEqual(delivery_engine.deliver_due(), 0)
+        self.assertEqual(CallbackEvent.objects.filter(subscriber=self.subscriber, delivered_status=True).count(), 0)
+
+        logging.info("=========> should send a full batch")
+        CallbackEvent.objects.create(
+            playout=self.playout,
+            subscriber=self.subscriber,
+            event_type=CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED,
+            object_id=self.playout.id,
+            event_object="{}",
+        )
+        self.assertEqual(deliver_batch(self.subscriber.id), 3)
+
+        logging.info("=========> should track the delivery of each event")
+        self.assertEqual(
+            CallbackEvent.objects.filter(
+                subscriber=self.subscriber, delivered_status=True, retried_count=1, next_attempt_at__isnull=True
+            ).count(),
+            3,
+        )
+
+        logging.info("=========> should send a partial batch when forced")
+        CallbackEvent.objects.create(
+            playout=self.playout,
+            subscriber=self.subscriber,
+            event_type=CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED,
+            object_id=self.playout.id,
+            event_object="{}",
+        )
+        self.assertEqual(deliver_batch(self.subscriber.id, force=True), 1)
+
+    def test_subscriber_filters(self):
+        logging.info("===> Testing callback subscriber filters")
+
+        endpoint_url = reverse("webhook-list")
+        other_playout = PlayoutFactory()
+        other_playout.save()
+
+        logging.info("======> Create Subscriber API (POST {})".format(endpoint_url))
+        create_response = self.client.post(
+            endpoint_url,
+            {
+                "endpoint": "http://test.test/clips",
+                "event_types": [CallbackEvent.EVENT_TYPE_CLIPPING_FAILED],
+                "playouts": [str(other_playout.id)],
+            },
+            format="json",
+        )
+        self.assertEqual(create_response.status_code, status.HTTP_201_CREATED)
+
+        logging.info("=========> should reject unknown event types")
+        invalid_response = self.client.post(
+            endpoint_url, {"endpoint": "http://test.test", "event_types": ["unknown"]}, format="json"
+        )
+        self.assertEqual(invalid_response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        logging.info("=========> should only match the subscribers of the event type and playout")
+        self.assertCountEqual(
+            subscriber_index.match(CallbackEvent.EVENT_TYPE_CLIPPING_FAILED, other_playout.id),
+            CallbackSubscriber.objects.all(),
+        )
+        self.assertEqual(
+            subscriber_index.match(CallbackEvent.EVENT_TYPE_CLIPPING_FAILED, self.playout.id), [self.subscriber]
+        )
+        self.assertEqual(
+            subscriber_index.match(CallbackEvent.EVENT_TYPE_VOD_ASSET_READY, other_playout.id), [self.subscriber]
+        )
+
+    def test_subscriber_cursor(self):
+        logging.info("===> Testing callback subscriber list API keyset pagination")
+
+        endpoint_url = reverse("webhook-list")
+        CallbackSubscriber.objects.create(endpoint="http://test.test/other")
+
+        logging.info("=========> should page through the subscribers, whose ids are integers")
+        first_page = self.client.get(endpoint_url, {"cursor": "", "limit": 1}).json()
+        self.assertEqual(len(first_page["results"]), 1)
+        second_page = self.client.get(first_page["next"])
+        self.assertEqual(second_page.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(second_page.json()["results"][0]["id"], first_page["results"][0]["id"])
+
+        logging.info("=========> should reject a cursor whose id isn't an id")
+        for pk in ([1], "latest", None):
+            cursor = base64.urlsafe_b64encode(json.dumps(["2026-01-01T00:00:00+00:00", pk]).encode()).decode()
+            response = self.client.get(endpoint_url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_signature(self):
+        logging.info("===> Testing the signature of the callbacks")
+
+        data = {"type": CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED, "object": {"id": 1}}
+        body = json.dumps(data).encode("utf-8")
+
+        logging.info("=========> should sign the timestamp and the body the way subscribers verify it")
+        self.assertEqual(
+            tasks.sign("secret", 1767225600, body),
+            "t=1767225600,v1=34c245f1677f63ef3c2437d4231886a9138b923411388093ff7783ebd21d05c2",
+        )
+
+        logging.info("=========> should send the same body and signature as the request prepared by requests")
+        session = MockSession()
+        self.addCleanup(setattr, tasks, "get_session", tasks.get_session)
+        setattr(tasks, "get_session", lambda endpoint: session)
+        delivered, _ = tasks.send(self.subscriber, data)
+        self.assertTrue(delivered)
+
+        sent = session.requests[0]
+        prepped = requests.Session().prepare_request(requests.Request("POST", self.subscriber.endpoint, json=data))
+        self.assertEqual(sent["data"], prepped.body)
+        sig_timestamp = sent["headers"][enums.WEBHOOK_SIGNATURE_HEADER_NAME].split(",")[0][len("t=") :]
+        signature = hmac.new(
+            bytearray(self.subscriber.signing_secret.encode("utf-8")),
+            f"{sig_timestamp}.{prepped.body}".encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+        self.assertEqual(sent["headers"][enums.WEBHOOK_SIGNATURE_HEADER_NAME], f"t={sig_timestamp},v1={signature}")
+
+    def test_sessions(self):
+        logging.info("===> Testing the sessions of the callback endpoints")
+
+        host = f"{uuid.uuid4().hex}.test"
+
+        logging.info("=========> should reuse the session of an origin for all its endpoints")
+        session = tasks.get_session(f"https://{host}/hooks/1")
+        self.assertIs(tasks.get_session(f"https://{host}/hooks/2?playout=1"), session)
+
+        logging.info("=========> should not share a session between origins")
+        self.assertIsNot(tasks.get_session(f"http://{host}/hooks/1"), session)
+        self.assertIsNot(tasks.get_session(f"https://other.{host}/hooks/1"), session)
+
+    def test_publish(self):
+        logging.info("===> Testing callback fan-out")
+
+        other_subscriber = CallbackSubscriber.objects.create(endpoint="http://test.test/other")
+
+        logging.info("=========> should create one event per matching subscriber")
+        events = callbacks.publish(CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED, self.playout, self.playout)
+        self.assertCountEqual([event.subscriber for event in events], [self.subscriber, other_subscriber])
+        self.assertTrue(all(event.id is not None for event in events))
+
+        logging.info("=========> should serialize the object once, in compact form")
+        self.assertEqual(len({event.event_object for event in events}), 1)
+        self.assertNotIn(", ", events[0].event_object)
+        self.assertEqual(str(events[0].object_id), str(self.playout.id))
+
+    def test_circuit_breaker(self):
+        logging.info("===> Testing callback circuit breaker")
+
+        drained = []
+        self.addCleanup(setattr, CallbackDeliveryEngine, "drain", CallbackDeliveryEngine.drain)
+        setattr(CallbackDeliveryEngine, "drain", lambda engine, subscriber: drained.append(subscriber.id))
+        CallbackSubscriber.objects.filter(id=self.subscriber.id).update(retry_count=100)
+
+        logging.info("=========> should open the circuit after consecutive failures")
+        for _ in range(settings.CALLBACK_CIRCUIT_FAILURE_THRESHOLD):
+            CallbackEvent.objects.filter(id=self.event.id).update(next_attempt_at=timezone.now())
+            self.assertFalse(deliver(self.event.id))
+        self.subscriber.refresh_from_db()
+        self.assertEqual(self.subscriber.circuit_state, CallbackSubscriber.CIRCUIT_OPEN)
+
+        logging.info("=========> should show the circuit in the subscriber API")
+        get_response = self.client.get(reverse("webhook-detail", kwargs={"pk": self.subscriber.id}))
+        self.assertEqual(get_response.json()["circuit_state"], CallbackSubscriber.CIRCUIT_OPEN)
+        self.assertEqual(get_response.json()["consecutive_failures"], settings.CALLBACK_CIRCUIT_FAILURE_THRESHOLD)
+
+        logging.info("=========> should park the events while the circuit is open")
+        CallbackEvent.objects.filter(id=self.event.id).update(next_attempt_at=timezone.now())
+        self.assertFalse(deliver(self.event.id))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.retried_count, settings.CALLBACK_CIRCUIT_FAILURE_THRESHOLD)
+        self.assertFalse(circuit.try_probe(self.subscriber.id))
+
+        logging.info("=========> should close the circuit once a probe succeeds")
+        setattr(tasks, "call_webhook", mock_call_webhook_delivered)
+        CallbackSubscriber.objects.filter(id=self.subscriber.id).update(
+            circuit_opened_at=timezone.now() - timedelta(seconds=settings.CALLBACK_CIRCUIT_RESET_TIMEOUT + 1)
+        )
+        self.assertEqual(delivery_engine.deliver_due(), 1)
+        self.subscriber.refresh_from_db()
+        self.assertEqual(self.subscriber.circuit_state, CallbackSubscriber.CIRCUIT_CLOSED)
+        self.assertEqual(self.subscriber.consecutive_failures, 0)
+        self.assertEqual(drained, [self.subscriber.id])
+
+    def test_outbox_relay(self):
+        logging.info("===> Testing callback outbox relay")
+
+        relay = OutboxRelay()
+        self.addCleanup(relay.close)
+        relay.connect()
+
+        logging.info("=========> should not wake the relay up for rolled back events")
+        with transaction.atomic():
+            outbox.notify()
+            transaction.set_rollback(True)
+        self.assertEqual(relay.wait(0.1), 0)
+
+        logging.info("=========> should wake the relay up once the events are committed")
+        with transaction.atomic():
+            outbox.notify()
+        self.assertEqual(relay.wait(5), 1)
+
+    def test_partitions_ahead(self):
+        logging.info("===> Testing callback partitions")
+
+        logging.info("=========> should have the partitions of the upcoming months once the database is migrated")
+        month = retention.month_start(timezone.now())
+        for _ in range(settings.CALLBACK_PARTITION_MONTHS_AHEAD + 1):
+            for table in retention.PARTITIONED_TABLES:
+                self.assertIn(month, retention.partitions(table))
+            month = retention.next_month(month)
+
+    def test_retention(self):
+        logging.info("===> Testing callback retention")
+
+        endpoint = "http://test.test/retention"
+        CallbackDailySummary.objects.filter(callback_endpoint=endpoint).delete()
+        CallbackSubscriber.objects.filter(id=self.subscriber.id).update(endpoint=endpoint)
+
+        # a month past the retention, with its partitions
+        month = retention.month_start(timezone.now() - timedelta(days=settings.CALLBACK_RETENTION_DAYS + 40))
+        day = month + timedelta(days=1)
+        for table in retention.PARTITIONED_TABLES:
+            retention.create_partition(table, month)
+
+        logs = [
+            CallbackLog.objects.create(
+                playout_id=self.playout.id,
+                callback_endpoint=endpoint,
+                headers="{}",
+                body="{}",
+                exception="",
+                status_code=status_code,
+                execution_time=execution_time,
+            )
+            for status_code, execution_time in [(200, 0.1), (200, 0.2), (500, 0.3)]
+        ]
+        CallbackLog.objects.filter(id__in=[log.id for log in logs]).update(created_on=day)
+        CallbackEvent.objects.filter(id=self.event.id).update(created_on=day, delivered_status=True)
+
+        logging.info("=========> should drop the expired partitions")
+        self.assertEqual(retention.drop_expired(), 2)
+        self.assertFalse(CallbackLog.objects.filter(id__in=[log.id for log in logs]).exists())
+        self.assertFalse(CallbackEvent.objects.filter(id=self.event.id).exists())
+        for table in retention.PARTITIONED_TABLES:
+            self.assertNotIn(month, retention.partitions(table))
+
+        logging.info("=========> should keep the daily summary of the dropped rows")
+        summary = CallbackDailySummary.objects.get(callback_endpoint=endpoint, day=day.date())
+        self.assertEqual((summary.attempts, summary.succeeded, summary.failed), (3, 2, 1))
+        self.assertAlmostEqual(summary.latency_p50, 0.2)
+        self.assertEqual((summary.events, summary.events_delivered), (1, 1))
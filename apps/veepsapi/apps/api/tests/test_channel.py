@@ -84,3 +84,37 @@ class ChannelTests(VeepsTestCase):
 
         logging.info("=========> should make sure that response state field got updated as off")
         self.assertEqual(stop_channel_response.json()["state"], StateOptions.OFF)
+
+    def test_channel_query_budget(self):
+        logging.info("===> Testing Channel list API queries")
+
+        def create_channel():
+            channel = ChannelFactory()
+            channel.save()
+            playout = PlayoutFactory()
+            playout.channel = channel
+            playout.save()
+
+        logging.info("=========> should not query the playout of each channel")
+        self.assertQueryBudget(reverse("channel-list"), create_channel)
+
+    def test_channel_conditional_get(self):
+        logging.info("===> Testing Channel conditional GET")
+
+        endpoint_url = reverse("channel-detail", kwargs={"playout_id": self.playout.id})
+
+        logging.info("======> Get Channel API (GET {})".format(endpoint_url))
+        get_response = self.client.get(endpoint_url)
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        etag = get_response["ETag"]
+
+        logging.info("=========> should answer 304 while the channel is unchanged")
+        get_response = self.client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        logging.info("=========> should serve the channel again once it is started")
+        self.client.patch(endpoint_url, data={"state": StateOptions.ON}, format="json")
+        get_response = self.client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_response.json()["state"], StateOptions.ON)
+        self.assertNotEqual(get_response["ETag"], etag)
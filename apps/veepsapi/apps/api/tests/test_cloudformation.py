@@ -0,0 +1,308 @@
+import logging
+import uuid
+
+from config import settings
+from . import VeepsTestCase
+from .factories import ChannelFactory, InputFactory, PlayoutFactory
+from .mocks import MockCloudFormationClient
+from ..models import CloudFormationStack, StackOutput
+from ..cloudformation import CloudFormationStackGeneric, registry
+from ..cloudformation.outputs import StackOutputStore, stack_output_store
+from ..cloudformation.templates import TemplateCache, template_cache
+from ..cloudformation.waiter import ChangeSetFailed, ChangeSetTimeout, ChangeSetWaiter
+from ..webhook_views import cloudformation_handler
+
+logger = logging.getLogger(__name__)
+
+PENDING = {"Status": "CREATE_PENDING"}
+COMPLETE = {"Status": "CREATE_COMPLETE"}
+
+
+class DescribedStack(CloudFormationStackGeneric):
+    """
+    Stack whose outputs are described from `outputs`, counting the describe_stacks calls
+    """
+
+    # noinspection PyMissingConstructor
+    def __init__(self, outputs):
+        self.stack_name = f"Stack{uuid.uuid4().hex}"
+        self.outputs = outputs
+        self.described = 0
+
+    def get_outputs(self):
+        self.described += 1
+        return self.outputs
+
+
+def stack_notification(stack_name, resource_status):
+    return {
+        "Message": "\n".join(
+            [
+                f"StackName='{stack_name}'",
+                f"LogicalResourceId='{stack_name}'",
+                f"ResourceStatus='{resource_status}'",
+                "ResourceType='AWS::CloudFormation::Stack'",
+            ]
+        )
+    }
+
+
+class ChangeSetWaiterTests(VeepsTestCase):
+    def waiter(self, *statuses, timeout=5):
+        client = MockCloudFormationClient(statuses)
+        return client, ChangeSetWaiter(client, "Stack", "Stackchange", timeout=timeout, base_delay=0.01, max_delay=0.04)
+
+    def test_wait(self):
+        logging.info("===> Testing the change set waiter")
+
+        logging.info("=========> should poll until the change set is created")
+        client, waiter = self.waiter(PENDING, PENDING, COMPLETE)
+        self.assertTrue(waiter.wait())
+        self.assertEqual(len(client.called("describe_change_set")), 3)
+        self.assertEqual(client.called("delete_change_set"), [])
+
+        logging.info("=========> should back off exponentially with jitter, up to the max delay")
+        for attempt, delay in enumerate([0.01, 0.02, 0.04, 0.04]):
+            self.assertTrue(delay / 2 <= waiter.delay(attempt) <= delay)
+
+        logging.info("=========> should give up at the deadline, deleting the change set")
+        client, waiter = self.waiter(PENDING, timeout=0.05)
+        with self.assertRaises(ChangeSetTimeout):
+            waiter.wait()
+        self.assertGreater(len(client.called("describe_change_set")), 1)
+        self.assertEqual(client.called("delete_change_set"), ["Stackchange"])
+
+    def test_failed(self):
+        logging.info("===> Testing the change sets CloudFormation couldn't create")
+
+        logging.info("=========> should raise and delete the failed change set")
+        client, waiter = self.waiter(PENDING, {"Status": "FAILED", "StatusReason": "Template error"})
+        with self.assertRaises(ChangeSetFailed):
+            waiter.wait()
+        self.assertEqual(client.called("delete_change_set"), ["Stackchange"])
+
+        logging.info("=========> should not execute a change set that has nothing to change")
+        client, waiter = self.waiter(
+            {"Status": "FAILED", "StatusReason": "The submitted information didn't contain changes."}
+        )
+        self.assertFalse(waiter.wait())
+        self.assertEqual(client.called("delete_change_set"), ["Stackchange"])
+
+
+class StackRegistryTests(VeepsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        CloudFormationStack.objects.all().delete()
+        registry.missing_stacks.clear()
+        registry.recent_reconciles.clear()
+
+    def test_record(self):
+        logging.info("===> Testing the stack registry entries")
+
+        logging.info("=========> should create the entry of a stack, and keep it current")
+        registry.record("arn:stack/Stack/1", "Stack", "CREATE_IN_PROGRESS")
+        registry.record("arn:stack/Stack/1", "Stack", "CREATE_COMPLETE", event={"ResourceStatus": "CREATE_COMPLETE"})
+        stack = registry.find("arn:stack/Stack/1")
+        self.assertEqual((stack.stack_name, stack.status), ("Stack", "CREATE_COMPLETE"))
+        self.assertEqual(stack.last_event, {"ResourceStatus": "CREATE_COMPLETE"})
+        self.assertEqual(CloudFormationStack.objects.count(), 1)
+
+        logging.info("=========> should not find a stack without an id")
+        self.assertIsNone(registry.find(""))
+        self.assertIsNone(registry.find("arn:stack/Other/2"))
+
+    def test_reconcile(self):
+        logging.info("===> Testing the reconciliation of the stack registry with CloudFormation")
+
+        registry.record("arn:stack/Stack/1", "Stack", "CREATE_IN_PROGRESS")
+        client = MockCloudFormationClient(
+            stack_pages=[
+                [{"StackId": "arn:stack/Stack/1", "StackName": "Stack", "StackStatus": "CREATE_COMPLETE"}],
+                [{"StackId": "arn:stack/Other/2", "StackName": "Other", "StackStatus": "DELETE_COMPLETE"}],
+            ]
+        )
+
+        logging.info("=========> should walk every page of the stacks, updating the known ones")
+        self.assertEqual(registry.reconcile(client), 2)
+        self.assertEqual(client.called("list_stacks"), [0, 1])
+        self.assertEqual(registry.find("arn:stack/Stack/1").status, "CREATE_COMPLETE")
+        self.assertEqual(registry.find("arn:stack/Other/2").status, "DELETE_COMPLETE")
+
+    def test_lookup(self):
+        logging.info("===> Testing the lookup of the stacks we haven't heard about")
+
+        client = MockCloudFormationClient(
+            stack_pages=[[{"StackId": "arn:stack/Stack/1", "StackName": "Stack", "StackStatus": "UPDATE_COMPLETE"}]]
+        )
+
+        logging.info("=========> should reconcile the registry for an unknown stack")
+        self.assertEqual(registry.lookup(client, "arn:stack/Stack/1").stack_name, "Stack")
+        self.assertEqual(len(client.called("list_stacks")), 1)
+
+        logging.info("=========> should not list the stacks again for a known stack")
+        registry.lookup(client, "arn:stack/Stack/1")
+        self.assertEqual(len(client.called("list_stacks")), 1)
+
+        logging.info("=========> should remember the stacks the listing didn't find")
+        registry.recent_reconciles.clear()
+        self.assertIsNone(registry.lookup(client, "arn:stack/Unknown/3"))
+        self.assertIsNone(registry.lookup(client, "arn:stack/Unknown/3"))
+        self.assertEqual(len(client.called("list_stacks")), 2)
+
+        logging.info("=========> should list the stacks at most once per interval")
+        self.assertIsNone(registry.lookup(client, "arn:stack/Unknown/4"))
+        self.assertEqual(len(client.called("list_stacks")), 2)
+
+        logging.info("=========> should find a missing stack as soon as SNS tells us about it")
+        registry.record("arn:stack/Unknown/3", "Unknown", "CREATE_COMPLETE")
+        self.assertEqual(registry.lookup(client, "arn:stack/Unknown/3").stack_name, "Unknown")
+
+
+class StackOutputStoreTests(VeepsTestCase):
+    def test_get_output_value(self):
+        logging.info("===> Testing the stack outputs lookups")
+
+        stack = DescribedStack([{"OutputKey": "SRTIP", "OutputValue": "10.0.0.1"}])
+
+        logging.info("=========> should describe the stack the outputs of which aren't known")
+        self.assertEqual(stack.get_output_value("SRTIP"), "10.0.0.1")
+        self.assertEqual(stack.described, 1)
+        self.assertEqual(StackOutput.objects.get(stack_name=stack.stack_name).outputs, {"SRTIP": "10.0.0.1"})
+
+        logging.info("=========> should serve the known outputs without describing the stack")
+        self.assertEqual(stack.get_output_value("SRTIP"), "10.0.0.1")
+        self.assertEqual(stack.described, 1)
+
+        logging.info("=========> should not describe the stack again for a key it didn't have a moment ago")
+        self.assertIsNone(stack.get_output_value("DistributionUrl"))
+        self.assertIsNone(stack.get_output_value("DistributionUrl"))
+        self.assertEqual(stack.described, 2)
+
+        logging.info("=========> should describe the stack again once a change set changed it")
+        stack.outputs = [{"OutputKey": "SRTIP", "OutputValue": "10.0.0.2"}]
+        stack.invalidate_outputs()
+        self.assertEqual(stack.get_output_value("SRTIP"), "10.0.0.2")
+        self.assertEqual(stack.described, 3)
+
+    def test_stack_notifications(self):
+        logging.info("===> Testing the stack outputs on CloudFormation notifications")
+
+        channel = ChannelFactory()
+        channel.save()
+        playout = PlayoutFactory()
+        playout.channel = channel
+        playout.save()
+        InputFactory(playout=playout).save()
+        stack_name = f"MediaLiveChannel{playout.id}"
+        channel.name = stack_name.replace("-", "")
+        channel.save()
+        stack_output_store.set(stack_name, [{"OutputKey": "ChannelArn", "OutputValue": "stale"}])
+
+        logging.info("=========> should store the outputs of the stack once it is updated")
+        cloudformation_handler(stack_notification(stack_name, "UPDATE_COMPLETE"))
+        # described by mock_get_outputs
+        self.assertEqual(stack_output_store.get(stack_name), {"ChannelArn": "1234"})
+
+        logging.info("=========> should forget the outputs of a stack once it is deleted")
+        stack_name = f"Stack{uuid.uuid4().hex}"
+        stack_output_store.set(stack_name, [{"OutputKey": "SRTIP", "OutputValue": "10.0.0.1"}])
+        cloudformation_handler(stack_notification(stack_name, "DELETE_COMPLETE"))
+        self.assertIsNone(stack_output_store.get(stack_name))
+        self.assertIsNotNone(StackOutput.objects.get(stack_name=stack_name).invalidated_on)
+
+    def test_other_process(self):
+        logging.info("===> Testing the stack outputs invalidated by another process")
+
+        self.addCleanup(setattr, settings, "STACK_OUTPUT_SYNC_INTERVAL", settings.STACK_OUTPUT_SYNC_INTERVAL)
+        setattr(settings, "STACK_OUTPUT_SYNC_INTERVAL", 0)
+        stack_name = f"Stack{uuid.uuid4().hex}"
+        other_process = StackOutputStore(maxsize=10, ttl=300, miss_ttl=30)
+
+        stack_output_store.set(stack_name, [{"OutputKey": "SRTIP", "OutputValue": "10.0.0.1"}])
+        self.assertEqual(other_process.get(stack_name), {"SRTIP": "10.0.0.1"})
+
+        logging.info("=========> should drop the outputs another process invalidated")
+        stack_output_store.invalidate(stack_name)
+        self.assertIsNone(other_process.get(stack_name))
+
+        logging.info("=========> should pick the outputs another process stored up")
+        stack_output_store.set(stack_name, [{"OutputKey": "SRTIP", "OutputValue": "10.0.0.2"}])
+        self.assertEqual(other_process.get(stack_name), {"SRTIP": "10.0.0.2"})
+
+
+class TemplateCacheTests(VeepsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        template_cache.clear()
+
+        channel = ChannelFactory()
+        channel.save()
+        self.playout = PlayoutFactory()
+        self.playout.channel = channel
+        self.playout.save()
+        channel.name = f"MediaLiveChannel{self.playout.id}".replace("-", "")
+        channel.save()
+        InputFactory(playout=self.playout).save()
+        self.input = InputFactory(playout=self.playout, initial_input=False, name="camera")
+        self.input.save()
+
+    def test_get_or_build(self):
+        logging.info("===> Testing the template cache")
+
+        cache = TemplateCache(maxsize=10)
+        built = []
+
+        def builder():
+            built.append(object())
+            return built[-1]
+
+        logging.info("=========> should build a template once per configuration")
+        template = cache.get_or_build(("channel", "HD"), builder)
+        self.assertIs(cache.get_or_build(("channel", "HD"), builder), template)
+        self.assertEqual(len(built), 1)
+
+        logging.info("=========> should build another template for another configuration")
+        self.assertIsNot(cache.get_or_build(("channel", "SD"), builder), template)
+        self.assertEqual(len(built), 2)
+
+    def test_channel_template(self):
+        logging.info("===> Testing the memoized channel templates")
+
+        channel = self.playout.channel
+
+        logging.info("=========> should reuse the template of the same configuration")
+        template = channel.channel_template
+        self.assertIs(channel.channel_template, template)
+
+        logging.info("=========> should build the template again once the channel changes")
+        self.playout.resolution = "SD"
+        self.playout.save()
+        self.assertIsNot(channel.channel_template, template)
+
+    def test_input_template(self):
+        logging.info("===> Testing the memoized input templates")
+
+        channel_resources = set(self.playout.channel_template.template.resources)
+
+        logging.info("=========> should reuse the template of the same inputs")
+        template = self.playout.input_template([self.input])
+        self.assertIs(self.playout.input_template([self.input]), template)
+
+        logging.info("=========> should not add the resources of the inputs to the memoized channel template")
+        self.assertEqual(set(self.playout.channel_template.template.resources), channel_resources)
+        self.assertGreater(set(template.template.resources), channel_resources)
+
+        logging.info("=========> should build the template again once an input changes, or is added")
+        self.input.name = "camera2"
+        self.input.save()
+        renamed_template = self.playout.input_template([self.input])
+        self.assertIsNot(renamed_template, template)
+        other_input = InputFactory(playout=self.playout, initial_input=False, name="other")
+        other_input.save()
+        self.assertIsNot(self.playout.input_template([self.input, other_input]), renamed_template)
+
+        logging.info("=========> should leave the memoized templates as they were built")
+        self.assertEqual(set(renamed_template.template.resources), set(template.template.resources))
+        self.assertEqual(set(self.playout.channel_template.template.resources), channel_resources)
@@ -5,7 +5,7 @@ from rest_framework import status
 
 from . import VeepsTestCase
 from .factories import PlayoutFactory, ChannelFactory, InputFactory
-from ..models import Input, Playout
+from ..models import Input, Playout, ProvisioningJob
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +46,9 @@ class InputTests(VeepsTestCase):
         create_response = self.client.post(endpoint_url, input_data, format="json")
         added_input = Input.objects.filter(name=input_data["name"]).first()
 
-        logging.info("=========> should return status code 201")
-        self.assertEqual(create_response.status_code, status.HTTP_201_CREATED)
+        logging.info("=========> should return status code 202")
+        self.assertEqual(create_response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(create_response.json()["job"]["kind"], ProvisioningJob.KIND_INPUT_CREATE)
 
         logging.info("=========> should store new input instance into input table")
         self.assertEqual(Input.objects.count(), input_count_before_create + 1)
@@ -105,12 +106,30 @@ class InputTests(VeepsTestCase):
 
         self.assertNotEqual(None, added_input)
 
+        logging.info("=========> should only finish the creation job once CloudFormation reports its own operation")
+        create_job = ProvisioningJob.objects.get(id=create_response.json()["job"]["id"])
+        stack_name = create_job.stack_name
+        self.assertEqual(ProvisioningJob.advance(stack_name, "UPDATE_COMPLETE", "job-not-ours"), 0)
+        self.assertEqual(ProvisioningJob.advance(stack_name, "UPDATE_COMPLETE", create_job.request_token), 1)
+        create_job.refresh_from_db()
+        self.assertEqual(create_job.status, ProvisioningJob.STATUS_SUCCEEDED)
+
         logging.info("======> Delete Input of Playout API (DELETE {})".format(endpoint_url))
 
         delete_response = self.client.delete(endpoint_url, data={"input_id": last_item["id"]}, format="json")
 
-        logging.info("=========> should return status code 204")
-        self.assertEqual(delete_response.status_code, status.HTTP_204_NO_CONTENT)
+        logging.info("=========> should return status code 202")
+        self.assertEqual(delete_response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(delete_response.json()["job"]["kind"], ProvisioningJob.KIND_INPUT_DELETE)
 
         logging.info("=========> should make sure that the instance gets deleted in input table")
         self.assertEqual(Input.objects.filter(pk=added_input.id).count(), 0)
+
+    def test_input_query_budget(self):
+        logging.info("===> Testing Input list API queries")
+
+        def create_input():
+            InputFactory(playout=self.playout_data, initial_input=False, name="camera").save()
+
+        logging.info("=========> should list the inputs with a constant number of queries")
+        self.assertQueryBudget(reverse("input-list"), create_input)
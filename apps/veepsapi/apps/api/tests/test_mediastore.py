@@ -0,0 +1,95 @@
+import json
+import logging
+import queue
+import threading
+
+from django.urls import reverse
+from rest_framework import status
+
+from config import settings
+
+from . import VeepsTestCase
+from .factories import PlayoutFactory
+from .mocks import MockMediaStoreClient
+from .. import mediastore, utils
+
+logger = logging.getLogger(__name__)
+
+
+class MediaStoreTests(VeepsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.playout = PlayoutFactory()
+        self.playout.save()
+
+        mediastore.container_endpoints.clear()
+        mediastore.listings.clear()
+
+        self.mediastore_client = MockMediaStoreClient(
+            {
+                "out": [
+                    [{"Name": "index.m3u8", "Type": "OBJECT"}, {"Name": "2026", "Type": "FOLDER"}],
+                    [{"Name": "index_1.m3u8", "Type": "OBJECT"}],
+                ],
+                "out/2026": [
+                    [{"Name": "segment_1.ts", "Type": "OBJECT"}],
+                    [{"Name": "segment_2.ts", "Type": "OBJECT"}],
+                ],
+            }
+        )
+        self.addCleanup(setattr, utils, "get_boto_client", utils.get_boto_client)
+        setattr(utils, "get_boto_client", self.mediastore_client.get_boto_client)
+
+    def list_items(self, **params):
+        response = self.client.get(reverse("mediastore-detail", kwargs={"pk": self.playout.id}), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_mediastore_listing(self):
+        logging.info("===> Testing MediaStore listing API")
+
+        logging.info("=========> should page through the items of the archive")
+        items = self.list_items()
+        self.assertEqual([item["Path"] for item in items], ["out/index.m3u8", "out/2026", "out/index_1.m3u8"])
+
+        logging.info("=========> should serve the same listing again from the cache")
+        self.assertEqual(self.list_items(), items)
+        self.assertEqual(self.mediastore_client.listed, ["out", "out"])
+
+        logging.info("=========> should list the sub-folders with a depth")
+        items = self.list_items(depth=1)
+        self.assertEqual(
+            sorted(item["Path"] for item in items),
+            ["out/2026", "out/2026/segment_1.ts", "out/2026/segment_2.ts", "out/index.m3u8", "out/index_1.m3u8"],
+        )
+
+        logging.info("=========> should reject a depth out of bounds")
+        response = self.client.get(reverse("mediastore-detail", kwargs={"pk": self.playout.id}), {"depth": 100})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mediastore_listing_failed(self):
+        logging.info("===> Testing MediaStore listing API when listing fails")
+
+        logging.info("=========> should fail the request when the first page can't be listed")
+        self.mediastore_client.errors["out"] = "InternalServerError"
+        response = self.client.get(reverse("mediastore-detail", kwargs={"pk": self.playout.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.streaming)
+
+        logging.info("=========> should leave the array unterminated when a sub-folder fails midway")
+        del self.mediastore_client.errors["out"]
+        self.mediastore_client.errors["out/2026"] = "InternalServerError"
+        response = self.client.get(reverse("mediastore-detail", kwargs={"pk": self.playout.id}), {"depth": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b"".join(response.streaming_content).decode()
+        self.assertTrue(content.startswith("["))
+        self.assertFalse(content.endswith("]"))
+
+        logging.info("=========> should stop listing for a client that doesn't read the pages")
+        self.addCleanup(setattr, settings, "MEDIASTORE_LIST_TIMEOUT", settings.MEDIASTORE_LIST_TIMEOUT)
+        setattr(settings, "MEDIASTORE_LIST_TIMEOUT", 0)
+        results, cancelled = queue.Queue(maxsize=1), threading.Event()
+        self.assertTrue(mediastore.lister.publish(results, cancelled, ("items", [])))
+        self.assertFalse(mediastore.lister.publish(results, cancelled, ("items", [])))
+        self.assertTrue(cancelled.is_set())
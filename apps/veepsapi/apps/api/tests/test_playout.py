@@ -1,10 +1,21 @@
+import json
 import logging
+import uuid
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
 from . import VeepsTestCase
-from ..models import Playout, Channel, Input, StateOptions
+from .factories import ChannelFactory, InputFactory, PlayoutFactory, UserFactory
+from .. import callbacks, streams
+from ..models import Playout, Channel, Input, StateOptions, ProvisioningJob, CallbackEvent, PlayoutEvent, RuntimeState
+from ..webhook_views import mediaconnect_handler, medialive_handler
+from ...users.models import ShowRunner
 
 logger = logging.getLogger(__name__)
 
@@ -28,9 +39,18 @@ class PlayoutTests(VeepsTestCase):
 
         create_response = self.client.post(endpoint_url, self.playout_data, format="json")
 
-        self.assertEquals(create_response.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(create_response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(Playout.objects.count(), 1)
 
+        logging.info("=========> should return the provisioning job of the channel stack")
+        job = create_response.json()["job"]
+        self.assertEqual(job["kind"], ProvisioningJob.KIND_PLAYOUT_CREATE)
+        self.assertEqual(job["stack_name"], f"MediaLiveChannel{create_response.json()['id']}")
+
+        job_response = self.client.get(reverse("job-detail", kwargs={"pk": job["id"]}))
+        self.assertEqual(job_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(job_response.json()["status"], ProvisioningJob.STATUS_WAITING)
+
         added_playout = Playout.objects.all().last()
 
         logging.info("=========> should make sure that new playout instance has valid channel foreign key")
@@ -146,8 +166,214 @@ class PlayoutTests(VeepsTestCase):
         logging.info("======> Delete Playout API (DELETE {})".format(delete_endpoint))
         delete_response = self.client.delete(delete_endpoint, format="json")
 
-        logging.info("=========> should return status code 204")
-        self.assertEqual(delete_response.status_code, status.HTTP_204_NO_CONTENT)
+        logging.info("=========> should return status code 202")
+        self.assertEqual(delete_response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(delete_response.json()["job"]["kind"], ProvisioningJob.KIND_PLAYOUT_DELETE)
 
         logging.info("=========> should make sure that the instance gets deleted in playout table")
         self.assertEqual(Playout.objects.all().count(), 0)
+
+    def test_playout_events(self):
+        logging.info("===> Testing Playout events stream")
+
+        playout = PlayoutFactory()
+        playout.save()
+        endpoint_url = reverse("playout-events", kwargs={"playout_id": playout.id})
+
+        logging.info("=========> should wake the streams up once an event is committed")
+        # close the LISTEN connection of the hub once the streams are done
+        self.addCleanup(streams.hub.stop)
+        waiter = streams.hub.subscribe(playout.id)
+        self.addCleanup(streams.hub.unsubscribe, playout.id, waiter)
+        callbacks.publish(CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED, playout, playout)
+        self.assertTrue(waiter.wait(5))
+
+        logging.info("======> Playout events stream (GET {})".format(endpoint_url))
+        callbacks.publish(CallbackEvent.EVENT_TYPE_CHANNEL_RUNNING, playout, playout)
+        first, second = PlayoutEvent.objects.filter(playout=playout).order_by("id")
+
+        logging.info("=========> should resume the stream after the Last-Event-ID")
+        response = self.client.get(endpoint_url, HTTP_ACCEPT="text/event-stream", HTTP_LAST_EVENT_ID=str(first.id))
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        content = iter(response.streaming_content)
+        self.assertTrue(next(content).decode("utf-8").startswith("retry:"))
+        event = next(content).decode("utf-8")
+        self.assertIn(f"id: {second.id}\n", event)
+        self.assertIn(f"event: {CallbackEvent.EVENT_TYPE_CHANNEL_RUNNING}\n", event)
+
+        logging.info("=========> should reject a cursor that isn't an event id")
+        response = self.client.get(endpoint_url, {"cursor": "latest"}, HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_playout_conditional_get(self):
+        logging.info("===> Testing Playout conditional GET")
+
+        playout = PlayoutFactory()
+        playout.save()
+        endpoint_url = reverse("playout-detail", kwargs={"playout_id": playout.id})
+
+        logging.info("======> Get Playout API (GET {})".format(endpoint_url))
+        with CaptureQueriesContext(connection) as full_queries:
+            get_response = self.client.get(endpoint_url)
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        etag = get_response["ETag"]
+
+        logging.info("=========> should answer 304 to the current ETag, with fewer queries")
+        with CaptureQueriesContext(connection) as conditional_queries:
+            get_response = self.client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(get_response["ETag"], etag)
+        self.assertLess(len(conditional_queries), len(full_queries))
+
+        logging.info("=========> should change the ETag once an input of the playout is saved")
+        playout_input = InputFactory()
+        playout_input.playout = playout
+        playout_input.save()
+        get_response = self.client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(get_response["ETag"], etag)
+
+        logging.info("=========> should change the ETag once an event of the playout is published")
+        etag = get_response["ETag"]
+        callbacks.publish(CallbackEvent.EVENT_TYPE_CHANNEL_RUNNING, playout, playout)
+        get_response = self.client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(get_response["ETag"], etag)
+
+    def test_playout_version_after_related_save(self):
+        logging.info("===> Testing Playout conditional GET once the playout is saved after a related change")
+
+        playout = PlayoutFactory()
+        playout.save()
+        endpoint_url = reverse("playout-detail", kwargs={"playout_id": playout.id})
+
+        playout_input = InputFactory()
+        playout_input.playout = playout
+        playout_input.save()
+        etag = self.client.get(endpoint_url)["ETag"]
+
+        logging.info(
+            "=========> should change the ETag when the playout is saved from an instance behind the input save"
+        )
+        playout.save()
+        get_response = self.client.get(endpoint_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(get_response["ETag"], etag)
+
+        logging.info("=========> should keep the version of the saved instance current")
+        self.assertEqual(playout.version, Playout.objects.get(pk=playout.pk).version)
+        self.assertEqual(get_response["ETag"], f'"{playout.id}.{playout.version}"')
+
+    def test_playout_runtime_status(self):
+        logging.info("===> Testing Playout runtime status API")
+
+        channel = ChannelFactory(aws_id="1234567")
+        channel.save()
+        playout, other_playout = PlayoutFactory(), PlayoutFactory()
+        playout.channel = channel
+        playout.save()
+        other_playout.save()
+        playout_input = InputFactory(playout=playout, aws_flow_arn="arn:aws:mediaconnect:us-east-1:1:flow:1-abc:flow")
+        playout_input.save()
+
+        logging.info("=========> should keep the states reported by MediaLive and MediaConnect")
+        medialive_message = {
+            "time": "2026-10-18T12:00:00Z",
+            "detail-type": "MediaLive Channel State Change",
+            "detail": {"state": "RUNNING", "channel_arn": f"arn:aws:medialive:us-east-1:1:channel:{channel.aws_id}"},
+        }
+        medialive_handler({"Message": json.dumps(medialive_message)})
+        mediaconnect_message = {
+            "time": "2026-10-18T12:00:05Z",
+            "detail-type": "MediaConnect Flow Status Change",
+            "detail": {"currentStatus": "ACTIVE"},
+            "resources": [playout_input.aws_flow_arn],
+        }
+        mediaconnect_handler({"Message": json.dumps(mediaconnect_message)})
+        self.assertEqual(RuntimeState.objects.filter(playout=playout).count(), 2)
+
+        endpoint_url = reverse("playout-status")
+
+        logging.info("======> Playout runtime status API (GET {})".format(endpoint_url))
+        response = self.client.get(endpoint_url, {"ids": f"{playout.id},{other_playout.id}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = response.json()
+        self.assertEqual(set(statuses), {str(playout.id), str(other_playout.id)})
+        self.assertEqual(statuses[str(playout.id)]["channel"]["state"], "RUNNING")
+        self.assertEqual(statuses[str(playout.id)]["inputs"][str(playout_input.id)]["state"], "ACTIVE")
+
+        logging.info("=========> should not have a state for a playout AWS didn't report on")
+        self.assertEqual(statuses[str(other_playout.id)], {"channel": None, "inputs": {}})
+
+        logging.info("=========> should keep the later state when an earlier event arrives late")
+        medialive_handler(
+            {
+                "Message": json.dumps(
+                    {
+                        **medialive_message,
+                        "time": "2026-10-18T11:59:00Z",
+                        "detail": {**medialive_message["detail"], "state": "STOPPED"},
+                    }
+                )
+            }
+        )
+        self.assertEqual(RuntimeState.objects.get(resource_id=channel.id).state, "RUNNING")
+
+        logging.info("=========> should only report the states of the current channel and inputs")
+        RuntimeState.objects.create(
+            playout=playout,
+            resource_type=RuntimeState.RESOURCE_CHANNEL,
+            resource_id=uuid.uuid4(),
+            state="STOPPED",
+            reported_at=timezone.now(),
+        )
+        response = self.client.get(endpoint_url, {"ids": str(playout.id)})
+        self.assertEqual(response.json()[str(playout.id)]["channel"]["id"], str(channel.id))
+
+        logging.info("=========> should paginate the playouts of the user without ids")
+        response = self.client.get(endpoint_url, {"limit": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.json()["count"], 2)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+        logging.info("=========> should reject ids that aren't playout ids")
+        response = self.client.get(endpoint_url, {"ids": "latest"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_showrunner_scope(self):
+        logging.info("===> Testing Playout APIs for a showrunner")
+
+        showrunner = UserFactory()
+        showrunner.save()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=showrunner).key}")
+
+        playout, other_playout = PlayoutFactory(), PlayoutFactory()
+        playout.save()
+        other_playout.save()
+        endpoint_url = reverse("playout-list")
+
+        logging.info("=========> should not list any playout to a user without playouts")
+        list_response = client.get(endpoint_url)
+        self.assertEqual(list_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list_response.json()["results"], [])
+
+        logging.info("=========> should only list the playouts of the showrunner, as soon as they are given")
+        ShowRunner.objects.create(user=showrunner, playout=playout)
+        list_response = client.get(endpoint_url)
+        self.assertEqual([item["id"] for item in list_response.json()["results"]], [str(playout.id)])
+
+        logging.info("=========> should not retrieve the playouts of others")
+        get_response = client.get(reverse("playout-detail", kwargs={"playout_id": playout.id}))
+        self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+        get_response = client.get(reverse("playout-detail", kwargs={"playout_id": other_playout.id}))
+        self.assertEqual(get_response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_playout_query_budget(self):
+        logging.info("===> Testing Playout list API queries")
+
+        logging.info("=========> should list the playouts with a constant number of queries")
+        self.assertQueryBudget(reverse("playout-list"), lambda: PlayoutFactory().save())
@@ -1,10 +1,11 @@
 import logging
 
 from django.urls import reverse
+from django.utils import timezone
 
 from . import VeepsTestCase
-from .factories import PlayoutFactory
-from ..models import Playout
+from .factories import PlayoutFactory, ChannelFactory
+from ..models import Playout, Schedule, Action
 
 logger = logging.getLogger(__name__)
 
@@ -28,3 +29,20 @@ class ScheduleTests(VeepsTestCase):
 
         logging.info("=========> should make sure that response is of array type")
         self.assertIsInstance(response.json(), list)
+
+    def test_schedule_query_budget(self):
+        logging.info("===> Testing Schedule API queries")
+
+        schedule = Schedule.objects.create(live_date=timezone.now())
+        channel = ChannelFactory(schedule=schedule)
+        channel.save()
+        self.playout_data.channel = channel
+        self.playout_data.save()
+        self.addCleanup(Action.objects.filter(schedule=schedule).delete)
+
+        endpoint_url = reverse("schedule-detail", kwargs={"playout_id": self.playout_data.id})
+
+        logging.info("=========> should not query the actions of the schedule one by one")
+        self.assertQueryBudget(
+            endpoint_url, lambda: Action.objects.create(schedule=schedule, start_type=Action.IMMEDIATE_START_TYPE)
+        )
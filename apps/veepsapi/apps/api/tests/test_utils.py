@@ -0,0 +1,30 @@
+import logging
+
+from config import settings
+from . import VeepsTestCase
+from .. import utils
+
+logger = logging.getLogger(__name__)
+
+
+class BotoClientTests(VeepsTestCase):
+    def test_get_boto_client(self):
+        logging.info("===> Testing the boto3 clients kept per process")
+
+        logging.info("=========> should reuse the client of a service, region and endpoint")
+        client = utils.get_boto_client("mediastore-data", "us-east-1", "https://one.data.mediastore.test")
+        self.assertIs(utils.get_boto_client("mediastore-data", "us-east-1", "https://one.data.mediastore.test"), client)
+        self.assertEqual(client.meta.config.max_pool_connections, settings.BOTO_MAX_POOL_CONNECTIONS)
+
+        logging.info("=========> should create another client for another endpoint")
+        other_endpoint = utils.get_boto_client("mediastore-data", "us-east-1", "https://two.data.mediastore.test")
+        self.assertIsNot(other_endpoint, client)
+        self.assertEqual(other_endpoint.meta.endpoint_url, "https://two.data.mediastore.test")
+
+        logging.info("=========> should create another client for another region")
+        other_region = utils.get_boto_client("mediastore-data", "us-west-2", "https://one.data.mediastore.test")
+        self.assertIsNot(other_region, client)
+        self.assertEqual(other_region.meta.region_name, "us-west-2")
+
+        logging.info("=========> should create another client for another service")
+        self.assertIsNot(utils.get_boto_client("mediastore", "us-east-1", "https://one.data.mediastore.test"), client)
@@ -0,0 +1,122 @@
+import json
+import logging
+
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from . import VeepsTestCase
+from .factories import PlayoutFactory
+from .. import catalog
+from ..models import CacheGeneration, RawVideo, Vod, VodAsset
+from ..webhook_views import mediaconvert_handler
+
+logger = logging.getLogger(__name__)
+
+
+class VodTests(VeepsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.playout = PlayoutFactory()
+        self.playout.save()
+
+        # vods protect their playout, which the next test deletes
+        self.addCleanup(RawVideo.objects.filter(playout=self.playout).delete)
+        self.addCleanup(Vod.objects.filter(playout=self.playout).delete)
+        self.addCleanup(VodAsset.objects.filter(playout=self.playout).delete)
+
+    def test_vod_query_budget(self):
+        logging.info("===> Testing Vod list API queries")
+
+        def create_vod():
+            raw_video = RawVideo.objects.create(playout=self.playout, upload_finished_at=timezone.now())
+            Vod.objects.create(
+                playout=self.playout, create_type=Vod.CREATE_TYPE_MEDIA_CONVERT, original_video=raw_video
+            )
+
+        logging.info("=========> should not query the original video of each vod")
+        self.assertQueryBudget(reverse("vod-list"), create_vod)
+
+    def test_vod_asset_query_budget(self):
+        logging.info("===> Testing Vod asset list API queries")
+
+        logging.info("=========> should list the vod assets with a constant number of queries")
+        self.assertQueryBudget(
+            reverse("vod_asset-list"), lambda: VodAsset.objects.create(playout=self.playout, aws_id="asset")
+        )
+
+    def test_vod_keyset_pagination(self):
+        logging.info("===> Testing Vod list API keyset pagination")
+
+        vods = [Vod.objects.create(playout=self.playout) for _ in range(3)]
+        endpoint_url = reverse("vod-list")
+
+        logging.info("=========> should page through the vods with opaque cursors, without counting them")
+        first_page = self.client.get(endpoint_url, {"cursor": "", "limit": 2}).json()
+        self.assertNotIn("count", first_page)
+        self.assertEqual(len(first_page["results"]), 2)
+
+        second_page = self.client.get(first_page["next"]).json()
+        self.assertIsNone(second_page["next"])
+        self.assertEqual(
+            [vod["id"] for vod in first_page["results"] + second_page["results"]],
+            [str(vod.id) for vod in sorted(vods, key=lambda vod: (vod.created_on, str(vod.id)))],
+        )
+
+        logging.info("=========> should keep the limit/offset pagination without a cursor")
+        response = self.client.get(endpoint_url, {"limit": 2, "offset": 2})
+        self.assertEqual(response.json()["count"], 3)
+
+        logging.info("=========> should reject an invalid cursor")
+        response = self.client.get(endpoint_url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_vod_catalog_cache(self):
+        logging.info("===> Testing Vod list API cache")
+
+        endpoint_url = reverse("vod-list")
+        response = self.client.get(endpoint_url, {"create_type": Vod.CREATE_TYPE_MEDIA_CONVERT})
+        self.assertEqual(response.json()["count"], 0)
+
+        logging.info("=========> should serve the list again without querying the catalog")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(endpoint_url, {"create_type": Vod.CREATE_TYPE_MEDIA_CONVERT})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # the request itself is still logged (drf_api_logger)
+        catalog_tables = [model._meta.db_table for model in (Vod, VodAsset, RawVideo)]
+        catalog_queries = [
+            query
+            for query in queries
+            if query["sql"].startswith("SELECT") and any(f'"{table}"' in query["sql"] for table in catalog_tables)
+        ]
+        self.assertEqual(catalog_queries, [])
+
+        logging.info("=========> should list the vod written by the mediaconvert handler right away")
+        raw_video = RawVideo.objects.create(
+            playout=self.playout, file=f"{self.playout.id}/video.mp4", upload_finished_at=timezone.now()
+        )
+        message = {
+            "detail-type": "MediaConvert Job State Change",
+            "detail": {
+                "status": "COMPLETE",
+                "userMetadata": {"input": f"s3://bucket/{self.playout.id}/video.mp4"},
+                "outputGroupDetails": [{"type": "HLS_GROUP"}],
+            },
+        }
+        mediaconvert_handler({"Message": json.dumps(message)})
+
+        response = self.client.get(endpoint_url, {"create_type": Vod.CREATE_TYPE_MEDIA_CONVERT})
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(response.json()["results"][0]["original_video"], raw_video.id)
+
+        logging.info("=========> should drop the cached lists once another worker invalidates the catalog")
+        Vod.objects.create(playout=self.playout, create_type=Vod.CREATE_TYPE_MEDIA_CONVERT)
+        response = self.client.get(endpoint_url, {"create_type": Vod.CREATE_TYPE_MEDIA_CONVERT})
+        self.assertEqual(response.json()["count"], 1)
+        CacheGeneration.objects.filter(name=catalog.GENERATION_NAME).update(generation=F("generation") + 1)
+        response = self.client.get(endpoint_url, {"create_type": Vod.CREATE_TYPE_MEDIA_CONVERT})
+        self.assertEqual(response.json()["count"], 2)
@@ -0,0 +1,130 @@
+import json
+import logging
+
+from django.urls import reverse
+from rest_framework import status
+
+from . import VeepsTestCase
+from .. import inbox, metrics
+from ..models import InboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def cloudformation_notification(message_id, stack_name, resource_status):
+    return {
+        "Type": "Notification",
+        "MessageId": message_id,
+        "TopicArn": "arn:aws:sns:us-west-2:000000000000:veeps",
+        "Subject": "AWS CloudFormation Notification",
+        "Message": "\n".join(
+            [
+                f"StackName='{stack_name}'",
+                f"LogicalResourceId='{stack_name}MediaPackageChannel'",
+                f"ResourceStatus='{resource_status}'",
+                "ResourceType='AWS::MediaPackage::Channel'",
+            ]
+        ),
+    }
+
+
+class WebhookTests(VeepsTestCase):
+    endpoint_url = "/api/aws_webhook/"
+
+    def setUp(self):
+        super().setUp()
+
+        # the dedupe LRU outlives the test database transactions
+        inbox.seen_messages.clear()
+        metrics.reset()
+
+    def test_webhook(self):
+        logging.info("===> Testing AWS webhook")
+
+        logging.info("======> Notification (POST {})".format(self.endpoint_url))
+
+        notification = cloudformation_notification("message-1", "MediaLiveChannelTest", "CREATE_IN_PROGRESS")
+        response = self.client.post(self.endpoint_url, json.dumps(notification), content_type="application/json")
+
+        logging.info("=========> should return status code 200")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        logging.info("=========> should store the notification in the inbox")
+        message = InboxMessage.objects.get(message_id="message-1")
+        self.assertEqual(message.status, InboxMessage.STATUS_PENDING)
+        self.assertEqual(message.ordering_key, "MediaLiveChannelTest")
+        self.assertEqual(message.body, notification)
+
+        logging.info("=========> should process the inbox")
+        self.assertEqual(inbox.process_pending(), 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, InboxMessage.STATUS_DONE)
+        self.assertEqual(message.attempts, 1)
+
+    def test_inbox_ordering(self):
+        logging.info("===> Testing inbox ordering")
+
+        for message_id, stack_name in [("message-1", "StackA"), ("message-2", "StackA"), ("message-3", "StackB")]:
+            notification = cloudformation_notification(message_id, stack_name, "CREATE_IN_PROGRESS")
+            self.client.post(self.endpoint_url, json.dumps(notification), content_type="application/json")
+
+        logging.info("=========> should only claim the oldest message of each ordering key")
+        claimed = inbox.claim(10)
+        self.assertEqual([message.message_id for message in claimed], ["message-1", "message-3"])
+
+        logging.info("=========> should claim the next message once the previous one is processed")
+        for message in claimed:
+            inbox.process(message)
+        self.assertEqual([message.message_id for message in inbox.claim(10)], ["message-2"])
+
+    def test_inbox_retry(self):
+        logging.info("===> Testing inbox retries")
+
+        notification = {"Type": "Notification", "MessageId": "message-1", "Message": "not json"}
+        self.client.post(self.endpoint_url, json.dumps(notification), content_type="application/json")
+
+        logging.info("=========> should schedule a retry when the handler fails")
+        [message] = inbox.claim(10)
+        self.assertFalse(inbox.process(message))
+        message.refresh_from_db()
+        self.assertEqual(message.status, InboxMessage.STATUS_PENDING)
+        self.assertGreater(message.next_attempt_at, message.updated_on)
+        self.assertNotEqual(message.last_error, "")
+
+        logging.info("=========> should not claim the message before its retry is due")
+        self.assertEqual(inbox.claim(10), [])
+
+        logging.info("=========> should give up after the last attempt")
+        message.attempts = 100
+        self.assertFalse(inbox.process(message))
+        message.refresh_from_db()
+        self.assertEqual(message.status, InboxMessage.STATUS_DEAD)
+
+    def test_duplicate_notification(self):
+        logging.info("===> Testing SNS redeliveries")
+
+        notification = cloudformation_notification("message-1", "MediaLiveChannelTest", "CREATE_IN_PROGRESS")
+        for _ in range(2):
+            response = self.client.post(self.endpoint_url, json.dumps(notification), content_type="application/json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        logging.info("=========> should store the notification once")
+        self.assertEqual(InboxMessage.objects.filter(message_id="message-1").count(), 1)
+
+        logging.info("=========> should drop redeliveries not seen by this worker")
+        inbox.seen_messages.clear()
+        self.client.post(self.endpoint_url, json.dumps(notification), content_type="application/json")
+        self.assertEqual(InboxMessage.objects.filter(message_id="message-1").count(), 1)
+
+        endpoint_url = reverse("metrics-list")
+
+        logging.info("======> Metrics API (GET {})".format(endpoint_url))
+        metrics_response = self.client.get(endpoint_url)
+
+        logging.info("=========> should report the dedupe hit rate")
+        self.assertEqual(metrics_response.status_code, status.HTTP_200_OK)
+        dedupe = metrics_response.json()["inbox"]["dedupe"]
+        self.assertEqual(dedupe["memory_hits"], 1)
+        self.assertEqual(dedupe["db_hits"], 1)
+        self.assertEqual(dedupe["misses"], 1)
+        self.assertEqual(dedupe["hit_rate"], 0.6667)
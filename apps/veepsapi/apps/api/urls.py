@@ -15,6 +15,8 @@ from .views import (
     VodViewSet,
     MediaStoreViewSet,
     DownloadViewSet,
+    ProvisioningJobViewSet,
+    MetricsViewSet,
 )
 from .webhook_views import webhook_handler
 
@@ -33,6 +35,8 @@ router.register(r"vod_asset", VodAssetViewSet, basename="vod_asset")
 router.register(r"mediastore", MediaStoreViewSet, basename="mediastore")
 router.register(r"download", DownloadViewSet, basename="download")
 router.register(r"webhook", CallbackSubscriberViewSet, basename="webhook")
+router.register(r"job", ProvisioningJobViewSet, basename="job")
+router.register(r"metrics", MetricsViewSet, basename="metrics")
 
 urlpatterns = [
     path(r"", include(router.urls)),
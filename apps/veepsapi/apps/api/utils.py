@@ -1,12 +1,47 @@
+import os
+import threading
 from uuid import uuid4
 
 import boto3
+from botocore.config import Config
 
 from config import settings
 
+_boto_sessions = {}
+_boto_clients = {}
+_boto_lock = threading.Lock()
 
-def get_boto_client(resource_name):
-    return boto3.client(resource_name)
+
+def get_boto_client(resource_name, region_name=None, endpoint_url=None):
+    """
+    boto3 clients are thread-safe but slow and memory hungry to create, so they are created lazily and kept
+    per process, keyed by service/region/endpoint. Keying on the pid makes sure a forked (gunicorn) worker
+    never reuses the connection pools of its parent.
+    """
+    pid = os.getpid()
+    key = (pid, resource_name, region_name, endpoint_url)
+
+    client = _boto_clients.get(key)
+    if client is not None:
+        return client
+
+    # Sessions (unlike clients) are not thread-safe, so creation is serialized
+    with _boto_lock:
+        client = _boto_clients.get(key)
+        if client is None:
+            session = _boto_sessions.get(pid)
+            if session is None:
+                session = _boto_sessions[pid] = boto3.session.Session()
+
+            client = session.client(
+                resource_name,
+                region_name=region_name,
+                endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=settings.BOTO_MAX_POOL_CONNECTIONS),
+            )
+            _boto_clients[key] = client
+
+    return client
 
 
 def file_generate_upload_path(instance):
@@ -14,7 +49,7 @@ def file_generate_upload_path(instance):
 
 
 def s3_generate_presigned_post(*, file_path):
-    s3_client = boto3.client("s3")
+    s3_client = get_boto_client("s3")
 
     presigned_data = s3_client.generate_presigned_post(
         settings.AWS_S3_VOD_INPUT_BUCKET_NAME,
@@ -1,11 +1,17 @@
+import os
+import uuid
 from datetime import datetime
-import boto3
+
+from botocore.exceptions import ClientError
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.http import parse_etags
 from django.utils.timezone import now
 from django.views import View
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
 from rest_framework.mixins import (
     ListModelMixin,
@@ -17,8 +23,12 @@ from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from django_filters import rest_framework as filters
 
-from . import utils
+from config import settings
+
+from . import inbox, jobs, mediastore, metrics, streams, utils
+from .catalog import CachedListModelMixin
 from .filters import VodAssetFilter, VodFilter, RawVideoFilter
+from .pagination import KeysetPagination
 from .models import (
     Input,
     Channel,
@@ -31,8 +41,12 @@ from .models import (
     RawVideo,
     Vod,
     VodAsset,
+    ProvisioningJob,
+    PlayoutEvent,
+    RuntimeState,
 )
-from .authentication import IsAdminOrShowRunner
+from .authentication import IsAdmin, IsAdminOrShowRunner, get_playout_scope
+from ..users.authentication import CachedTokenAuthentication
 from .serializers import (
     DistributionSerializer,
     PlayoutSerializer,
@@ -45,6 +59,7 @@ from .serializers import (
     RawVideoSerializer,
     VodSerializer,
     VodAssetSerializer,
+    ProvisioningJobSerializer,
 )
 
 
@@ -61,18 +76,84 @@ class HomeViewSet(View):
 
 class BaseViewSet(GenericViewSet):
     filter_backends = (filters.DjangoFilterBackend,)
+    # lookup from the objects of the view to their playout, to limit them to the playouts of a showrunner
+    playout_scope_field = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.playout_scope_field is None:
+            return queryset
+
+        scope = get_playout_scope(self.request.user)
+        if scope is None:
+            return queryset
+        return queryset.filter(**{f"{self.playout_scope_field}__in": scope})
+
+    def get_playout_etag(self, playout_id):
+        """
+        Strong ETag of the resources of a playout, from its version: one indexed lookup, scoped like the querysets
+        :return: None if the playout doesn't exist or isn't in the scope of the user
+        """
+        playouts = Playout.objects.filter(pk=playout_id)
+        scope = get_playout_scope(self.request.user)
+        if scope is not None:
+            playouts = playouts.filter(pk__in=scope)
+
+        version = playouts.values_list("version", flat=True).first()
+        if version is None:
+            return None
+        return f'"{playout_id}.{version}"'
+
+    def conditional_retrieve(self, request, playout_id, retrieve):
+        """
+        Response of `retrieve()` with the ETag of the playout, or 304 Not Modified without calling it when the
+        If-None-Match header has the current ETag, so unchanged polls skip the queries and serialization.
+        The version is read first: a change committed meanwhile is served with the older ETag, and only costs the
+        client one more full response.
+        """
+        etag = self.get_playout_etag(playout_id)
+        if etag is not None:
+            etags = parse_etags(request.headers.get("If-None-Match", ""))
+            if etag in etags or f"W/{etag}" in etags or "*" in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        response = retrieve()
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+
+def job_accepted_response(job, data=None):
+    """
+    202 response for work handed over to a provisioning job, pointing at the job resource to poll
+    """
+    return Response(
+        {**(data or {}), "job": ProvisioningJobSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": reverse("job-detail", kwargs={"pk": job.id})},
+    )
 
 
 class ChannelViewSet(BaseViewSet, ListModelMixin, RetrieveModelMixin):
     serializer_class = ChannelSerializer
-    queryset = Channel.objects.all()
-    authentication_classes = [TokenAuthentication]
+    queryset = Channel.objects.prefetch_related("playout")
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "playout"
     lookup_field = "playout_id"
 
     # noinspection PyMethodOverriding
     def get_object(self, playout_id):
-        return get_object_or_404(self.queryset, playout__pk=playout_id)
+        return get_object_or_404(self.get_queryset(), playout__pk=playout_id)
+
+    def retrieve(self, request, *args, **kwargs):
+        playout_id = kwargs.get("playout_id")
+
+        def retrieve():
+            serializer = self.get_serializer(self.get_object(playout_id))
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return self.conditional_retrieve(request, playout_id, retrieve)
 
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object(kwargs.get("playout_id"))
@@ -95,13 +176,14 @@ class ChannelViewSet(BaseViewSet, ListModelMixin, RetrieveModelMixin):
 class InputViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelMixin, DestroyModelMixin):
     serializer_class = InputSerializer
     queryset = Input.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "playout"
     lookup_field = "playout_id"
 
     # noinspection PyMethodOverriding
     def get_object(self, playout_id):
-        return self.queryset.filter(playout_id=playout_id).all()
+        return self.get_queryset().filter(playout_id=playout_id).all()
 
     def partial_update(self, request, *args, **kwargs):
         instances = self.get_object(kwargs.get("playout_id"))
@@ -122,10 +204,22 @@ class InputViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelM
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        channel_input = serializer.save()
+
+        job = jobs.enqueue(ProvisioningJob.KIND_INPUT_CREATE, channel_input.playout, object_id=channel_input.id)
+        return job_accepted_response(job, serializer.data)
+
     def retrieve(self, request, *args, **kwargs):
-        instances = self.get_object(kwargs.get("playout_id"))
-        serialized = self.serializer_class(instances, many=True)
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        playout_id = kwargs.get("playout_id")
+
+        def retrieve():
+            serialized = self.serializer_class(self.get_object(playout_id), many=True)
+            return Response(serialized.data, status=status.HTTP_200_OK)
+
+        return self.conditional_retrieve(request, playout_id, retrieve)
 
     def destroy(self, request, *args, **kwargs):
         instances = self.get_object(kwargs.get("playout_id"))
@@ -134,50 +228,148 @@ class InputViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelM
         if instance is None:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        self.serializer_class(instance=instance).destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        job = jobs.enqueue(ProvisioningJob.KIND_INPUT_DELETE, instance.playout, object_id=instance.id)
+        return job_accepted_response(job)
 
 
 class PlayoutViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelMixin):
     serializer_class = PlayoutSerializer
     queryset = Playout.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "id"
     lookup_field = "playout_id"
 
     # noinspection PyMethodOverriding
     def get_object(self, playout_id):
-        return get_object_or_404(self.queryset, pk=playout_id)
+        return get_object_or_404(self.get_queryset(), pk=playout_id)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        playout = serializer.save()
+
+        job = jobs.enqueue(ProvisioningJob.KIND_PLAYOUT_CREATE, playout)
+        return job_accepted_response(job, serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         playout_id = kwargs.get("playout_id")
-        instance = self.get_object(playout_id)
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        def retrieve():
+            serializer = self.get_serializer(self.get_object(playout_id))
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return self.conditional_retrieve(request, playout_id, retrieve)
 
     def destroy(self, request, *args, **kwargs):
         playout_id = kwargs.get("playout_id")
         instance = self.get_object(playout_id)
-        serializer = self.get_serializer(instance, data=request.data)
-        serializer.delete(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+
+        job = jobs.enqueue(ProvisioningJob.KIND_PLAYOUT_DELETE, instance)
+        return job_accepted_response(job)
+
+    @action(methods=["GET"], detail=False, url_path="status", url_name="status")
+    def runtime_status(self, request, *args, **kwargs):
+        """
+        Live state of the channels and inputs of many playouts, as last reported by AWS (see RuntimeState): the
+        playouts of the `ids` query param (comma-separated ids, at most PLAYOUT_STATUS_MAX_IDS), or else a page of the
+        playouts of the user, paginated like the playout list with the states by playout id in `results`.
+        The state of a channel/input is missing until AWS reports one.
+        """
+        playouts = self.get_queryset()
+
+        ids = [playout_id.strip() for playout_id in request.query_params.get("ids", "").split(",")]
+        ids = [playout_id for playout_id in ids if playout_id]
+        page = None
+        if ids:
+            if len(ids) > settings.PLAYOUT_STATUS_MAX_IDS:
+                return Response(
+                    {"ids": f"At most {settings.PLAYOUT_STATUS_MAX_IDS} playouts."}, status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                playouts = playouts.filter(id__in=[uuid.UUID(playout_id) for playout_id in ids])
+            except ValueError:
+                return Response({"ids": "Must be playout ids."}, status=status.HTTP_400_BAD_REQUEST)
+            channel_ids = dict(playouts.order_by().values_list("id", "channel_id"))
+        else:
+            page = self.paginate_queryset(playouts.order_by("created_on", "id").only("id", "channel_id"))
+            channel_ids = {playout.id: playout.channel_id for playout in page}
+
+        statuses = {str(playout_id): {"channel": None, "inputs": {}} for playout_id in channel_ids}
+        # only the states of the current channel and inputs, the ones of the replaced/deleted resources may remain
+        current_input = Input.objects.filter(id=OuterRef("resource_id"), playout_id=OuterRef("playout_id"))
+        runtime_states = (
+            RuntimeState.objects.filter(playout_id__in=list(channel_ids))
+            .annotate(current_input=Exists(current_input))
+            .filter(
+                Q(
+                    resource_type=RuntimeState.RESOURCE_CHANNEL,
+                    resource_id__in=[channel_id for channel_id in channel_ids.values() if channel_id],
+                )
+                | Q(resource_type=RuntimeState.RESOURCE_INPUT, current_input=True)
+            )
+        )
+        for runtime_state in runtime_states:
+            playout_status = statuses[str(runtime_state.playout_id)]
+            state = {
+                "id": str(runtime_state.resource_id),
+                "state": runtime_state.state,
+                "reported_at": runtime_state.reported_at,
+            }
+            if runtime_state.resource_type == RuntimeState.RESOURCE_CHANNEL:
+                if runtime_state.resource_id == channel_ids[runtime_state.playout_id]:
+                    playout_status["channel"] = state
+            else:
+                playout_status["inputs"][str(runtime_state.resource_id)] = state
+
+        if page is not None:
+            return self.get_paginated_response(statuses)
+        return Response(statuses, status=status.HTTP_200_OK)
+
+    @action(methods=["GET"], detail=True, renderer_classes=[streams.EventStreamRenderer])
+    def events(self, request, *args, **kwargs):
+        """
+        Server-sent events stream of the events of the playout, the same ones the callback subscribers get.
+        The stream resumes after the `cursor` query param or the Last-Event-ID header, otherwise it starts with the
+        next event.
+        """
+        playout = self.get_object(kwargs.get("playout_id"))
+
+        cursor = request.query_params.get("cursor") or request.headers.get("Last-Event-ID")
+        if cursor is None:
+            cursor = PlayoutEvent.objects.filter(playout=playout).order_by("-id").values_list("id", flat=True).first()
+        try:
+            cursor = int(cursor or 0)
+        except ValueError:
+            return Response({"cursor": "Must be an event id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(streams.stream(playout.id, cursor), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # tell nginx not to buffer the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
 
 
 class ScheduleViewSet(BaseViewSet, RetrieveModelMixin, DestroyModelMixin):
     serializer_class = ScheduleSerializer
-    queryset = Schedule.objects.all()
-    authentication_classes = [TokenAuthentication]
+    queryset = Schedule.objects.prefetch_related("actions")
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "channels__playout"
     lookup_field = "playout_id"
 
     # noinspection PyMethodOverriding
     def get_object(self, playout_id):
-        return self.queryset.filter(channels__playout=playout_id).all()
+        return self.get_queryset().filter(channels__playout=playout_id).all()
 
     def retrieve(self, request, *args, **kwargs):
-        instances = self.get_object(kwargs.get("playout_id"))
-        serialized = self.get_serializer(instances, many=True)
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        playout_id = kwargs.get("playout_id")
+
+        def retrieve():
+            serialized = self.get_serializer(self.get_object(playout_id), many=True)
+            return Response(serialized.data, status=status.HTTP_200_OK)
+
+        return self.conditional_retrieve(request, playout_id, retrieve)
 
     def destroy(self, request, *args, **kwargs):
         instances = self.get_object(kwargs.get("playout_id"))
@@ -191,13 +383,14 @@ class ScheduleViewSet(BaseViewSet, RetrieveModelMixin, DestroyModelMixin):
 class ActionViewSet(BaseViewSet, CreateModelMixin, DestroyModelMixin):
     serializer_class = ActionSerializer
     queryset = Action.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "schedule__channels__playout"
     lookup_field = "playout_id"
 
     # noinspection PyMethodOverriding
     def get_object(self, playout_id):
-        return self.queryset.filter(schedule__channel__playout=playout_id).all()
+        return self.get_queryset().filter(schedule__channels__playout=playout_id).all()
 
     def create(self, request, *args, **kwargs):
         playout_id = request.data.get("playout_id")
@@ -238,14 +431,15 @@ class ActionViewSet(BaseViewSet, CreateModelMixin, DestroyModelMixin):
 
 class DistributionViewSet(BaseViewSet):
     serializer_class = DistributionSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = Distribution.objects.all()
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "playout"
     lookup_field = "playout_id"
 
     # noinspection PyMethodOverriding
     def get_object(self, playout_id):
-        return get_object_or_404(self.queryset, playout__pk=playout_id)
+        return get_object_or_404(self.get_queryset(), playout__pk=playout_id)
 
     def retrieve(self, request, playout_id):
         distribution = self.get_object(playout_id)
@@ -256,8 +450,10 @@ class DistributionViewSet(BaseViewSet):
 class ClipViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelMixin, DestroyModelMixin):
     serializer_class = ClipSerializer
     queryset = Clip.objects.all()
-    authentication_classes = [TokenAuthentication]
+    pagination_class = KeysetPagination
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "playout"
 
     def create(self, request, *args, **kwargs):
         data = request.data
@@ -287,15 +483,43 @@ class ClipViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelMi
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ProvisioningJobViewSet(BaseViewSet, ListModelMixin, RetrieveModelMixin):
+    serializer_class = ProvisioningJobSerializer
+    queryset = ProvisioningJob.objects.order_by("-created_on")
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminOrShowRunner]
+    playout_scope_field = "playout"
+
+
+class MetricsViewSet(BaseViewSet):
+    """
+    Counters of the worker process serving the request
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdmin]
+
+    def list(self, request, *args, **kwargs):
+        return Response(
+            data={
+                "pid": os.getpid(),
+                "inbox": {"dedupe": inbox.dedupe_stats()},
+                "counters": metrics.snapshot(),
+            }
+        )
+
+
 class CallbackSubscriberViewSet(ModelViewSet):
     serializer_class = CallbackSubscriberSerializer
     queryset = CallbackSubscriber.objects.all()
+    pagination_class = KeysetPagination
     filter_backends = (filters.DjangoFilterBackend,)
 
 
 class RawVideoViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveModelMixin):
     serializer_class = RawVideoSerializer
     queryset = RawVideo.objects.filter(upload_finished_at__isnull=False)
+    pagination_class = KeysetPagination
     filterset_class = RawVideoFilter
 
     @transaction.atomic
@@ -306,30 +530,50 @@ class RawVideoViewSet(BaseViewSet, CreateModelMixin, ListModelMixin, RetrieveMod
         return Response(data=presigned_data)
 
 
-class VodViewSet(BaseViewSet, ListModelMixin, RetrieveModelMixin):
+class VodViewSet(BaseViewSet, CachedListModelMixin, RetrieveModelMixin):
     serializer_class = VodSerializer
-    queryset = Vod.objects.all()
+    queryset = Vod.objects.select_related("original_video")
+    pagination_class = KeysetPagination
     filterset_class = VodFilter
 
 
-class VodAssetViewSet(BaseViewSet, ListModelMixin, RetrieveModelMixin):
+class VodAssetViewSet(BaseViewSet, CachedListModelMixin, RetrieveModelMixin):
     serializer_class = VodAssetSerializer
     queryset = VodAsset.objects.all()
+    pagination_class = KeysetPagination
     filterset_class = VodAssetFilter
 
 
 class MediaStoreViewSet(BaseViewSet, RetrieveModelMixin):
+    queryset = Playout.objects.all()
+    playout_scope_field = "id"
+
     def retrieve(self, request, *args, **kwargs):
-        playout = Playout.objects.get(pk=kwargs.get("pk"))
-        client = boto3.client("mediastore")
-        response = client.describe_container(ContainerName=f"MSCMediaLiveChannel{playout.id}".replace("-", ""))
-        if response["ResponseMetadata"]["HTTPStatusCode"] != status.HTTP_200_OK:
-            return response
-        client = boto3.client(service_name="mediastore-data", endpoint_url=response.get("Container").get("Endpoint"))
-        response = client.list_items(Path="out")
-        if response["ResponseMetadata"]["HTTPStatusCode"] != status.HTTP_200_OK:
-            return response
-        return Response(data=response["Items"])
+        """
+        Items of the archive (`out` folder) of the MediaStore container of the playout, streamed as a JSON array as
+        the pages of the listing arrive. With `depth`, the sub-folders down to that many levels are listed too,
+        concurrently. Each item has its `Path` in the container.
+        """
+        playout = get_object_or_404(self.get_queryset(), pk=kwargs.get("pk"))
+
+        try:
+            depth = int(request.query_params.get("depth", 0))
+        except ValueError:
+            depth = -1
+        if not 0 <= depth <= settings.MEDIASTORE_MAX_DEPTH:
+            return Response(
+                {"depth": f"Must be between 0 and {settings.MEDIASTORE_MAX_DEPTH}."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            endpoint = mediastore.get_endpoint(playout.id)
+            content = mediastore.open_listing(playout.id, endpoint, depth)
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") == "ContainerNotFoundException":
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            raise
+
+        return StreamingHttpResponse(content, content_type="application/json")
 
 
 class DownloadViewSet(BaseViewSet):
@@ -3,16 +3,17 @@ import logging
 from datetime import datetime
 
 import requests
-from django.core.serializers.json import DjangoJSONEncoder
-from django.forms import model_to_dict
+from django.utils.dateparse import parse_datetime
 from django.utils.timezone import now
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
 from config import settings
-from . import models, tasks, utils
+from . import callbacks, catalog, inbox, jobs, models, utils
 from .cloudformation.liveinput import MediaLiveInputLive
+from .cloudformation import registry as stack_registry
+from .cloudformation.outputs import stack_output_store
 from .serializers import ClipSerializer
 from .models import Channel, Clip, Input, RawVideo, Playout, Vod, VodAsset
 
@@ -31,31 +32,39 @@ def webhook_handler(request):
             requests.get(subscribe_url)
         return Response(status=status.HTTP_200_OK)
 
+    # acknowledge right away, the notification is processed from the inbox so slow handlers don't make SNS retry
+    inbox.store(json_data)
+
+    return Response(status=status.HTTP_200_OK)
+
+
+def dispatch_notification(json_data):
+    """
+    Route an SNS notification to its handler, called by the inbox consumers
+    """
     subject = json_data.get("Subject")
 
-    if subject == "AWS CloudFormation Notification":
+    if subject == inbox.CLOUDFORMATION_SUBJECT:
         # Handle cloudformation notification
-        return cloudformation_handler(json_data)
+        cloudformation_handler(json_data)
     else:
         message = json_data.get("Message")
         message_source = json.loads(message).get("source")
         if message_source == "aws.mediaconnect":
             # Handle media connect notification
-            return mediaconnect_handler(json_data)
+            mediaconnect_handler(json_data)
         elif message_source == "aws.medialive":
             # Handle media live notification
-            return medialive_handler(json_data)
+            medialive_handler(json_data)
         elif message_source == "aws.mediapackage":
             # Handle media package notification
-            return mediapackage_handler(json_data)
+            mediapackage_handler(json_data)
         elif message_source == "aws.mediaconvert":
             # Handle media convert notification
-            return mediaconvert_handler(json_data)
+            mediaconvert_handler(json_data)
         elif message_source == "aws.s3":
             # Handle s3 notification
-            return s3_handler(json_data)
-
-    return Response(status=status.HTTP_200_OK)
+            s3_handler(json_data)
 
 
 def mediapackage_handler(json_data):
@@ -84,20 +93,13 @@ def mediapackage_handler(json_data):
                         "clip_hls_path": f"{s3_destination['bucket_name']}/{s3_destination['manifest_key']}",
                     },
                 )
+                catalog.invalidate()
 
                 # Create an ingest asset in media package
                 clip_serializer = ClipSerializer(clip)
                 clip_serializer.ingest_asset()
             elif clip.status == "FAILED":
-                for subscriber in models.CallbackSubscriber.objects.all():
-                    event = models.CallbackEvent.objects.create(
-                        playout=clip.playout,
-                        subscriber=subscriber,
-                        event_type=models.CallbackEvent.EVENT_TYPE_CLIPPING_FAILED,
-                        object_id=clip.id,
-                        event_object=json.dumps(model_to_dict(clip), sort_keys=True, indent=1, cls=DjangoJSONEncoder),
-                    )
-                    tasks.call_webhook(event.id)
+                callbacks.publish(models.CallbackEvent.EVENT_TYPE_CLIPPING_FAILED, clip.playout, clip)
         else:
             logger.error(f"Could not find clip with id={harvest_job_id}")
     elif detail_type == "MediaPackage Input Notification" and detail and detail.get("event") == "IngestComplete":
@@ -129,19 +131,10 @@ def mediapackage_handler(json_data):
             if vod:
                 vod_asset.vod = vod
                 vod_asset.save()
+            catalog.invalidate()
 
             # invoke vod_asset.ready callback notification
-            for subscriber in models.CallbackSubscriber.objects.all():
-                event = models.CallbackEvent.objects.create(
-                    playout=vod_asset.playout,
-                    subscriber=subscriber,
-                    event_type=models.CallbackEvent.EVENT_TYPE_VOD_ASSET_READY,
-                    object_id=vod_asset.id,
-                    event_object=json.dumps(model_to_dict(vod_asset), sort_keys=True, indent=1, cls=DjangoJSONEncoder),
-                )
-                tasks.call_webhook(event.id)
-
-    return Response(status=status.HTTP_200_OK)
+            callbacks.publish(models.CallbackEvent.EVENT_TYPE_VOD_ASSET_READY, vod_asset.playout, vod_asset)
 
 
 def cloudformation_handler(json_data):
@@ -157,12 +150,29 @@ def cloudformation_handler(json_data):
     stack_name = messages.get("StackName")
     logical_resource = messages.get("LogicalResourceId")
 
+    if resource_status == "DELETE_COMPLETE" and stack_name == logical_resource:
+        stack_output_store.invalidate(stack_name)
+
+    if stack_name == logical_resource:
+        # keep the stack registry current
+        if messages.get("StackId"):
+            event = {k: v for k, v in messages.items() if k != "ResourceProperties"}
+            stack_registry.record(messages["StackId"], stack_name, resource_status, event=event)
+
+        # finish the provisioning job of this stack operation, and start the next job of the stack
+        if models.ProvisioningJob.advance(stack_name, resource_status, messages.get("ClientRequestToken")):
+            jobs.start_next(stack_name)
+
     if "COMPLETE" in resource_status and stack_name == logical_resource:
+        channel = Channel.objects.filter(name=stack_name.replace("-", "")).first()
 
-        if "Stack" in messages.get("ResourceType"):
-            channel = Channel.objects.filter(name=stack_name.replace("-", "")).first()
+        if channel is not None and "Stack" in messages.get("ResourceType"):
             channel_template = channel.channel_template
 
+            if resource_status in ["CREATE_COMPLETE", "UPDATE_COMPLETE"]:
+                # store the outputs once, so that control-plane calls don't have to describe the stack
+                channel_template.refresh_outputs()
+
             srt_ip = channel_template.get_srt_ip()
             distribution_url = channel_template.get_distribution_uri()
 
@@ -181,7 +191,7 @@ def cloudformation_handler(json_data):
             inputs = channel.playout.get().input.filter(initial_input=False).all()
 
             for channel_input in inputs:
-                channel_input.inbound_ip = channel_input.input_template(channel.channel_template.template).get_srt_ip()
+                channel_input.inbound_ip = channel_template.get_input_srt_ip(channel_input.id)
                 channel_input.save()
 
                 logger.info(f"Updated input {channel_input.id}, {channel_input.inbound_ip}:{channel_input.port}")
@@ -194,21 +204,14 @@ def cloudformation_handler(json_data):
             ):
 
                 # update status field of playout instance
-                channel.playout.get().status = resource_status
-                channel.playout.get().save()
+                playout = channel.playout.get()
+                playout.status = resource_status
+                playout.save()
 
                 # send notification to callback subscribers
-                for subscriber in models.CallbackSubscriber.objects.all():
-                    event = models.CallbackEvent.objects.create(
-                        playout=channel.playout.get(),
-                        subscriber=subscriber,
-                        event_type=models.CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED,
-                        object_id=channel.id,
-                        event_object=json.dumps(
-                            model_to_dict(channel.playout.get()), sort_keys=True, indent=1, cls=DjangoJSONEncoder
-                        ),
-                    )
-                    tasks.call_webhook(event.id)
+                callbacks.publish(
+                    models.CallbackEvent.EVENT_TYPE_PLAYOUT_CREATED, playout, playout, object_id=channel.id
+                )
 
     # get aws medialive channel id and store it into channel model for use when channel on/off notification
     # channel on/off notification frow aws has only this id in their message that can be used to find BE channel instance
@@ -240,22 +243,12 @@ def cloudformation_handler(json_data):
         if resource_properties.get("Type") == "MEDIACONNECT":
             input = Input.objects.filter(id=resource_properties.get("Name")).first()
             if input:
-                for subscriber in models.CallbackSubscriber.objects.all():
-                    event = models.CallbackEvent.objects.create(
-                        playout=input.playout,
-                        subscriber=subscriber,
-                        event_type=models.CallbackEvent.EVENT_TYPE_INPUT_CREATED,
-                        object_id=input.id,
-                        event_object=json.dumps(
-                            model_to_dict(input, exclude=["inbound_ip", "whitelist_cidr"]),
-                            sort_keys=True,
-                            indent=1,
-                            cls=DjangoJSONEncoder,
-                        ),
-                    )
-                    tasks.call_webhook(event.id)
-
-    return Response(status=status.HTTP_200_OK)
+                callbacks.publish(
+                    models.CallbackEvent.EVENT_TYPE_INPUT_CREATED,
+                    input.playout,
+                    input,
+                    exclude=["inbound_ip", "whitelist_cidr"],
+                )
 
 
 def medialive_handler(json_data):
@@ -268,22 +261,20 @@ def medialive_handler(json_data):
         if detail.get("state") in ["RUNNING", "STOPPED"]:
             aws_channel_id = detail["channel_arn"].split(":")[-1]
             channel = Channel.objects.filter(aws_id=aws_channel_id).get()
+            playout = channel.playout.get()
+            models.RuntimeState.record(
+                playout,
+                models.RuntimeState.RESOURCE_CHANNEL,
+                channel.id,
+                detail["state"],
+                reported_at=parse_datetime(message.get("time") or ""),
+            )
             event_type = (
                 models.CallbackEvent.EVENT_TYPE_CHANNEL_RUNNING
                 if detail["state"] == "RUNNING"
                 else models.CallbackEvent.EVENT_TYPE_CHANNEL_STOPPED
             )
-            for subscriber in models.CallbackSubscriber.objects.all():
-                event = models.CallbackEvent.objects.create(
-                    playout=channel.playout.get(),
-                    subscriber=subscriber,
-                    event_type=event_type,
-                    object_id=channel.id,
-                    event_object=json.dumps(model_to_dict(channel), sort_keys=True, indent=1, cls=DjangoJSONEncoder),
-                )
-                tasks.call_webhook(event.id)
-
-    return Response(status=status.HTTP_200_OK)
+            callbacks.publish(event_type, playout, channel)
 
 
 def mediaconnect_handler(json_data):
@@ -296,27 +287,19 @@ def mediaconnect_handler(json_data):
         if detail.get("currentStatus") in ["ACTIVE", "STANDBY"]:
             resource = message.get("resources")[0]
             input = Input.objects.filter(aws_flow_arn=resource).get()
+            models.RuntimeState.record(
+                input.playout,
+                models.RuntimeState.RESOURCE_INPUT,
+                input.id,
+                detail["currentStatus"],
+                reported_at=parse_datetime(message.get("time") or ""),
+            )
             event_type = (
                 models.CallbackEvent.EVENT_TYPE_INPUT_ACTIVE
                 if detail["currentStatus"] == "ACTIVE"
                 else models.CallbackEvent.EVENT_TYPE_INPUT_STANDBY
             )
-            for subscriber in models.CallbackSubscriber.objects.all():
-                event = models.CallbackEvent.objects.create(
-                    playout=input.playout,
-                    subscriber=subscriber,
-                    event_type=event_type,
-                    object_id=input.id,
-                    event_object=json.dumps(
-                        model_to_dict(input, exclude=["inbound_ip", "whitelist_cidr"]),
-                        sort_keys=True,
-                        indent=1,
-                        cls=DjangoJSONEncoder,
-                    ),
-                )
-                tasks.call_webhook(event.id)
-
-    return Response(status=status.HTTP_200_OK)
+            callbacks.publish(event_type, input.playout, input, exclude=["inbound_ip", "whitelist_cidr"])
 
 
 def mediaconvert_handler(json_data):
@@ -352,8 +335,7 @@ def mediaconvert_handler(json_data):
                 elif outputGroupDetail.get("type") == "FILE_GROUP":
                     vod.file_group = outputGroupDetail
                     vod.save()
-
-    return Response(status=status.HTTP_200_OK)
+            catalog.invalidate()
 
 
 def s3_handler(json_data):
@@ -375,6 +357,8 @@ def s3_handler(json_data):
             file_obj.file_size = int(detail.get("object").get("size"))
             file_obj.upload_finished_at = datetime.now()
             file_obj.save()
+            # the vods list their original video
+            catalog.invalidate()
 
             # trigger s3-vod-trigger lambda function
             # trigger this programmatically because the lambda is not triggered in case video is uploaded by api
@@ -396,8 +380,6 @@ def s3_handler(json_data):
                 ).encode(encoding="UTF-8"),
             )
 
-    return Response(status=status.HTTP_200_OK)
-
 
 class Response(Response):
     def __init__(self, data=None, status=None, template_name=None, headers=None, exception=False, content_type=None):
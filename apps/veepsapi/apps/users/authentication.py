@@ -1,5 +1,87 @@
+import copy
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import permissions
-from .models import AllowList
+from rest_framework.authentication import TokenAuthentication
+
+from apps.api.cache import LRUCache
+from .models import AllowList, TokenRevocation
+
+
+class TokenCache:
+    """
+    (user, token) by token key, for AUTH_TOKEN_CACHE_TTL seconds.
+
+    A token deleted, or whose user is saved (see signals.py), is dropped right away in the worker changing it, and
+    recorded as a TokenRevocation: every AUTH_TOKEN_SYNC_INTERVAL seconds, each worker drops the tokens revoked since
+    its last check, so the other workers stop authenticating them too.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._synced_at = None
+        self._synced_on = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        with self._lock:
+            if self._synced_at is not None and time.monotonic() - self._synced_at < settings.AUTH_TOKEN_SYNC_INTERVAL:
+                return
+            last_sync = self._synced_on
+            self._synced_at = time.monotonic()
+            self._synced_on = timezone.now()
+
+        # nothing is cached before the first lookup
+        if last_sync is None:
+            return
+
+        # rows are stamped before their transaction commits, so look back further than the last check
+        since = last_sync - timedelta(seconds=settings.AUTH_TOKEN_SYNC_LOOKBACK)
+        for key in TokenRevocation.objects.filter(created_on__gte=since).values_list("key", flat=True):
+            self._cache.delete(key)
+
+    def get(self, key):
+        self.sync()
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def revoke(self, keys):
+        keys = list(keys)
+        for key in keys:
+            self._cache.delete(key)
+        if keys:
+            TokenRevocation.objects.bulk_create([TokenRevocation(key=key) for key in keys])
+        # the revocations older than the lookback were seen by every worker
+        expired = timezone.now() - timedelta(seconds=settings.AUTH_TOKEN_SYNC_LOOKBACK + settings.AUTH_TOKEN_CACHE_TTL)
+        TokenRevocation.objects.filter(created_on__lt=expired).delete()
+
+    def __contains__(self, key):
+        return key in self._cache
+
+
+token_cache = TokenCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication serving the tokens seen recently from memory, without the token and user query
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+
+        user, token = cached
+        # every request gets its own user, the cached one is shared between threads
+        return copy.copy(user), token
 
 
 class AllowListPermission(permissions.BasePermission):
@@ -0,0 +1,21 @@
+# Generated by Django 4.1 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_alter_allowlist_id_alter_showrunner_id_alter_user_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenRevocation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(max_length=40)),
+                ("created_on", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -89,3 +89,13 @@ class ShowRunner(models.Model):
 
 class AllowList(models.Model):
     ip_addr = models.GenericIPAddressField()
+
+
+class TokenRevocation(models.Model):
+    """
+    Token whose authentication cached by the workers must be dropped, because it was deleted or its user changed
+    (see authentication.TokenCache)
+    """
+
+    key = models.CharField(max_length=40)
+    created_on = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import User
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    token_cache.revoke([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token(instance, **kwargs):
+    # a deactivated user (UserViewSet.perform_destroy) or a change of permissions must be seen right away
+    token_cache.revoke(Token.objects.filter(user_id=instance.id).values_list("key", flat=True))
@@ -101,6 +101,23 @@ DATABASES = {
     },
 }
 
+# CACHE CONFIGURATION
+# ------------------------------------------------------------------------------
+# "catalog" holds the responses of the VOD catalog lists (see apps/api/catalog.py). They are stored under a generation
+# kept in the database, so the invalidations reach every process whichever backend holds them.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalog": {
+        "BACKEND": env.str("CATALOG_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("CATALOG_CACHE_LOCATION", default="catalog"),
+        # seconds
+        "TIMEOUT": env.int("CATALOG_CACHE_TIMEOUT", default=300),
+        "OPTIONS": {"MAX_ENTRIES": env.int("CATALOG_CACHE_MAX_ENTRIES", default=1000)},
+    },
+}
+
 # GENERAL CONFIGURATION
 # ------------------------------------------------------------------------------
 # Local time zone for this installation. Choices can be found here:
@@ -223,7 +240,7 @@ REST_FRAMEWORK = {
     "UPLOADED_FILES_USE_URL": False,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "apps.users.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -256,6 +273,129 @@ AWS_SESSION_TOKEN = env.str("AWS_SESSION_TOKEN", default="")
 AWS_ACCOUNT_NUMBER = env.str("AWS_ACCOUNT_NUMBER", default="")
 AWS_SNS_TOPIC = env.str("AWS_SNS_TOPIC", default="Cloudwatch-hook")
 
+# Size of the connection pool of each (per process) boto3 client, should be at least the number of greenlets/threads
+# using a client concurrently
+BOTO_MAX_POOL_CONNECTIONS = env.int("BOTO_MAX_POOL_CONNECTIONS", default=25)
+
+# CloudFormation stack outputs, stored in the database with an in-process LRU in front (ttl in seconds)
+STACK_OUTPUT_CACHE_SIZE = env.int("STACK_OUTPUT_CACHE_SIZE", default=512)
+STACK_OUTPUT_CACHE_TTL = env.int("STACK_OUTPUT_CACHE_TTL", default=300)
+# seconds a missing output key isn't described again for
+STACK_OUTPUT_MISS_TTL = env.int("STACK_OUTPUT_MISS_TTL", default=30)
+# seconds between two checks of the outputs invalidated by other processes, and how many more seconds they look back
+# (for the transactions committed late)
+STACK_OUTPUT_SYNC_INTERVAL = env.int("STACK_OUTPUT_SYNC_INTERVAL", default=5)
+STACK_OUTPUT_SYNC_LOOKBACK = env.int("STACK_OUTPUT_SYNC_LOOKBACK", default=60)
+
+# Registry of the CloudFormation stacks: seconds between two listings of the stacks of the account for stacks we
+# haven't heard of through SNS, and how many unknown stack ids are remembered as missing, for how many seconds
+STACK_REGISTRY_RECONCILE_INTERVAL = env.int("STACK_REGISTRY_RECONCILE_INTERVAL", default=60)
+STACK_REGISTRY_MISS_CACHE_SIZE = env.int("STACK_REGISTRY_MISS_CACHE_SIZE", default=1000)
+STACK_REGISTRY_MISS_TTL = env.int("STACK_REGISTRY_MISS_TTL", default=300)
+
+# Waiting for CloudFormation change sets to be created (in seconds)
+CHANGE_SET_WAIT_TIMEOUT = env.int("CHANGE_SET_WAIT_TIMEOUT", default=300)
+CHANGE_SET_POLL_BASE_DELAY = env.float("CHANGE_SET_POLL_BASE_DELAY", default=1.0)
+CHANGE_SET_POLL_MAX_DELAY = env.float("CHANGE_SET_POLL_MAX_DELAY", default=15.0)
+
+# Number of built troposphere templates kept per worker
+TEMPLATE_CACHE_SIZE = env.int("TEMPLATE_CACHE_SIZE", default=128)
+
+# Number of playout/input stack operations run concurrently per worker
+PROVISIONING_MAX_WORKERS = env.int("PROVISIONING_MAX_WORKERS", default=4)
+# seconds after which run_background_workers re-queues the running jobs (their worker must have stopped, keep it
+# above CHANGE_SET_WAIT_TIMEOUT), fails the jobs still waiting for their stack notification, and submits the jobs
+# still pending
+PROVISIONING_RUNNING_TIMEOUT = env.int("PROVISIONING_RUNNING_TIMEOUT", default=900)
+PROVISIONING_WAITING_TIMEOUT = env.int("PROVISIONING_WAITING_TIMEOUT", default=3600)
+PROVISIONING_PENDING_DELAY = env.int("PROVISIONING_PENDING_DELAY", default=60)
+
+# Background processing of the SNS notifications received on /aws_webhook (see apps/api/inbox.py)
+INBOX_WORKERS = env.int("INBOX_WORKERS", default=2)
+INBOX_BATCH_SIZE = env.int("INBOX_BATCH_SIZE", default=10)
+# a message whose lease (renewed while it is processed) wasn't renewed for this many seconds is considered abandoned
+# and claimed again
+INBOX_LEASE_TIMEOUT = env.int("INBOX_LEASE_TIMEOUT", default=300)
+# a message failing this many times is moved to the "dead" status
+INBOX_MAX_ATTEMPTS = env.int("INBOX_MAX_ATTEMPTS", default=8)
+INBOX_RETRY_BASE_DELAY = env.float("INBOX_RETRY_BASE_DELAY", default=5.0)
+INBOX_RETRY_MAX_DELAY = env.float("INBOX_RETRY_MAX_DELAY", default=600.0)
+# SNS redeliveries are dropped on their MessageId: ids are remembered in memory (per worker) for a short while,
+# and in the inbox table for INBOX_DEDUPE_RETENTION seconds
+INBOX_DEDUPE_CACHE_SIZE = env.int("INBOX_DEDUPE_CACHE_SIZE", default=10000)
+INBOX_DEDUPE_CACHE_TTL = env.int("INBOX_DEDUPE_CACHE_TTL", default=3600)
+INBOX_DEDUPE_RETENTION = env.int("INBOX_DEDUPE_RETENTION", default=7 * 24 * 3600)
+
+# Delivery of the callback events to the subscribers (see apps/api/delivery.py)
+CALLBACK_WORKERS = env.int("CALLBACK_WORKERS", default=8)
+CALLBACK_BATCH_SIZE = env.int("CALLBACK_BATCH_SIZE", default=100)
+# an event being delivered for longer than this many seconds is considered abandoned and delivered again
+CALLBACK_LEASE_TIMEOUT = env.int("CALLBACK_LEASE_TIMEOUT", default=60)
+CALLBACK_RETRY_BASE_DELAY = env.float("CALLBACK_RETRY_BASE_DELAY", default=10.0)
+CALLBACK_RETRY_MAX_DELAY = env.float("CALLBACK_RETRY_MAX_DELAY", default=3600.0)
+# kept-alive connections per subscriber origin, per process
+CALLBACK_POOL_MAXSIZE = env.int("CALLBACK_POOL_MAXSIZE", default=CALLBACK_WORKERS)
+# seconds a worker keeps its index of the callback subscribers (it's invalidated right away in the worker changing it)
+CALLBACK_SUBSCRIBER_INDEX_TTL = env.int("CALLBACK_SUBSCRIBER_INDEX_TTL", default=60)
+# circuit breaker of the subscribers: opened after this many failed calls in a row, probed again after the timeout
+CALLBACK_CIRCUIT_FAILURE_THRESHOLD = env.int("CALLBACK_CIRCUIT_FAILURE_THRESHOLD", default=5)
+CALLBACK_CIRCUIT_RESET_TIMEOUT = env.int("CALLBACK_CIRCUIT_RESET_TIMEOUT", default=60)
+# concurrent calls per endpoint, adapted between 1 and CALLBACK_WORKERS to keep the latency under the target (seconds)
+CALLBACK_CONCURRENCY_INITIAL = env.int("CALLBACK_CONCURRENCY_INITIAL", default=2)
+CALLBACK_LATENCY_TARGET = env.float("CALLBACK_LATENCY_TARGET", default=1.0)
+# seconds an event waits when its endpoint is at its concurrency limit
+CALLBACK_LIMITED_DELAY = env.float("CALLBACK_LIMITED_DELAY", default=1.0)
+# deliver the callback events from the `run_background_workers` command only (see apps/api/outbox.py and
+# scripts/worker.sh), instead of from the worker that wrote them; turn it off when the command isn't running
+CALLBACK_OUTBOX_RELAY = env.bool("CALLBACK_OUTBOX_RELAY", default=True)
+# callback logs and events are kept this many days, then only their daily summaries are (see apps/api/retention.py)
+CALLBACK_RETENTION_DAYS = env.int("CALLBACK_RETENTION_DAYS", default=30)
+# seconds between two runs of the retention job
+CALLBACK_RETENTION_INTERVAL = env.int("CALLBACK_RETENTION_INTERVAL", default=3600)
+# months the partitions of the callback logs and events are created ahead, by `migrate` and the retention job
+CALLBACK_PARTITION_MONTHS_AHEAD = env.int("CALLBACK_PARTITION_MONTHS_AHEAD", default=12)
+
+# Number of API tokens cached per worker, and for how many seconds (they're invalidated right away in the worker
+# deleting the token or saving its user, and in the other workers within AUTH_TOKEN_SYNC_INTERVAL seconds)
+AUTH_TOKEN_CACHE_SIZE = env.int("AUTH_TOKEN_CACHE_SIZE", default=1000)
+AUTH_TOKEN_CACHE_TTL = env.int("AUTH_TOKEN_CACHE_TTL", default=60)
+# seconds between two checks of the tokens revoked by other workers, and how many more seconds they look back (for
+# the transactions committed late)
+AUTH_TOKEN_SYNC_INTERVAL = env.int("AUTH_TOKEN_SYNC_INTERVAL", default=2)
+AUTH_TOKEN_SYNC_LOOKBACK = env.int("AUTH_TOKEN_SYNC_LOOKBACK", default=60)
+
+# Server-sent events streams of the playout events, /api/playout/<id>/events (see apps/api/streams.py)
+# seconds between two heartbeats of an idle stream
+PLAYOUT_EVENTS_HEARTBEAT = env.int("PLAYOUT_EVENTS_HEARTBEAT", default=15)
+# seconds a stream stays open, the clients then reconnect from their last event
+PLAYOUT_EVENTS_STREAM_TIMEOUT = env.int("PLAYOUT_EVENTS_STREAM_TIMEOUT", default=300)
+# seconds the clients wait before reconnecting
+PLAYOUT_EVENTS_RETRY = env.int("PLAYOUT_EVENTS_RETRY", default=3)
+PLAYOUT_EVENTS_BATCH_SIZE = env.int("PLAYOUT_EVENTS_BATCH_SIZE", default=100)
+# seconds the playout events can be resumed from
+PLAYOUT_EVENTS_RETENTION = env.int("PLAYOUT_EVENTS_RETENTION", default=24 * 3600)
+
+# most playouts whose state /api/playout/status/ returns in one request
+PLAYOUT_STATUS_MAX_IDS = env.int("PLAYOUT_STATUS_MAX_IDS", default=500)
+
+# Listing of the MediaStore archives of the playouts, /api/mediastore/<id> (see apps/api/mediastore.py)
+# container endpoints cached per worker, and for how many seconds
+MEDIASTORE_ENDPOINT_CACHE_SIZE = env.int("MEDIASTORE_ENDPOINT_CACHE_SIZE", default=1000)
+MEDIASTORE_ENDPOINT_CACHE_TTL = env.int("MEDIASTORE_ENDPOINT_CACHE_TTL", default=3600)
+# complete listings cached per worker, and for how many seconds
+MEDIASTORE_LISTING_CACHE_SIZE = env.int("MEDIASTORE_LISTING_CACHE_SIZE", default=100)
+MEDIASTORE_LISTING_CACHE_TTL = env.int("MEDIASTORE_LISTING_CACHE_TTL", default=10)
+# items per list_items call (at most 1000)
+MEDIASTORE_PAGE_SIZE = env.int("MEDIASTORE_PAGE_SIZE", default=1000)
+# threads listing folders concurrently, per worker
+MEDIASTORE_LIST_WORKERS = env.int("MEDIASTORE_LIST_WORKERS", default=8)
+# pages (and sub-folders) a listing holds until the client reads them, per request
+MEDIASTORE_LIST_QUEUE_SIZE = env.int("MEDIASTORE_LIST_QUEUE_SIZE", default=16)
+# seconds a listing waits for its next page before failing, and for the client to read its pages before stopping
+MEDIASTORE_LIST_TIMEOUT = env.int("MEDIASTORE_LIST_TIMEOUT", default=30)
+# deepest sub-folder level a listing can include
+MEDIASTORE_MAX_DEPTH = env.int("MEDIASTORE_MAX_DEPTH", default=3)
+
 if AWS_ACCOUNT_NUMBER == "":
     try:
         # get AWS_ACCOUNT_NUMBER from boto3 directly
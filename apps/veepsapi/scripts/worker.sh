@@ -0,0 +1,9 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+set -o nounset
+
+# background work of the API: inbox retries, callback deliveries (CALLBACK_OUTBOX_RELAY), provisioning job sweeps,
+# callback retention and partitions. It must run next to gunicorn, see README.md
+python manage.py run_background_workers
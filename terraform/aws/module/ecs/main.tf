@@ -344,14 +344,62 @@ resource "aws_ecs_task_definition" "ecs_fargate_task" {
                 "name": "API_AUTH_KEY"
             }
         ]
+    },
+    {
+      "name": "ecs_fargate_worker",
+      "image": "${var.repository_url}:latest",
+      "essential": true,
+      "logConfiguration": {
+        "logDriver": "awslogs",
+        "options": {
+          "awslogs-group": "veeps-api-task",
+          "awslogs-region": "us-east-1",
+          "awslogs-stream-prefix": "worker"
+        }
+      },
+      "memory": 512,
+      "cpu": 256,
+      "command": ["/worker.sh"],
+      "entryPoint": ["/entrypoint.sh"],
+      "environment": [
+        {"name": "AWS_S3_VOD_INPUT_BUCKET_NAME", "value": "${var.input_bucket_name}"},
+        {"name": "AWS_S3_VOD_CLIP_BUCKET_NAME", "value": "${var.clip_bucket_name}"},
+        {"name": "AWS_VOD_S3_TRIGGER_LAMBDA_FUNCTION_NAME", "value": "${var.lambda_to_trigger_to_convert}"}
+      ],
+      "secrets": [
+            {
+                "valueFrom": "${var.database_secret}:databaseName::",
+                "name": "POSTGRES_DB"
+            },
+            {
+                "valueFrom": "${var.database_secret}:username::",
+                "name": "POSTGRES_USER"
+            },
+            {
+                "valueFrom": "${var.database_secret}:password::",
+                "name": "POSTGRES_PASSWORD"
+            },
+            {
+                "valueFrom": "${var.database_secret}:host::",
+                "name": "POSTGRES_HOST"
+            },
+            {
+                "valueFrom": "${var.database_secret}:port::",
+                "name": "POSTGRES_PORT"
+            },
+            {
+                "valueFrom": "${aws_secretsmanager_secret.api_key.arn}:api_key::",
+                "name": "API_AUTH_KEY"
+            }
+        ]
     }
   ]
 
   DEFINITION
   requires_compatibilities = ["FARGATE"]
   network_mode             = "awsvpc"                               # Required for Fargate!
-  memory                   = 512                                    # This must match the "memory" value from the `container_definitions` block above!
-  cpu                      = 256                                    # This must match the "cpu" value from the `container_definitions` block above!
+  memory                   = 1024                                   # This must match the sum of the "memory" values from the `container_definitions` block above!
+  cpu                      = 512                                    # This must match the sum of the "cpu" values from the `container_definitions` block above!
   execution_role_arn       = aws_iam_role.ecsTaskExecutionRole.arn  # ECS Service uses this Role
   task_role_arn            = aws_iam_role.ecs_fargate_task_role.arn # The Tasks themselves use this Role (similar to EC2 Instance Profile)
 }